@@ -1,26 +1,32 @@
-import pandas as pd
+import itertools
 import os
+import sys
 
-def build_train_dataset():
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.stockage import ecrire_table_par_morceaux, lire_par_courses, table_existe
+
+def build_train_dataset(taille_morceau=None):
+    """Copie chevaux_par_course en train_chevaux ; avec taille_morceau, lignes recopiées morceau par morceau."""
     input_path = "./data/chevaux_par_course.csv"
     output_path = "./data/train_chevaux.csv"
 
-    if not os.path.exists(input_path):
+    if not table_existe(input_path):
         print(f"❌ Fichier introuvable : {input_path}")
         return
 
-    # Chargement des données enrichies
-    df = pd.read_csv(input_path)
-    print(f"📥 Dataset chargé : {len(df)} lignes – {len(df.columns)} colonnes")
+    # Chargement des données enrichies (un seul morceau hors mode flux)
+    morceaux = lire_par_courses(input_path, taille=taille_morceau)
+    premier = next(morceaux)
+    print(f"📥 Dataset chargé : {'premier morceau, ' if taille_morceau else ''}{len(premier)} lignes – {len(premier.columns)} colonnes")
 
     # Vérification présence de la cible
-    if 'is_A1' not in df.columns:
+    if 'is_A1' not in premier.columns:
         print("❌ Colonne 'is_A1' manquante : le modèle ne pourra pas être entraîné.")
         return
 
     # Sauvegarde du fichier d'entraînement prêt à l'emploi
-    df.to_csv(output_path, index=False)
-    print(f"✅ Dataset d'entraînement généré : {output_path}")
+    nb_lignes = ecrire_table_par_morceaux(itertools.chain([premier], morceaux), output_path)
+    print(f"✅ Dataset d'entraînement généré : {output_path} ({nb_lignes} lignes)")
 
 if __name__ == "__main__":
-    build_train_dataset()
+    build_train_dataset(taille_morceau=int(sys.argv[sys.argv.index("--flux") + 1]) if "--flux" in sys.argv else None)
@@ -1,4 +1,14 @@
+import numpy as np
 import pandas as pd
+import os
+import sys
+
+# ➕ Ajoute le dossier parent au chemin d'import
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.features_kernel import ecarts_groupes, groupes_ordonnes
+from app.registre_features import ALIAS, FEATURES, REGISTRE, evaluer
+from app.stockage import ecrire_table_par_morceaux, lire_par_courses
 
 def compute_ecart(series):
     """Calcule l'écart entre les 1 dans une série binaire."""
@@ -13,51 +23,49 @@ def compute_ecart(series):
             ecart.append(compteur)
     return ecart
 
-def calculer_features(df, include_target=True):
+def calculer_ecarts(df, colonnes, groupe='course_id', poids='is_A1'):
+    """
+    Équivalent vectorisé de compute_ecart appliqué par groupe, pour plusieurs colonnes à la fois.
+    Les flags (colonne x poids) sont parcourus dans l'ordre des lignes de chaque groupe :
+    l'écart d'une ligne est le nombre de lignes sans 1 depuis le dernier 1 (compteur remis
+    à zéro après chaque 1). Le résultat est aligné sur l'index de df.
+    """
+    if df.empty:
+        return pd.DataFrame(0, index=df.index, columns=colonnes)
+
+    groupes = groupes_ordonnes(df[groupe])
+    flags = df[colonnes].fillna(0).to_numpy() * df[poids].fillna(0).to_numpy()[:, None]
+    ecarts = pd.DataFrame(ecarts_groupes(flags, groupes), index=df.index, columns=colonnes)
+    codes = groupes[0]
+
+    # Lignes sans identifiant de course : aucun groupe, donc pas d'écart
+    if (codes < 0).any():
+        ecarts = ecarts.astype(float)
+        ecarts.loc[codes < 0] = np.nan
+    return ecarts
+
+def calculer_features(df, include_target=True, features=None):
+    """
+    Ajoute à df les features du registre (app/registre_features.py) : toutes par défaut,
+    ou seulement `features` (ex. predictor.features), calculées avec leurs seules dépendances.
+    """
     pronos = [f'prono{i}' for i in range(1, 9)]
+    noms = FEATURES if features is None else [ALIAS.get(f, f) for f in features]
+    noms = [n for n in FEATURES if n in noms]
 
     # Sécurisation des colonnes manquantes
     for p in pronos:
         if p not in df.columns:
             df[p] = 0
 
-    # Présence de A1 / A2 dans les pronos
-    df['top3_1'] = df.apply(lambda x: int(x['a1'] in [x[p] for p in pronos[:3]]), axis=1) if 'a1' in df else 0
-    df['top3_2'] = df.apply(lambda x: int(x['a2'] in [x[p] for p in pronos[:3]]), axis=1) if 'a2' in df else 0
-    df['top4_1'] = df.apply(lambda x: int(x['a1'] in [x[p] for p in pronos[3:7]]), axis=1) if 'a1' in df else 0
-    df['top4_2'] = df.apply(lambda x: int(x['a2'] in [x[p] for p in pronos[3:7]]), axis=1) if 'a2' in df else 0
-
-    # Infos diverses sur A1/A2
-    df['a1_imp'] = df['a1'] % 2 if 'a1' in df else 0
-    df['a2_imp'] = df['a2'] % 2 if 'a2' in df else 0
-    df['a1_inf9'] = (df['a1'] < 9).astype(int) if 'a1' in df else 0
-    df['a2_inf9'] = (df['a2'] < 9).astype(int) if 'a2' in df else 0
-
-    # Couples
-    df['cplg_top3'] = df['top3_1'] + df['top3_2']
-    df['cplg_top4'] = df['top4_1'] + df['top4_2']
-
-    # Liens entre top3 et top4
-    df['top3_1_top4'] = df.apply(
-        lambda x: 2 if (x.get('prono1') in [x.get(p) for p in pronos[3:7]] and x.get('prono1') in [x.get('a1'), x.get('a2')])
-        else 1 if x.get('prono1') in [x.get('a1'), x.get('a2')] else 0,
-        axis=1
-    )
-    df['top3_2_top4'] = df.apply(lambda x: int(x.get('prono2') in [x.get('a1'), x.get('a2')]), axis=1)
-    df['top3_3_top4'] = df.apply(lambda x: int(x.get('prono3') in [x.get('a1'), x.get('a2')]), axis=1)
-
-    # Interactions < 9
-    df['siprono1<9-A1<9'] = df.apply(lambda x: int(x.get('prono1', 99) < 9 and x.get('a1', 99) < 9), axis=1)
-    df['siprono2<9-A1<9'] = df.apply(lambda x: int(x.get('prono2', 99) < 9 and x.get('a1', 99) < 9), axis=1)
-    df['siprono3<9-A1<9'] = df.apply(lambda x: int(x.get('prono3', 99) < 9 and x.get('a1', 99) < 9), axis=1)
-
-    # Rang des pronos associés à A1/A2
-    df['prono_rank_a1'] = df.apply(lambda x: next((i+1 for i, p in enumerate(pronos) if x.get('a1') == x.get(p)), 9), axis=1)
-    df['prono_rank_a2'] = df.apply(lambda x: next((i+1 for i, p in enumerate(pronos) if x.get('a2') == x.get(p)), 9), axis=1)
+    # Features pronos / arrivées, intermédiaires (matrice des pronos, arrivées) calculés une fois
+    valeurs = {}
+    for nom, val in evaluer(df, [n for n in noms if not REGISTRE[n].cible], valeurs=valeurs).items():
+        df[nom] = val
 
     # Groupe de distance
     if 'distance' in df:
-        df['distance_group'] = df['distance'].apply(lambda x: 'longue' if x >= 2800 else 'courte')
+        df['distance_group'] = np.where(df['distance'] >= 2800, 'longue', 'courte')
 
     # Génération du cheval_num + cible
     if include_target:
@@ -71,56 +79,65 @@ def calculer_features(df, include_target=True):
     if 'course_id' not in df.columns and {'date', 'hippodrome', 'numcourse'}.issubset(df.columns):
         df['course_id'] = df['date'].astype(str) + "_" + df['hippodrome'].astype(str) + "_" + df['numcourse'].astype(str)
 
-    # Colonnes pour lesquelles on ajoute les écarts
-    colonnes_base = [
-        'top3_1', 'top3_2', 'top4_1', 'top4_2',
-        'a1_imp', 'a2_imp', 'a1_inf9', 'a2_inf9',
-        'cplg_top3', 'cplg_top4',
-        'top3_1_top4', 'top3_2_top4', 'top3_3_top4'
-    ]
-
-    def _compute_group_ecart(group, col):
-        flags = group[col].fillna(0) * group["is_A1"].fillna(0)
-        return compute_ecart(flags)
-
-    for col in colonnes_base:
-        if include_target and 'course_id' in df.columns:
-            df[f'{col}_ecart'] = (
-                df.groupby('course_id', group_keys=False)
-                .apply(lambda g: pd.Series(_compute_group_ecart(g, col), index=g.index))
-                .reset_index(drop=True)
-            )
-        else:
-            df[f'{col}_ecart'] = 0
+    # Écarts par course (0 sans cible ou sans identifiant de course)
+    cibles = [n for n in noms if REGISTRE[n].cible]
+    avec_cible = include_target and 'course_id' in df.columns and not df.empty
+    for nom, val in evaluer(df, cibles, avec_cible, valeurs=valeurs).items():
+        df[nom] = val
 
     return df
 
-def main():
+def features_candidats(df_courses, features=None):
+    """
+    Lignes cheval d'inférence pour des courses dont l'arrivée est inconnue : chaque cheval
+    pronostiqué est évalué comme candidat A1 (a1 = cheval_num, a2 inconnue), même chemin
+    de calcul qu'à l'entraînement, sans les features qui dépendent de la cible.
+    """
+    df = df_courses.drop(columns=[c for c in ('a1', 'a2') if c in df_courses.columns])
+    df['a1'] = np.nan
+    df_all = eclater_courses(df)
+    df_all['a1'] = df_all['cheval_num']
+    return calculer_features(df_all, include_target=False, features=features)
+
+def eclater_courses(df, ignorer_nan=True):
+    """
+    Transforme chaque course en une ligne par cheval pronostiqué (prono1 à prono8),
+    avec cheval_num et is_A1. Les colonnes de la course sont recopiées en une seule
+    indexation ; avec ignorer_nan, les pronos vides ne produisent aucune ligne.
+    """
+    pronos = [f'prono{i}' for i in range(1, 9) if f'prono{i}' in df.columns]
+    chevaux = df[pronos].to_numpy()
+
+    valides = pd.notna(chevaux) if ignorer_nan else np.ones(chevaux.shape, dtype=bool)
+    lignes, rangs = np.nonzero(valides)
+
+    df_all = df.iloc[lignes].reset_index(drop=True)
+    df_all['cheval_num'] = chevaux[lignes, rangs]
+    df_all['is_A1'] = (df_all['cheval_num'] == df_all['a1']).astype(int)
+    return df_all
+
+def main(taille_morceau=None):
+    """
+    Génère chevaux_par_course. Avec taille_morceau (nombre de courses lues à la fois),
+    les courses sont traitées et écrites morceau par morceau : la mémoire reste bornée
+    et le résultat est le même qu'en un seul passage (les écarts sont calculés par course).
+    """
     input_path = './data/Courses_CompletesTurfVision_id.csv'
     output_path = './data/chevaux_par_course.csv'
 
-    df = pd.read_csv(input_path)
-    print("\n📥 Colonnes chargées :", df.columns.tolist())
-
-    # 🔁 Reconstruction : une ligne par cheval dans la course (pour entraînement)
-    lignes = []
-    for _, row in df.iterrows():
-        for p in range(1, 9):  # prono1 à prono8
-            cheval = row.get(f'prono{p}')
-            if pd.isna(cheval):
-                continue
-            new_row = row.copy()
-            new_row['cheval_num'] = cheval
-            new_row['is_A1'] = int(cheval == row['a1'])
-            lignes.append(new_row)
+    def morceaux():
+        for i, df in enumerate(lire_par_courses(input_path, cle='course_id', taille=taille_morceau)):
+            if i == 0:
+                print("\n📥 Colonnes chargées :", df.columns.tolist())
 
-    df_all = pd.DataFrame(lignes)
+            # 🔁 Reconstruction : une ligne par cheval dans la course (pour entraînement)
+            df_all = eclater_courses(df)
 
-    # Ajout des features sur toutes les lignes
-    df_features = calculer_features(df_all, include_target=True)
-    df_features.to_csv(output_path, index=False)
+            # Ajout des features sur toutes les lignes
+            yield calculer_features(df_all, include_target=True)
 
-    print(f"✅ Fichier avec features sauvegardé : {output_path} ({len(df_features)} lignes)")
+    nb_lignes = ecrire_table_par_morceaux(morceaux(), output_path)
+    print(f"✅ Fichier avec features sauvegardé : {output_path} ({nb_lignes} lignes)")
 
 if __name__ == '__main__':
-    main()
+    main(taille_morceau=int(sys.argv[sys.argv.index('--flux') + 1]) if '--flux' in sys.argv else None)
@@ -1,63 +1,213 @@
+import json
 import os
+import sys
+import numpy as np
 import pandas as pd
 
-def get_confiance_A1(discipline: str, historique_path="data/historique_predictions_complet.csv") -> float:
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.stockage import lire_table, remplacer_lignes, signature_table, table_existe
+from app.verrous import ecrire_json, verrou_table
+
+HISTORIQUE_PATH = "data/historique_predictions_complet.csv"
+INDEX_PATH = "data/index_confiance.json"
+MIN_ECHANTILLONS = 20
+TOUTES = "*"
+SANS_DISTANCE = "?"
+
+
+def classe_distance(distance, seuil=2200):
+    """Classe de distance (seuil 2200 m pour les scores de confiance)."""
+    distance = pd.to_numeric(pd.Series(distance), errors="coerce")
+    return np.where(distance < seuil, "courte", np.where(distance >= seuil, "longue", SANS_DISTANCE))
+
+
+class IndexConfiance:
     """
-    Calcule un score de confiance global A1 pour une discipline,
-    basé sur le taux de réussite dans l'historique.
+    Compteurs de réussite A1 agrégés par discipline, discipline × classe de distance
+    et discipline × classe de distance × hippodrome, calculés en une passe sur l'historique.
+    Chaque clé contient [nb_lignes, nb_lignes_renseignées, nb_succès].
     """
-    if not os.path.exists(historique_path):
-        return None
 
-    try:
-        df_hist = pd.read_csv(historique_path)
-
-        if "discipline" not in df_hist.columns or "is_A1_in_top4" not in df_hist.columns:
+    def __init__(self, historique_path=HISTORIQUE_PATH):
+        self.historique_path = historique_path
+        self.signature = None
+        self.colonnes = []
+        self.compteurs = {}
+
+    @staticmethod
+    def _cle(discipline, distance_class=TOUTES, hippodrome=TOUTES):
+        return f"{discipline}|{distance_class}|{hippodrome}"
+
+    @staticmethod
+    def _agreger(df):
+        """Compteurs de df pour tous les niveaux d'agrégation, sous forme de DataFrame indexé par clé."""
+        df = df[df["discipline"].notna()]
+        succes = df["is_A1_in_top4"] if "is_A1_in_top4" in df.columns else pd.Series(np.nan, index=df.index)
+        base = pd.DataFrame({
+            "discipline": df["discipline"].astype(str).to_numpy(),
+            "classe": classe_distance(df["distance"]) if "distance" in df.columns else SANS_DISTANCE,
+            "hippodrome": df["hippodrome"].astype(str).to_numpy() if "hippodrome" in df.columns else TOUTES,
+            "lignes": 1,
+            "renseignees": succes.notna().astype(int).to_numpy(),
+            "succes": succes.fillna(0).to_numpy(),
+        })
+        fin = base.groupby(["discipline", "classe", "hippodrome"], observed=True)[["lignes", "renseignees", "succes"]].sum()
+
+        niveaux = [fin]
+        par_classe = fin.groupby(level=["discipline", "classe"]).sum()
+        par_classe["hippodrome"] = TOUTES
+        niveaux.append(par_classe.set_index("hippodrome", append=True))
+        par_discipline = fin.groupby(level="discipline").sum()
+        par_discipline["classe"], par_discipline["hippodrome"] = TOUTES, TOUTES
+        niveaux.append(par_discipline.set_index(["classe", "hippodrome"], append=True))
+
+        tout = pd.concat(niveaux)
+        tout.index = ["|".join(map(str, k)) for k in tout.index]
+        return tout
+
+    def _appliquer(self, df, signe):
+        if df.empty:
+            return
+        for cle, (lignes, renseignees, succes) in self._agreger(df).iterrows():
+            actuel = self.compteurs.get(cle, [0, 0, 0])
+            self.compteurs[cle] = [actuel[0] + signe * int(lignes), actuel[1] + signe * int(renseignees), actuel[2] + signe * float(succes)]
+
+    @classmethod
+    def construire(cls, historique_path=HISTORIQUE_PATH):
+        index = cls(historique_path)
+        index.signature = signature_table(historique_path)
+        df = lire_table(historique_path, colonnes=["discipline", "distance", "hippodrome", "is_A1_in_top4"])
+        index.colonnes = list(df.columns)
+        if "discipline" in df.columns:
+            index._appliquer(df, 1)
+        return index
+
+    def ajouter(self, df_lignes):
+        self._appliquer(df_lignes, 1)
+
+    def retirer(self, df_lignes):
+        self._appliquer(df_lignes, -1)
+
+    def taux(self, discipline, distance_class=TOUTES, hippodrome=TOUTES):
+        """Taux de réussite arrondi, ou None si moins de MIN_ECHANTILLONS lignes."""
+        if "discipline" not in self.colonnes or "is_A1_in_top4" not in self.colonnes:
+            return None
+        if distance_class != TOUTES and "distance" not in self.colonnes:
             return None
+        lignes, renseignees, succes = self.compteurs.get(self._cle(discipline, distance_class, hippodrome), [0, 0, 0])
+        if lignes < MIN_ECHANTILLONS:
+            return None
+        return round(succes / renseignees, 3) if renseignees else float("nan")
 
-        df_filtered = df_hist[df_hist["discipline"] == discipline]
+    def sauver(self, chemin=INDEX_PATH):
+        ecrire_json(chemin, {
+            "historique_path": self.historique_path,
+            "signature": self.signature,
+            "colonnes": self.colonnes,
+            "compteurs": self.compteurs,
+        })
 
-        if len(df_filtered) < 20:
-            return None  # Pas assez de données fiables
+    @classmethod
+    def charger(cls, chemin=INDEX_PATH):
+        with open(chemin, encoding="utf-8") as f:
+            contenu = json.load(f)
+        index = cls(contenu["historique_path"])
+        index.signature = contenu["signature"]
+        index.colonnes = contenu["colonnes"]
+        index.compteurs = contenu["compteurs"]
+        return index
 
-        taux_reussite = df_filtered["is_A1_in_top4"].mean()
-        return round(taux_reussite, 3)
 
-    except Exception as e:
-        print(f"❌ Erreur dans get_confiance_A1 : {e}")
-        return None
+# Index en mémoire par fichier d'historique, partagé par tout le processus
+_index = {}
+
+
+def _chemin_index(historique_path):
+    if historique_path == HISTORIQUE_PATH:
+        return INDEX_PATH
+    return os.path.splitext(historique_path)[0] + ".index_confiance.json"
 
 
-def get_confiance_A1_par_distance(discipline: str, distance_class: str, historique_path="data/historique_predictions_complet.csv") -> float:
+def get_index_confiance(historique_path=HISTORIQUE_PATH):
+    """Index à jour pour cet historique : mémoire, sinon fichier persistant, sinon reconstruit."""
+    signature = signature_table(historique_path)
+    index = _index.get(historique_path)
+    if index is not None and index.signature == signature:
+        return index
+
+    chemin_index = _chemin_index(historique_path)
+    if os.path.exists(chemin_index):
+        index = IndexConfiance.charger(chemin_index)
+    if index is None or index.signature != signature or index.historique_path != historique_path:
+        index = IndexConfiance.construire(historique_path)
+        index.sauver(chemin_index)
+
+    _index[historique_path] = index
+    return index
+
+
+def enregistrer_resultats(df_lignes, historique_path=HISTORIQUE_PATH):
     """
-    Calcule un score de confiance A1 pour une combinaison discipline + distance (courte/longue).
-    Retourne une valeur entre 0 et 1, ou None si pas assez de données.
+    Ajoute (ou remplace, par course_id) des lignes d'historique avec résultat
+    et met l'index de confiance et les statistiques de performance à jour
+    sans rescanner tout l'historique.
+    """
+    from app.stats_performance import COLONNES_HISTORIQUE, mettre_a_jour_stats
+
+    # Verrou de la table : l'index reste cohérent avec l'historique si plusieurs sessions enregistrent
+    with verrou_table(historique_path):
+        index = get_index_confiance(historique_path) if table_existe(historique_path) else None
+        signature_avant = signature_table(historique_path)
+        anciennes = df_lignes.iloc[:0]
+        if index is not None:
+            colonnes = list(dict.fromkeys(["course_id", "discipline", "distance", "hippodrome", "is_A1_in_top4"] + COLONNES_HISTORIQUE))
+            anciennes = lire_table(historique_path, colonnes=colonnes)
+            if "course_id" in anciennes.columns:
+                anciennes = anciennes[anciennes["course_id"].isin(df_lignes["course_id"].unique())]
+                index.retirer(anciennes)
+
+        remplacer_lignes(df_lignes, historique_path, cle="course_id")
+
+        if index is None:
+            index = IndexConfiance.construire(historique_path)
+        else:
+            index.ajouter(df_lignes)
+            index.signature = signature_table(historique_path)
+        index.sauver(_chemin_index(historique_path))
+        _index[historique_path] = index
+
+        mettre_a_jour_stats(anciennes, df_lignes, signature_avant, historique_path)
+
+
+def get_confiance_A1(discipline: str, historique_path=HISTORIQUE_PATH) -> float:
     """
-    if not os.path.exists(historique_path):
+    Calcule un score de confiance global A1 pour une discipline,
+    basé sur le taux de réussite dans l'historique.
+    """
+    if not table_existe(historique_path):
         return None
 
     try:
-        df_hist = pd.read_csv(historique_path)
+        return get_index_confiance(historique_path).taux(discipline)
 
-        if "discipline" not in df_hist.columns or "distance" not in df_hist.columns or "is_A1_in_top4" not in df_hist.columns:
-            return None
+    except Exception as e:
+        print(f"❌ Erreur dans get_confiance_A1 : {e}")
+        return None
 
-        # Sélection par distance
-        if distance_class == "courte":
-            df_hist = df_hist[df_hist["distance"] < 2200]
-        elif distance_class == "longue":
-            df_hist = df_hist[df_hist["distance"] >= 2200]
-        else:
-            return None
 
-        # Sélection par discipline
-        df_filtered = df_hist[df_hist["discipline"] == discipline]
+def get_confiance_A1_par_distance(discipline: str, distance_class: str, historique_path=HISTORIQUE_PATH) -> float:
+    """
+    Calcule un score de confiance A1 pour une combinaison discipline + distance (courte/longue).
+    Retourne une valeur entre 0 et 1, ou None si pas assez de données.
+    """
+    if not table_existe(historique_path):
+        return None
 
-        if len(df_filtered) < 20:
-            return None  # Pas assez de cas pour juger
+    if distance_class not in ("courte", "longue"):
+        return None
 
-        taux_reussite = df_filtered["is_A1_in_top4"].mean()
-        return round(taux_reussite, 3)
+    try:
+        return get_index_confiance(historique_path).taux(discipline, distance_class)
 
     except Exception as e:
         print(f"❌ Erreur dans get_confiance_A1_par_distance : {e}")
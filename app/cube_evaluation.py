@@ -0,0 +1,242 @@
+# app/cube_evaluation.py
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.confiance import MIN_ECHANTILLONS, TOUTES, classe_distance
+from app.features_kernel import PRONOS, matrice_pronos, rang_dans, vecteur_arrivee
+from app.retrait_A1 import marquer_si_A1_dans_top4
+from app.stats_performance import COLONNES_HISTORIQUE, SANS_HIPPODROME, resume_courses
+from app.stockage import jours_table, lire_par_courses, lire_table, signature_table, table_existe
+
+HISTORIQUE_PATH = "data/historique_predictions.csv"
+COURSES_PATH = "data/Courses_CompletesTurfVision_id.csv"
+# Seuil courte / longue des scores de confiance (voir confiance.classe_distance)
+SEUIL_DISTANCE = 2200
+DIMENSIONS = ["discipline", "classe", "hippodrome", "mois", "rang_prono_A1"]
+# Mesures par course (courses avec arrivée connue) puis par ligne (is_A1_in_top4, comme confiance.IndexConfiance)
+MESURES_COURSES = ["courses", "top1", "top4", "gagnants", "somme_proba_gagnant"]
+MESURES_LIGNES = ["lignes", "renseignees", "succes", "probas", "somme_proba_A1"]
+MESURES = MESURES_COURSES + MESURES_LIGNES
+COLONNES_CUBE = COLONNES_HISTORIQUE + ["is_A1_in_top4"]
+# rang_prono_A1 : 1 à 8 = position du vrai A1 dans les pronos, 9 = hors pronos, 0 = pronos ou arrivée inconnus
+RANG_HORS_PRONOS = 9
+RANG_INCONNU = 0
+SANS_MOIS = "?"
+# Échecs (is_A1_in_top4 == 0) les plus récents gardés pour la page d'évaluation
+NB_ERREURS = 200
+COLONNES_ERREURS = ["course_id", "date", "cheval_num", "true_A1", "discipline"]
+
+
+def _rangs_pronos(courses_path):
+    """Matrice des pronos de chaque course (indexée par id_course), lue une fois sur les seules colonnes utiles."""
+    if courses_path is None or not table_existe(courses_path):
+        return None
+    df = lire_table(courses_path, colonnes=["id_course"] + PRONOS)
+    df = df[df["id_course"].notna()].drop_duplicates("id_course", keep="last")
+    return pd.DataFrame(matrice_pronos(df), index=df["id_course"].astype(str).to_numpy(), columns=PRONOS)
+
+
+def _reussite_lignes(df):
+    """
+    is_A1_in_top4 de chaque ligne, lu dans l'historique ; sans cette colonne, recalculé comme
+    sur la page d'évaluation (top 4 prédit de la course, ou cheval_num == true_A1 sans proba_A1).
+    """
+    if "is_A1_in_top4" in df.columns:
+        return pd.to_numeric(df["is_A1_in_top4"], errors="coerce")
+    if "true_A1" not in df.columns:
+        return pd.Series(np.nan, index=df.index)
+    if "proba_A1" in df.columns:
+        return marquer_si_A1_dans_top4(df.copy())["is_A1_in_top4"]
+    return (df["cheval_num"] == df["true_A1"]).astype(int)
+
+
+def cellules(df_lignes, pronos=None):
+    """
+    Cube partiel d'un ensemble de lignes d'historique (courses entières) : une agrégation groupée
+    des résumés de course et une des lignes sur toutes les DIMENSIONS, avec les MESURES additives
+    de chaque cellule. Retourne aussi les NB_ERREURS échecs les plus récents de ces lignes.
+    """
+    succes = _reussite_lignes(df_lignes)
+    erreurs = _plus_recentes(df_lignes.loc[succes == 0, [c for c in COLONNES_ERREURS if c in df_lignes.columns]])
+
+    resume = resume_courses(df_lignes, SEUIL_DISTANCE)
+    rang = pd.Series(RANG_INCONNU, index=resume.index.astype(str))
+    if pronos is not None and not resume.empty:
+        matrice = pronos.reindex(rang.index)
+        connues = matrice.notna().all(axis=1).to_numpy() & resume["true_A1"].notna().to_numpy()
+        gagnants = vecteur_arrivee(resume, "true_A1")
+        rang[:] = np.where(connues, rang_dans(matrice.fillna(-1).to_numpy(dtype="int16"), gagnants, RANG_HORS_PRONOS), RANG_INCONNU)
+
+    par_course = pd.DataFrame({
+        "discipline": resume["discipline"],
+        "classe": resume["classe"],
+        "hippodrome": resume["hippodrome"],
+        "mois": resume["jour"].dt.strftime("%Y-%m").fillna(SANS_MOIS),
+        "rang_prono_A1": rang.to_numpy(dtype=int),
+        "courses": 1,
+        "top1": resume["top1"],
+        "top4": resume["top4"],
+        "gagnants": resume["gagnant"],
+        "somme_proba_gagnant": resume["proba_gagnant"],
+    }).groupby(DIMENSIONS, sort=False)[MESURES_COURSES].sum()
+
+    # Lignes avec discipline, arrivée connue ou non : mêmes compteurs que l'index de confiance
+    df = df_lignes.reindex(columns=COLONNES_HISTORIQUE)
+    garder = df["discipline"].notna()
+    df, succes = df[garder], succes[garder]
+    proba = pd.to_numeric(df["proba_A1"], errors="coerce")
+    par_ligne = pd.DataFrame({
+        "discipline": df["discipline"].astype(str),
+        "classe": classe_distance(df["distance"], SEUIL_DISTANCE),
+        "hippodrome": df["hippodrome"].astype(object).where(df["hippodrome"].notna(), SANS_HIPPODROME).astype(str),
+        "mois": jours_table(df["date"]).dt.strftime("%Y-%m").fillna(SANS_MOIS),
+        "rang_prono_A1": df["course_id"].astype(str).map(rang).fillna(RANG_INCONNU).astype(int),
+        "lignes": 1,
+        "renseignees": succes.notna().astype(int),
+        "succes": succes.fillna(0).astype(float),
+        "probas": proba.notna().astype(int),
+        "somme_proba_A1": proba.fillna(0.0),
+    }).groupby(DIMENSIONS, sort=False)[MESURES_LIGNES].sum()
+
+    return pd.concat([par_course, par_ligne], axis=1).fillna(0)[MESURES], erreurs
+
+
+def _taux(df):
+    """
+    Ajoute les taux top1 / top4 (par course), la proba moyenne donnée au vrai A1, la proba_A1
+    moyenne des lignes de la cellule et le taux de réussite par ligne (moyenne de is_A1_in_top4,
+    celle des scores de confiance).
+    """
+    courses = df["courses"].where(df["courses"] > 0)
+    return df.assign(
+        taux_top1=df["top1"] / courses,
+        taux_top4=df["top4"] / courses,
+        proba_gagnant_moyenne=df["somme_proba_gagnant"] / df["gagnants"].where(df["gagnants"] > 0),
+        proba_A1_moyenne=df["somme_proba_A1"] / df["probas"].where(df["probas"] > 0),
+        taux_reussite=df["succes"] / df["renseignees"].where(df["renseignees"] > 0),
+    )
+
+
+def _plus_recentes(df, n=NB_ERREURS):
+    """Les n lignes de date la plus récente (dates jj/mm/aa comparées en dates, pas en texte)."""
+    if "date" not in df.columns:
+        return df.head(n)
+    ordre = jours_table(df["date"]).sort_values(ascending=False, kind="stable", na_position="last").index
+    return df.loc[ordre[:n]]
+
+
+class CubeEvaluation:
+    """
+    Performances du modèle sur l'historique par discipline × classe de distance × hippodrome
+    × mois × rang du vrai A1 dans les pronos. Construit en une lecture de l'historique
+    (éventuellement par morceaux de courses) ; toute vue s'obtient ensuite en sommant des cellules.
+    La même lecture donne le nombre de lignes et les dernières erreurs de prédiction.
+    """
+
+    def __init__(self, cube, signature=None, colonnes=(), nb_lignes=0, erreurs=None):
+        self.cube = cube
+        self.signature = signature
+        self.colonnes = list(colonnes)
+        self.nb_lignes = nb_lignes
+        self.erreurs = erreurs if erreurs is not None else pd.DataFrame(columns=COLONNES_ERREURS)
+
+    @classmethod
+    def construire(cls, historique_path=HISTORIQUE_PATH, courses_path=COURSES_PATH, taille_morceau=None):
+        """
+        Cube de l'historique. Avec taille_morceau, l'historique est lu par morceaux de courses entières
+        (mémoire bornée, pour des millions de lignes) et les cubes partiels sont additionnés.
+        """
+        signature = (signature_table(historique_path), signature_table(courses_path) if courses_path else None)
+        pronos = _rangs_pronos(courses_path)
+        if taille_morceau:
+            morceaux = lire_par_courses(historique_path, cle="course_id", colonnes=COLONNES_CUBE, taille=taille_morceau)
+        else:
+            morceaux = [lire_table(historique_path, colonnes=COLONNES_CUBE)]
+        colonnes, partiels, erreurs, nb_lignes = [], [], [], 0
+        for df in morceaux:
+            colonnes = colonnes or list(df.columns)
+            nb_lignes += len(df)
+            partiel, erreurs_morceau = cellules(df, pronos)
+            partiels.append(partiel)
+            erreurs.append(erreurs_morceau)
+        cube = pd.concat(partiels)
+        if len(partiels) > 1:
+            cube = cube.groupby(level=DIMENSIONS, sort=False).sum()
+        erreurs = _plus_recentes(pd.concat(erreurs, ignore_index=True)).reset_index(drop=True)
+        return cls(cube.sort_index(), signature, colonnes, nb_lignes, erreurs)
+
+    def vue(self, par=(), **filtres):
+        """
+        Mesures et taux regroupés par les dimensions `par` (aucune : une seule ligne pour tout),
+        après filtrage des cellules sur des valeurs de dimensions (ex. discipline="trot", classe="longue").
+        Une valeur de filtre TOUTES (ou None) ne filtre pas ; une liste garde plusieurs valeurs.
+        """
+        cube = self.cube
+        for dimension, valeur in filtres.items():
+            if valeur is None or valeur == TOUTES:
+                continue
+            valeurs = valeur if isinstance(valeur, (list, tuple, set)) else [valeur]
+            cube = cube[cube.index.get_level_values(dimension).isin(list(valeurs))]
+        par = list(par)
+        if par:
+            vue = cube.groupby(level=par, sort=True).sum()
+        else:
+            vue = pd.DataFrame([cube.sum()], index=pd.Index([TOUTES], name="tout"))
+        return _taux(vue)
+
+    def taux_confiance(self, discipline, classe=TOUTES):
+        """
+        Score de confiance A1 d'une discipline (× classe), défini comme confiance.IndexConfiance.taux :
+        taux de lignes is_A1_in_top4 arrondi, ou None si moins de MIN_ECHANTILLONS lignes.
+        """
+        if "is_A1_in_top4" not in self.colonnes or (classe != TOUTES and "distance" not in self.colonnes):
+            return None
+        ligne = self.vue(discipline=discipline, classe=classe).iloc[0]
+        if ligne["lignes"] < MIN_ECHANTILLONS:
+            return None
+        return round(float(ligne["taux_reussite"]), 3) if ligne["renseignees"] else float("nan")
+
+    def modalites(self, dimension):
+        return sorted(self.cube.index.get_level_values(dimension).unique())
+
+
+# Cube en mémoire par historique, partagé par tout le processus
+_cubes = {}
+
+
+def get_cube_evaluation(historique_path=HISTORIQUE_PATH, courses_path=COURSES_PATH):
+    """Cube à jour pour cet historique et ces courses : reconstruit seulement si l'un des fichiers a changé."""
+    signature = (signature_table(historique_path), signature_table(courses_path) if courses_path else None)
+    cube = _cubes.get((historique_path, courses_path))
+    if cube is None or cube.signature != signature:
+        cube = CubeEvaluation.construire(historique_path, courses_path)
+        _cubes[(historique_path, courses_path)] = cube
+    return cube
+
+
+if __name__ == "__main__":
+    # python app/cube_evaluation.py [dimension ...] [--flux N] [--historique chemin]
+    arguments = sys.argv[1:]
+    taille_morceau = None
+    historique_path = HISTORIQUE_PATH
+    if "--flux" in arguments:
+        i = arguments.index("--flux")
+        taille_morceau = int(arguments[i + 1])
+        del arguments[i:i + 2]
+    if "--historique" in arguments:
+        i = arguments.index("--historique")
+        historique_path = arguments[i + 1]
+        del arguments[i:i + 2]
+    inconnues = [d for d in arguments if d not in DIMENSIONS]
+    if inconnues:
+        print(f"❌ Dimension(s) inconnue(s) : {', '.join(inconnues)} (choix : {', '.join(DIMENSIONS)})")
+        sys.exit(1)
+
+    cube = CubeEvaluation.construire(historique_path, taille_morceau=taille_morceau)
+    print(f"✅ Cube : {len(cube.cube)} cellule(s), {int(cube.cube['courses'].sum())} course(s)")
+    with pd.option_context("display.max_rows", 200, "display.width", 200):
+        print(cube.vue(arguments or ["discipline"])[["courses", "taux_top1", "taux_top4", "proba_gagnant_moyenne", "lignes", "proba_A1_moyenne", "taux_reussite"]].round(3))
@@ -0,0 +1,224 @@
+# app/depot.py
+
+import os
+import sqlite3
+import sys
+from contextlib import contextmanager
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.journal import Journal
+from app.stockage import TABLES, ecrire_table, lire_table, table_existe
+
+DB_PATH = "data/turfvision.db"
+# Export CSV du dépôt : à part des tables de data/, que les prédictions seules ne doivent pas remplacer
+DOSSIER_EXPORT = "data/export_depot"
+# Au-delà de ce nombre d'événements en journal, un compactage est lancé en arrière-plan
+SEUIL_COMPACTAGE = 50
+
+PRONOS = [f"prono{i}" for i in range(1, 9)]
+
+# Schéma des tables : colonnes (ordre des CSV historiques) et index
+SCHEMA = {
+    "courses_en_attente": {
+        "colonnes": {
+            "id_course": "TEXT PRIMARY KEY", "date": "TEXT", "discipline": "TEXT", "hippodrome": "TEXT",
+            "numcourse": "TEXT", "distance": "INTEGER", **{p: "INTEGER" for p in PRONOS},
+        },
+        "index": [["date"], ["discipline"]],
+        "csv": ("data/courses_en_attente.csv", ","),
+    },
+}
+
+
+class DepotTurf:
+    """
+    Dépôt SQLite local des courses en attente (les prédictions et les couples restent dans
+    les tables historique_predictions et historique_couples, lues par tout le reste de l'application).
+    Les écritures de l'interface sont d'abord ajoutées à un journal (un append fsync),
+    puis repliées dans les tables par compactage, la dernière écriture d'une course l'emportant.
+    Les lectures fusionnent les tables et le journal.
+    """
+
+    def __init__(self, chemin=DB_PATH):
+        self.chemin = chemin
+        nouvelle_base = not os.path.exists(chemin)
+        with self._connexion() as conn:
+            self._creer_schema(conn)
+        # Première ouverture : reprise des CSV existants
+        if nouvelle_base:
+            self.importer_csv()
+        self.journal = Journal(os.path.splitext(chemin)[0] + ".journal")
+        # Reprise d'un journal laissé par une session précédente
+        self.compacter()
+
+    @contextmanager
+    def _connexion(self):
+        """Connexion courte : une transaction validée en sortie (annulée en cas d'erreur), puis fermée."""
+        conn = sqlite3.connect(self.chemin, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _creer_schema(conn):
+        for table, schema in SCHEMA.items():
+            colonnes = ", ".join(f'"{c}" {t}' for c, t in schema["colonnes"].items())
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({colonnes})")
+            for cols in schema["index"]:
+                nom = f"idx_{table}_{'_'.join(cols)}"
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {nom} ON {table} ({', '.join(cols)})")
+
+    @staticmethod
+    def _lignes(table, df):
+        """Valeurs de df dans l'ordre des colonnes de la table (colonnes absentes -> NULL)."""
+        colonnes = list(SCHEMA[table]["colonnes"])
+        lignes = [
+            tuple(None if pd.isna(v) else (v.item() if hasattr(v, "item") else v) for v in ligne)
+            for ligne in df.reindex(columns=colonnes).itertuples(index=False, name=None)
+        ]
+        return colonnes, lignes
+
+    def _inserer(self, conn, table, df):
+        self._inserer_lignes(conn, table, self._lignes(table, df)[1])
+
+    @staticmethod
+    def _inserer_lignes(conn, table, lignes):
+        colonnes = list(SCHEMA[table]["colonnes"])
+        noms = ", ".join(f'"{c}"' for c in colonnes)
+        marques = ", ".join("?" for _ in colonnes)
+        conn.executemany(f"INSERT OR REPLACE INTO {table} ({noms}) VALUES ({marques})", lignes)
+
+    def _lire(self, requete, params=()):
+        with self._connexion() as conn:
+            return pd.read_sql_query(requete, conn, params=params)
+
+    # --- Journal et compactage ---
+
+    def _journaliser(self, evenement):
+        self.journal.ajouter(evenement)
+        if self.journal.nb_evenements >= SEUIL_COMPACTAGE:
+            self.journal.compacter_en_arriere_plan(self._appliquer)
+
+    @staticmethod
+    def _etat_journal(evenements):
+        """Dernier état de chaque course en attente d'après le journal (la dernière écriture l'emporte)."""
+        attente = {}
+        for e in evenements:
+            if e["type"] == "attente":
+                attente[e["id_course"]] = e["ligne"]
+            elif e["type"] == "retrait":
+                attente[e["id_course"]] = None
+        return attente
+
+    def _appliquer(self, evenements):
+        """Replie des événements dans les tables, en une transaction (idempotent)."""
+        attente = self._etat_journal(evenements)
+        with self._connexion() as conn:
+            for id_course, ligne in attente.items():
+                conn.execute("DELETE FROM courses_en_attente WHERE id_course = ?", (id_course,))
+                if ligne is not None:
+                    self._inserer_lignes(conn, "courses_en_attente", [ligne])
+
+    def compacter(self):
+        """Compactage à la demande ; retourne le nombre d'événements repliés."""
+        return self.journal.compacter(self._appliquer)
+
+    # --- Courses en attente ---
+
+    def ajouter_course_en_attente(self, course):
+        """Ajoute ou remplace une course en attente (dict ou DataFrame d'une ligne)."""
+        df = pd.DataFrame([course]) if isinstance(course, dict) else course
+        for ligne in self._lignes("courses_en_attente", df)[1]:
+            self._journaliser({"type": "attente", "id_course": ligne[0], "ligne": ligne})
+
+    def retirer_course_en_attente(self, id_course):
+        self._journaliser({"type": "retrait", "id_course": id_course})
+
+    def est_en_attente(self, id_course):
+        return self.course_en_attente(id_course) is not None
+
+    def course_en_attente(self, id_course):
+        """La course en attente sous forme de dict, ou None."""
+        attente = self._etat_journal(self.journal.evenements())
+        if id_course in attente:
+            ligne = attente[id_course]
+            return None if ligne is None else dict(zip(SCHEMA["courses_en_attente"]["colonnes"], ligne))
+        df = self._lire("SELECT * FROM courses_en_attente WHERE id_course = ?", (id_course,))
+        return None if df.empty else df.iloc[0].to_dict()
+
+    def courses_en_attente(self):
+        attente = self._etat_journal(self.journal.evenements())
+        df = self._lire("SELECT * FROM courses_en_attente ORDER BY rowid")
+        if not attente:
+            return df
+        df = df[~df["id_course"].isin(list(attente))]
+        ajouts = [l for l in attente.values() if l is not None]
+        if not ajouts:
+            return df.reset_index(drop=True)
+        journal = pd.DataFrame(ajouts, columns=list(SCHEMA["courses_en_attente"]["colonnes"]))
+        return pd.concat([df, journal], ignore_index=True)
+
+    # --- Passerelle CSV ---
+
+    def importer_csv(self, remplacer=True):
+        """
+        Charge les tables historiques dans la base (remplace le contenu des tables par défaut),
+        via stockage.lire_table : la version Parquet à jour est lue plutôt qu'un CSV périmé.
+        """
+        with self._connexion() as conn:
+            for table, schema in SCHEMA.items():
+                chemin, sep = schema["csv"]
+                if not table_existe(chemin):
+                    continue
+                try:
+                    df = lire_table(chemin, sep=sep)
+                except pd.errors.EmptyDataError:
+                    continue
+                if remplacer:
+                    conn.execute(f"DELETE FROM {table}")
+                self._inserer(conn, table, df)
+                print(f"✅ {chemin} → {table} ({len(df)} lignes)")
+
+    def exporter_csv(self, dossier=DOSSIER_EXPORT):
+        """
+        Écrit chaque table dans un CSV de même nom et séparateur que les CSV historiques, dans `dossier`.
+        Vers une table de data/ (dossier="data"), l'écriture passe par stockage.ecrire_table
+        pour que sa version Parquet soit remplacée aussi.
+        """
+        self.compacter()
+        os.makedirs(dossier, exist_ok=True)
+        for table, schema in SCHEMA.items():
+            chemin, sep = schema["csv"]
+            chemin = os.path.join(dossier, os.path.basename(chemin))
+            df = self._lire(f"SELECT * FROM {table} ORDER BY rowid")
+            if os.path.normpath(chemin) in {os.path.normpath(t) for t in TABLES}:
+                ecrire_table(df, os.path.normpath(chemin), sep=sep)
+            else:
+                df.to_csv(chemin, index=False, sep=sep)
+            print(f"✅ {table} → {chemin}")
+
+
+_depots = {}
+
+
+def get_depot(chemin=DB_PATH):
+    """Dépôt partagé du processus pour cette base."""
+    if chemin not in _depots:
+        _depots[chemin] = DepotTurf(chemin)
+    return _depots[chemin]
+
+
+if __name__ == "__main__":
+    depot = DepotTurf()
+    action = sys.argv[1] if len(sys.argv) > 1 else "importer"
+    if action == "exporter":
+        depot.exporter_csv(sys.argv[2] if len(sys.argv) > 2 else DOSSIER_EXPORT)
+    elif action == "compacter":
+        print(f"✅ Journal compacté : {depot.compacter()} événement(s)")
+    else:
+        depot.importer_csv()
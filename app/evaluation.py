@@ -1,6 +1,10 @@
 import streamlit as st
-import pandas as pd
 import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.cube_evaluation import DIMENSIONS, get_cube_evaluation
+from app.stockage import table_existe
 
 st.set_page_config(page_title="📊 Évaluation TurfVision")
 st.title("📈 Évaluation des performances du modèle")
@@ -12,21 +16,19 @@ historique_path = "data/historique_predictions.csv"
 historique_complet_path = "data/historique_predictions_complet.csv"
 
 try:
-    df = pd.read_csv(historique_path)
-    st.success(f"✅ Fichier chargé avec succès ({len(df)} lignes)")
-
-    # Calculer is_A1_in_top4 si nécessaire
-    if "is_A1_in_top4" not in df.columns and "true_A1" in df.columns:
-        df["is_A1_in_top4"] = (df["cheval_num"] == df["true_A1"]).astype(int)
+    # Une seule lecture de l'historique : cube discipline × distance × hippodrome × mois × rang prono
+    # du vrai A1, nombre de lignes et dernières erreurs, calculés une fois par version de l'historique
+    cube = get_cube_evaluation(historique_path)
+    st.success(f"✅ Fichier chargé avec succès ({cube.nb_lignes} lignes)")
 
     # ------------------------------
     # 📊 Taux de réussite par discipline
     # ------------------------------
-    if "discipline" in df.columns:
+    if "discipline" in cube.colonnes:
         st.markdown("### 📊 Taux de réussite par discipline")
-        stats = df.groupby("discipline")["is_A1_in_top4"].agg(["mean", "count"])
-        stats["% de réussite"] = stats["mean"] * 100
-        stats = stats.rename(columns={"count": "Nb de courses"})
+        stats = cube.vue(["discipline"])
+        stats["% de réussite"] = stats["taux_reussite"] * 100
+        stats = stats.rename(columns={"renseignees": "Nb de courses"})
         st.dataframe(stats[["% de réussite", "Nb de courses"]].round(2))
     else:
         st.info("ℹ️ Colonne 'discipline' manquante pour les statistiques.")
@@ -35,64 +37,56 @@ try:
     # ❌ Dernières erreurs de prédiction
     # ------------------------------
     st.markdown("### ❌ Dernières erreurs de prédiction (A1 non présent dans top 4)")
-    if "is_A1_in_top4" in df.columns:
-        df_echecs = df[df["is_A1_in_top4"] == 0].sort_values(by="date", ascending=False)
-        if df_echecs.empty:
+    # is_A1_in_top4 lu dans l'historique, ou recalculé par le cube à partir de true_A1
+    if "is_A1_in_top4" in cube.colonnes or "true_A1" in cube.colonnes:
+        if cube.erreurs.empty:
             st.success("Aucune erreur récente dans les prédictions 👌")
         else:
-            st.dataframe(df_echecs[["course_id", "date", "cheval_num", "true_A1", "discipline"]])
+            st.dataframe(cube.erreurs)
     else:
         st.warning("⚠️ Colonne 'is_A1_in_top4' non disponible.")
 
 except Exception as e:
     st.error(f"❌ Erreur lors de la lecture du fichier : {e}")
-    df = None
-
-
-# ------------------------------
-# 🔧 Fonction : Score discipline + distance
-# ------------------------------
-def get_confiance_A1_par_distance(discipline: str, distance_class: str, historique_path=historique_complet_path) -> float:
-    if not os.path.exists(historique_path):
-        return None
-
-    try:
-        df_hist = pd.read_csv(historique_path)
-
-        if "discipline" not in df_hist.columns or "is_A1_in_top4" not in df_hist.columns or "distance" not in df_hist.columns:
-            return None
-
-        # Filtrer selon la classe de distance
-        if distance_class == "courte":
-            df_hist = df_hist[df_hist["distance"] < 2200]
-        elif distance_class == "longue":
-            df_hist = df_hist[df_hist["distance"] >= 2200]
-        else:
-            return None
-
-        df_filtered = df_hist[df_hist["discipline"] == discipline]
-        if len(df_filtered) < 20:
-            return None
-
-        taux_reussite = df_filtered["is_A1_in_top4"].mean()
-        return round(taux_reussite, 3)
-
-    except Exception as e:
-        print(f"Erreur dans get_confiance_A1_par_distance : {e}")
-        return None
+    cube = None
 
 
 # ------------------------------
 # 🔍 Score de confiance par discipline et distance
 # ------------------------------
 st.markdown("### 🤖 Score de confiance par discipline × distance")
-if isinstance(df, pd.DataFrame) and "discipline" in df.columns and "distance" in df.columns:
-    for discipline in df["discipline"].dropna().unique():
+if cube is not None and "discipline" in cube.colonnes and "distance" in cube.colonnes:
+    # Mêmes scores que la page de prédiction (confiance.IndexConfiance), lus dans le cube de l'historique complet
+    try:
+        cube_confiance = get_cube_evaluation(historique_complet_path) if table_existe(historique_complet_path) else None
+    except Exception as e:
+        print(f"❌ Erreur dans le cube de confiance : {e}")
+        cube_confiance = None
+    for discipline in cube.modalites("discipline"):
         for classe in ["courte", "longue"]:
-            taux = get_confiance_A1_par_distance(discipline, classe)
+            taux = cube_confiance.taux_confiance(str(discipline), classe) if cube_confiance is not None else None
             if taux is not None:
-                st.markdown(f"- **{discipline.capitalize()} + {classe}** → {int(taux * 100)} %")
+                st.markdown(f"- **{discipline.capitalize()} + {classe}** → {int(taux * 100)} %")
             else:
                 st.markdown(f"- **{discipline.capitalize()} + {classe}** → Données insuffisantes")
 else:
     st.warning("⚠️ Colonnes 'discipline' et/ou 'distance' manquantes pour afficher les scores de confiance.")
+
+
+# ------------------------------
+# 🧊 Exploration du cube d'évaluation
+# ------------------------------
+if cube is not None and not cube.cube.empty:
+    st.markdown("### 🧊 Performances par dimension")
+    par = st.multiselect("Regrouper par", DIMENSIONS, default=["discipline", "classe"])
+    col1, col2 = st.columns(2)
+    with col1:
+        disciplines = st.multiselect("🎯 Disciplines", cube.modalites("discipline"))
+    with col2:
+        hippodromes = st.multiselect("🏟️ Hippodromes", cube.modalites("hippodrome"))
+    vue = cube.vue(par, discipline=disciplines or None, hippodrome=hippodromes or None)
+    vue = vue[["courses", "taux_top1", "taux_top4", "proba_gagnant_moyenne", "lignes", "proba_A1_moyenne", "taux_reussite"]]
+    st.dataframe(vue.round(3), use_container_width=True)
+    st.caption("rang_prono_A1 : position du vrai A1 dans les pronos (9 = hors pronos, 0 = inconnu) ; "
+               "proba_gagnant_moyenne : proba donnée au vrai A1 ; proba_A1_moyenne : proba_A1 moyenne des lignes ; "
+               "taux_reussite : moyenne de is_A1_in_top4 par ligne.")
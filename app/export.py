@@ -0,0 +1,115 @@
+# app/export.py
+
+import glob
+import hashlib
+import json
+import os
+import sys
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.stockage import colonnaire_disponible, ecrire_table_par_morceaux, jours_table, lire_par_courses, signature_table
+from app.verrous import ecrire_atomique
+
+# Exports déjà générés, réutilisés tant que la table source n'a pas changé
+DOSSIER_EXPORTS = "data/.exports"
+# Lignes lues et écrites à la fois : la mémoire ne dépend pas de la taille de l'export
+TAILLE_MORCEAU_EXPORT = 20_000
+# Limite de lignes d'une feuille Excel (en-tête compris) ; au-delà, l'export continue sur une nouvelle feuille
+LIGNES_MAX_FEUILLE = 1_048_576
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "excel": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def _morceaux(chemin_table, colonnes, debut, fin):
+    """Morceaux de la table restreints à la période [debut, fin] (dates incluses) et aux colonnes choisies."""
+    for df in lire_par_courses(chemin_table, taille=TAILLE_MORCEAU_EXPORT):
+        if (debut is not None or fin is not None) and "date" in df.columns:
+            jours = jours_table(df["date"])
+            garder = pd.Series(True, index=df.index)
+            if debut is not None:
+                garder &= jours >= pd.Timestamp(debut)
+            if fin is not None:
+                garder &= jours <= pd.Timestamp(fin)
+            df = df[garder]
+        yield df if colonnes is None else df[[c for c in colonnes if c in df.columns]]
+
+
+def _ecrire_csv(morceaux, chemin):
+    def ecrire(tmp):
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            for i, df in enumerate(morceaux):
+                df.to_csv(f, header=(i == 0), index=False, sep=";")
+    ecrire_atomique(chemin, ecrire)
+
+
+def _ecrire_excel(morceaux, chemin):
+    from openpyxl import Workbook
+
+    def ecrire(tmp):
+        # Mode write-only : les lignes sont écrites au fil de l'eau, sans garder le classeur en mémoire
+        classeur = Workbook(write_only=True)
+        feuille, lignes, entete = None, 0, None
+        for df in morceaux:
+            if entete is None:
+                entete = list(map(str, df.columns))
+            for ligne in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+                if feuille is None or lignes >= LIGNES_MAX_FEUILLE:
+                    feuille = classeur.create_sheet(f"export_{len(classeur.worksheets) + 1}")
+                    feuille.append(entete)
+                    lignes = 1
+                feuille.append(ligne)
+                lignes += 1
+        if feuille is None:
+            classeur.create_sheet("export_1").append(entete or [])
+        classeur.save(tmp)
+    ecrire_atomique(chemin, ecrire)
+
+
+def _ecrire_parquet(morceaux, chemin):
+    if not colonnaire_disponible():
+        raise ValueError("❌ pyarrow n'est pas installé : export Parquet impossible.")
+    # Même écriture par groupes de lignes que les tables du dossier data/ (qui écrit le .parquet jumeau du .csv)
+    ecrire_table_par_morceaux(morceaux, os.path.splitext(chemin)[0] + ".csv")
+
+
+ECRITURES = {"csv": _ecrire_csv, "excel": _ecrire_excel, "parquet": _ecrire_parquet}
+
+
+def exporter(chemin_table, format="csv", colonnes=None, debut=None, fin=None):
+    """
+    Génère (ou retrouve) l'export d'une table dans `format` (csv, excel ou parquet),
+    restreint aux colonnes et à la période demandées, et retourne le chemin du fichier.
+    La table est lue et écrite morceau par morceau, dans l'ordre du fichier.
+    Le résultat est gardé dans DOSSIER_EXPORTS pour cette version de la table et ces options ;
+    les exports d'une version précédente sont supprimés.
+    """
+    version = hashlib.sha256(f"{os.path.normpath(chemin_table)}|{signature_table(chemin_table)}".encode()).hexdigest()[:16]
+    options = json.dumps([format, colonnes, str(debut), str(fin)])
+    cle = hashlib.sha256(options.encode()).hexdigest()[:16]
+    base = os.path.splitext(os.path.basename(chemin_table))[0]
+    chemin = os.path.join(DOSSIER_EXPORTS, f"{base}__{version}__{cle}.{FORMATS[format][1]}")
+    if os.path.exists(chemin):
+        return chemin
+
+    os.makedirs(DOSSIER_EXPORTS, exist_ok=True)
+    ECRITURES[format](_morceaux(chemin_table, colonnes, debut, fin), chemin)
+    if not os.path.exists(chemin):
+        raise ValueError(f"❌ {chemin_table} est vide : rien à exporter.")
+
+    for ancien in glob.glob(os.path.join(DOSSIER_EXPORTS, f"{base}__*")):
+        if not os.path.basename(ancien).startswith(f"{base}__{version}__"):
+            try:
+                os.remove(ancien)
+            except OSError:
+                pass
+    return chemin
+
+
+def contenu_export(chemin_table, format="csv", colonnes=None, debut=None, fin=None):
+    """Octets de l'export (pour st.download_button, préparés seulement au clic)."""
+    with open(exporter(chemin_table, format, colonnes, debut, fin), "rb") as f:
+        return f.read()
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+PRONOS = [f"prono{i}" for i in range(1, 9)]
+
+# Sentinelles des cases vides : distinctes pour qu'un prono manquant ne soit
+# jamais considéré comme égal à une arrivée manquante.
+PRONO_ABSENT = -1
+ARRIVEE_ABSENTE = -2
+
+
+def _vers_entiers(valeurs, sentinelle):
+    """Convertit un tableau numérique (NaN/NA possibles) en int16 avec sentinelle."""
+    valeurs = np.asarray(valeurs, dtype="float64")
+    entiers = np.full(valeurs.shape, sentinelle, dtype="int16")
+    presents = ~np.isnan(valeurs)
+    entiers[presents] = valeurs[presents]
+    return entiers
+
+
+def _colonne(df, col, sentinelle):
+    if col not in df.columns:
+        return np.full(len(df), sentinelle, dtype="int16")
+    valeurs = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    return _vers_entiers(valeurs, sentinelle)
+
+
+def matrice_pronos(df, colonnes=PRONOS):
+    """Matrice (n, len(colonnes)) int16 des pronostics, PRONO_ABSENT pour les cases vides."""
+    if not colonnes:
+        return np.empty((len(df), 0), dtype="int16")
+    return np.column_stack([_colonne(df, c, PRONO_ABSENT) for c in colonnes])
+
+
+def vecteur_arrivee(df, col):
+    """Vecteur int16 d'une arrivée (a1, a2, ...), ARRIVEE_ABSENTE si inconnue."""
+    return _colonne(df, col, ARRIVEE_ABSENTE)
+
+
+def appartient(matrice, valeurs):
+    """True si valeurs[i] figure dans la ligne i de la matrice."""
+    return (matrice == valeurs[:, None]).any(axis=1)
+
+
+def rang_dans(matrice, valeurs, defaut):
+    """Position (1-based) de valeurs[i] dans la ligne i, `defaut` si absente."""
+    egal = matrice == valeurs[:, None]
+    trouve = egal.any(axis=1)
+    return np.where(trouve, egal.argmax(axis=1) + 1, defaut)
+
+
+def inferieur_a(valeurs, seuil):
+    """valeurs < seuil, les sentinelles étant toujours fausses (comme NaN < seuil)."""
+    return (valeurs >= 0) & (valeurs < seuil)
+
+
+def groupes_ordonnes(cles):
+    """
+    Prépare le parcours groupe par groupe d'une colonne de clés (ex. course_id) :
+    codes des groupes (-1 pour une clé manquante), ordre stable regroupant les lignes
+    de chaque groupe, et position de début du groupe de chaque ligne dans cet ordre.
+    """
+    codes, _ = pd.factorize(cles)
+    ordre = np.argsort(codes, kind="stable")
+    codes_tries = codes[ordre]
+    position = np.arange(len(codes))
+    nouveau_groupe = np.r_[True, codes_tries[1:] != codes_tries[:-1]][:len(codes)]
+    debut_groupe = np.maximum.accumulate(np.where(nouveau_groupe, position, 0)) if len(codes) else position
+    return codes, ordre, debut_groupe
+
+
+def ecarts_groupes(flags, groupes):
+    """
+    Écarts de compute_ecart pour chaque colonne de flags (n, k), groupe par groupe :
+    nombre de lignes sans 1 depuis le dernier 1 (remis à zéro après chaque 1).
+    Résultat (n, k) dans l'ordre d'origine des lignes.
+    """
+    _, ordre, debut_groupe = groupes
+    position = np.arange(len(flags))[:, None]
+    debut_groupe = debut_groupe[:, None]
+
+    touche = flags[ordre] == 1
+    # Position du dernier 1 strictement avant chaque ligne (-1 si aucun)
+    dernier_1 = np.maximum.accumulate(np.where(touche, position, -1), axis=0)
+    dernier_1 = np.vstack([np.full((1, flags.shape[1]), -1), dernier_1[:-1]])
+    ecarts_tries = np.where(dernier_1 >= debut_groupe, position - dernier_1, position - debut_groupe + 1) - touche
+
+    ecarts = np.empty_like(ecarts_tries)
+    ecarts[ordre] = ecarts_tries
+    return ecarts
@@ -1,5 +1,15 @@
+import numpy as np
 import pandas as pd
 import os
+import sys
+
+# ➕ Ajoute le dossier parent au chemin d'import
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.features_kernel import (
+    ARRIVEE_ABSENTE, PRONO_ABSENT, PRONOS, appartient, inferieur_a, matrice_pronos, rang_dans, vecteur_arrivee
+)
+from app.stockage import ecrire_table_par_morceaux, lire_par_courses, table_existe
 
 # Fichier source des courses complètes
 SOURCE_PATH = "data/Courses_CompletesTurfVision_id.csv"
@@ -7,68 +17,96 @@ SOURCE_PATH = "data/Courses_CompletesTurfVision_id.csv"
 OUTPUT_PATH = "data/historique_predictions_fusion.csv"
 
 
-def charger_donnees():
-    if not os.path.exists(SOURCE_PATH):
+def charger_donnees(taille_morceau=None):
+    """Courses complètes, d'un seul tenant ou morceau par morceau avec taille_morceau."""
+    if not table_existe(SOURCE_PATH):
         raise FileNotFoundError("❌ Fichier source introuvable.")
-    return pd.read_csv(SOURCE_PATH)
-
-
-def evaluer_champs_calcules(row):
-    """Calcule les features manuelles à partir des pronostics et arrivées."""
-    top3 = [row.get(f"prono{i}") for i in range(1, 4) if pd.notna(row.get(f"prono{i}"))]
-    top4 = [row.get(f"prono{i}") for i in range(1, 5) if pd.notna(row.get(f"prono{i}"))]
-    top8 = [row.get(f"prono{i}") for i in range(1, 9) if pd.notna(row.get(f"prono{i}"))]
-
-    a1, a2 = row.get("a1"), row.get("a2")
+    return lire_par_courses(SOURCE_PATH, taille=taille_morceau)
+
+
+def _liste_pronos(df, colonnes):
+    """
+    Reproduit str([pronos non vides]) pour chaque ligne.
+    Le texte n'est construit qu'une fois par combinaison distincte de pronos.
+    """
+    colonnes = [c for c in colonnes if c in df.columns]
+    if not colonnes or df.empty:
+        return pd.Series("[]", index=df.index, dtype=str)
+
+    flottantes = [pd.api.types.is_float_dtype(df[c]) for c in colonnes]
+    m = matrice_pronos(df, colonnes)
+    decale = m - m.min(axis=0)
+    cles = np.ravel_multi_index(decale.T, decale.max(axis=0) + 1)
+    inverse, _ = pd.factorize(cles)
+    uniques = m[np.unique(inverse, return_index=True)[1]]
+    textes = np.array([
+        str([float(v) if flottante else int(v) for v, flottante in zip(ligne, flottantes) if v != PRONO_ABSENT])
+        for ligne in uniques
+    ], dtype=object)
+    return pd.Series(textes[inverse], index=df.index, dtype=str)
+
+
+def evaluer_champs_calcules(df):
+    """Calcule les features manuelles à partir des pronostics et arrivées (toutes les lignes d'un coup)."""
+    m = matrice_pronos(df)
+    top3, top4 = m[:, :3], m[:, :4]
+    p1, p2, p3 = m[:, 0], m[:, 1], m[:, 2]
+
+    a1, a2 = vecteur_arrivee(df, "a1"), vecteur_arrivee(df, "a2")
+    a1_connu, a2_connu = a1 != ARRIVEE_ABSENTE, a2 != ARRIVEE_ABSENTE
+    a1_top3, a2_top3 = appartient(top3, a1), appartient(top3, a2)
+    a1_top4, a2_top4 = appartient(top4, a1), appartient(top4, a2)
+
+    distance = pd.to_numeric(df["distance"], errors="coerce") if "distance" in df.columns else pd.Series(np.nan, index=df.index)
 
     features = {
-        "top3_1": int(a1 in top3) if pd.notna(a1) else 0,
-        "top3_2": int(a2 in top3) if pd.notna(a2) else 0,
-        "top4_1": int(a1 in top4) if pd.notna(a1) else 0,
-        "top4_2": int(a2 in top4) if pd.notna(a2) else 0,
-        "a1_imp": int(a1 % 2 == 1) if pd.notna(a1) else 0,
-        "a2_imp": int(a2 % 2 == 1) if pd.notna(a2) else 0,
-        "a1_inf9": int(a1 < 9) if pd.notna(a1) else 0,
-        "a2_inf9": int(a2 < 9) if pd.notna(a2) else 0,
-        "cplg_top3": int((a1 in top3) + (a2 in top3)) if pd.notna(a1) and pd.notna(a2) else 0,
-        "cplg_top4": int((a1 in top4) + (a2 in top4)) if pd.notna(a1) and pd.notna(a2) else 0,
-        "top3_1_top4": int(row.get("prono1") in top4 and row.get("prono1") in [a1, a2]),
-        "top3_2_top4": int(row.get("prono2") in top4 and row.get("prono2") in [a1, a2]),
-        "top3_3_top4": int(row.get("prono3") in top4 and row.get("prono3") in [a1, a2]),
-        "siprono1<9-A1<9": int(row.get("prono1", 99) < 9 and a1 < 9) if pd.notna(a1) else 0,
-        "siprono2<9-A1<9": int(row.get("prono2", 99) < 9 and a1 < 9) if pd.notna(a1) else 0,
-        "siprono3<9-A1<9": int(row.get("prono3", 99) < 9 and a1 < 9) if pd.notna(a1) else 0,
-        "distance_longue": int(row.get("distance") >= 2800) if pd.notna(row.get("distance")) else 0,
-        "top3_pred": str(top3),
-        "top4_pred": str(top8),
+        "top3_1": a1_top3,
+        "top3_2": a2_top3,
+        "top4_1": a1_top4,
+        "top4_2": a2_top4,
+        "a1_imp": a1_connu & (a1 % 2 == 1),
+        "a2_imp": a2_connu & (a2 % 2 == 1),
+        "a1_inf9": inferieur_a(a1, 9),
+        "a2_inf9": inferieur_a(a2, 9),
+        "cplg_top3": np.where(a1_connu & a2_connu, a1_top3.astype(int) + a2_top3, 0),
+        "cplg_top4": np.where(a1_connu & a2_connu, a1_top4.astype(int) + a2_top4, 0),
+        "top3_1_top4": appartient(top4, p1) & ((p1 == a1) | (p1 == a2)),
+        "top3_2_top4": appartient(top4, p2) & ((p2 == a1) | (p2 == a2)),
+        "top3_3_top4": appartient(top4, p3) & ((p3 == a1) | (p3 == a2)),
+        "siprono1<9-A1<9": inferieur_a(p1, 9) & inferieur_a(a1, 9),
+        "siprono2<9-A1<9": inferieur_a(p2, 9) & inferieur_a(a1, 9),
+        "siprono3<9-A1<9": inferieur_a(p3, 9) & inferieur_a(a1, 9),
+        "distance_longue": (distance >= 2800).to_numpy(),
     }
+    df_feats = pd.DataFrame({col: valeurs.astype(int) for col, valeurs in features.items()}, index=df.index)
 
-    try:
-        features["prono_rank_a1"] = next((i for i in range(1, 9) if row.get(f"prono{i}") == a1), None)
-        features["prono_rank_a2"] = next((i for i in range(1, 9) if row.get(f"prono{i}") == a2), None)
-    except:
-        features["prono_rank_a1"] = None
-        features["prono_rank_a2"] = None
-
-    return pd.Series(features)
+    df_feats["top3_pred"] = _liste_pronos(df, PRONOS[:3])
+    df_feats["top4_pred"] = _liste_pronos(df, PRONOS)
+    df_feats["prono_rank_a1"] = rang_dans(m, a1, np.nan)
+    df_feats["prono_rank_a2"] = rang_dans(m, a2, np.nan)
 
+    return df_feats
 
-def generer_features():
-    df = charger_donnees()
 
+def _enrichir(df):
     # Conserver uniquement les lignes avec A1 et A2 connus
     df = df.dropna(subset=["a1", "a2"], how="any")
 
-    # Appliquer les features calculées ligne par ligne
-    df_feats = df.apply(evaluer_champs_calcules, axis=1)
+    # Calcul vectorisé des features sur toutes les lignes
+    df_feats = evaluer_champs_calcules(df)
 
     # Fusion avec les données initiales
-    df_final = pd.concat([df.reset_index(drop=True), df_feats], axis=1)
+    return pd.concat([df.reset_index(drop=True), df_feats.reset_index(drop=True)], axis=1)
+
+
+def generer_features(taille_morceau=None):
+    """Une ligne par course : avec taille_morceau, les courses sont enrichies et écrites morceau par morceau."""
+    morceaux = (_enrichir(df) for df in charger_donnees(taille_morceau))
 
     # Export final
-    df_final.to_csv(OUTPUT_PATH, index=False)
-    print(f"✅ Données enrichies sauvegardées dans {OUTPUT_PATH} ({len(df_final)} lignes)")
+    nb_lignes = ecrire_table_par_morceaux(morceaux, OUTPUT_PATH)
+    print(f"✅ Données enrichies sauvegardées dans {OUTPUT_PATH} ({nb_lignes} lignes)")
 
 
 if __name__ == "__main__":
-    generer_features()
+    generer_features(taille_morceau=int(sys.argv[sys.argv.index("--flux") + 1]) if "--flux" in sys.argv else None)
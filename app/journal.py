@@ -0,0 +1,90 @@
+# app/journal.py
+
+import json
+import os
+import threading
+
+from app.verrous import verrou
+
+
+class Journal:
+    """
+    Journal d'événements en ajout seul (une ligne JSON par événement).
+    Chaque ajout est écrit puis fsync avant de rendre la main : c'est la seule écriture
+    faite au moment de la saisie. Le compactage replie ensuite les événements dans les
+    tables de référence.
+    """
+
+    def __init__(self, chemin):
+        self.chemin = chemin
+        self.chemin_compactage = chemin + ".compactage"
+        self._verrou_compactage = threading.Lock()
+        self.nb_evenements = sum(len(self._lire(c)) for c in (self.chemin_compactage, self.chemin))
+
+    def _verrou(self):
+        """Verrou du fichier journal, partagé par toutes les sessions (threads et processus)."""
+        return verrou(f"journal:{self.chemin}")
+
+    @staticmethod
+    def _lire(chemin):
+        if not os.path.exists(chemin):
+            return []
+        evenements = []
+        with open(chemin, encoding="utf-8") as f:
+            for ligne in f:
+                try:
+                    evenements.append(json.loads(ligne))
+                except json.JSONDecodeError:
+                    # Dernière ligne tronquée par un arrêt brutal : l'événement n'a jamais été confirmé
+                    break
+        return evenements
+
+    def ajouter(self, evenement):
+        ligne = json.dumps(evenement, ensure_ascii=False, default=_valeur_json) + "\n"
+        with self._verrou():
+            with open(self.chemin, "a", encoding="utf-8") as f:
+                f.write(ligne)
+                f.flush()
+                os.fsync(f.fileno())
+            self.nb_evenements += 1
+
+    def evenements(self):
+        """Événements pas encore compactés, du plus ancien au plus récent."""
+        with self._verrou():
+            return self._lire(self.chemin_compactage) + self._lire(self.chemin)
+
+    def compacter(self, appliquer):
+        """
+        Replie les événements en attente avec appliquer(evenements), qui doit être idempotent.
+        Le journal courant est d'abord mis de côté (renommage atomique) : les ajouts continuent
+        pendant le compactage, et un compactage interrompu est repris au passage suivant.
+        Retourne le nombre d'événements repliés.
+        """
+        with self._verrou_compactage, verrou(f"compactage:{self.chemin}"):
+            with self._verrou():
+                if not os.path.exists(self.chemin_compactage):
+                    if not os.path.exists(self.chemin):
+                        return 0
+                    os.replace(self.chemin, self.chemin_compactage)
+                evenements = self._lire(self.chemin_compactage)
+
+            if evenements:
+                appliquer(evenements)
+
+            with self._verrou():
+                os.remove(self.chemin_compactage)
+                self.nb_evenements = max(self.nb_evenements - len(evenements), 0)
+            return len(evenements)
+
+    def compacter_en_arriere_plan(self, appliquer):
+        """Lance le compactage dans un thread, sauf s'il y en a déjà un en cours."""
+        if self._verrou_compactage.locked():
+            return
+        threading.Thread(target=self.compacter, args=(appliquer,), daemon=True).start()
+
+
+def _valeur_json(v):
+    """Valeurs numpy (int64, float32...) converties en types Python."""
+    if hasattr(v, "item"):
+        return v.item()
+    raise TypeError(f"Type non sérialisable : {type(v).__name__}")
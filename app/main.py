@@ -23,6 +23,11 @@ page = st.sidebar.radio("📚 Menu", [
     "🕒 Courses en attente"
 ])
 
+# --- Tâches en arrière-plan (reconstructions, features, entraînement) ---
+with st.sidebar.expander("⚙️ Tâches"):
+    from app.ui_taches import afficher_taches
+    afficher_taches()
+
 # --- Routage ---
 if page == "🔮 Prédire une course":
     try:
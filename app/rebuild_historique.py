@@ -1,75 +1,233 @@
 import pandas as pd
+import json
 import os
 import sys
-import joblib
 
 # ➕ Ajoute le dossier parent au chemin d'import
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from model.predictor import TurfPredictor
+from model.loader import get_predictor
+from model.predictor import checkpoint_version
+from app.compute_features import calculer_features, eclater_courses
+from app.registre_features import colonnes_a_lire, normaliser_colonnes
+from app.retrait_A1 import marquer_si_A1_dans_top4
+from app.stockage import ecrire_table_par_morceaux, lire_par_courses, modifier_table, remplacer_lignes, table_existe
+from app.verrous import ecrire_json, verrou_table
 
-def reconstruire_historique():
-    source_path = "data/chevaux_par_course.csv"
-    model_path = "model/checkpoints/model_a1.joblib"
-    scaler_path = "model/checkpoints/scaler_a1.joblib"
-    output_path = "data/historique_predictions.csv"
+SOURCE_PATH = "data/chevaux_par_course.csv"
+MODEL_PATH = "model/checkpoints/model_a1.joblib"
+SCALER_PATH = "model/checkpoints/scaler_a1.joblib"
+OUTPUT_PATH = "data/historique_predictions.csv"
+# Repère des courses déjà scorées : version du modèle + empreinte des données de chaque course
+WATERMARK_PATH = "data/historique_predictions.watermark.json"
 
-    if not os.path.exists(source_path):
-        print("❌ Fichier source introuvable :", source_path)
+COLONNES_MIN = ["id_course", "date", "discipline", "cheval_num", "a1"]
+COLONNES_SORTIE = ["a2", "a3", "a4", "distance", "numcourse", "hippodrome"]
+
+
+def _charger_watermark():
+    if not os.path.exists(WATERMARK_PATH):
+        return {"version_modele": None, "courses": {}}
+    with open(WATERMARK_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _sauver_watermark(watermark):
+    ecrire_json(WATERMARK_PATH, watermark)
+
+
+def _completer_watermark(version, empreintes, retirees=()):
+    """
+    Ajoute des empreintes au repère relu sous verrou (sans écraser celles d'une autre session)
+    et oublie les courses retirées.
+    """
+    with verrou_table(WATERMARK_PATH):
+        watermark = _charger_watermark()
+        if watermark["version_modele"] == version:
+            watermark["courses"].update(empreintes)
+            for course in retirees:
+                watermark["courses"].pop(course, None)
+            _sauver_watermark(watermark)
+
+
+def _colonnes_empreinte(predictor):
+    """Colonnes prises en compte dans l'empreinte d'une course (mêmes colonnes sur tous les chemins)."""
+    return sorted(set(COLONNES_MIN + COLONNES_SORTIE + predictor.features))
+
+
+def _valeurs_empreinte(serie):
+    """
+    Valeurs d'une colonne indépendamment de son type de stockage (int8, category, float64, object...) :
+    en float64 si toutes les valeurs sont numériques, en texte sinon (None pour une valeur manquante).
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype(object)
+    nombres = pd.to_numeric(serie, errors="coerce")
+    if nombres.notna().sum() == serie.notna().sum():
+        return nombres.astype("float64")
+    return serie.astype(object).where(serie.notna(), None).astype(str)
+
+
+def _empreintes_courses(df, colonnes):
+    """
+    Empreinte (hash) des données de chaque course, insensible à l'ordre des lignes,
+    à l'ordre des colonnes et à leurs types : une course a la même empreinte, qu'elle vienne
+    de la table Parquet compacte ou de features calculées en mémoire.
+    """
+    colonnes = sorted(c for c in set(colonnes) if c in df.columns)
+    valeurs = pd.DataFrame({c: _valeurs_empreinte(df[c]) for c in colonnes}, index=df.index)
+    hashes = pd.util.hash_pandas_object(valeurs, index=False)
+    empreintes = hashes.groupby(df["id_course"].astype(str).to_numpy()).sum()
+    return {str(course): str(int(h)) for course, h in empreintes.items()}
+
+
+def _supprimer_courses(courses):
+    """Retire de l'historique les lignes des courses qui n'existent plus dans la source."""
+    courses = set(courses)
+
+    def retirer(existant):
+        if existant is None:
+            return existant
+        return existant[~existant["course_id"].astype(str).isin(courses)]
+
+    modifier_table(OUTPUT_PATH, retirer)
+
+
+def _scorer(df, predictor, top4_predit=False):
+    """
+    Calcule proba_A1 et construit les lignes de l'historique pour toutes les lignes cheval de df.
+    is_A1_in_top4 vaut 1 si le cheval est arrivé dans les 4 premiers ; avec top4_predit,
+    il indique à la place si le vrai A1 figure dans le top 4 prédit de sa course.
+    """
+    for col in COLONNES_MIN:
+        if col not in df.columns:
+            raise ValueError(f"Colonne manquante : {col}")
+
+    features = predictor.features
+    X = df.reindex(columns=features, fill_value=0)
+    proba = predictor.predict_proba_A1(X)
+
+    cheval = df["cheval_num"]
+    arrivees = [df[f"a{i}"] for i in range(1, 5) if f"a{i}" in df.columns]
+    dans_top4 = pd.concat([cheval == a for a in arrivees], axis=1).any(axis=1)
+
+    df_out = pd.DataFrame({
+        "course_id": df["id_course"].to_numpy(),
+        "date": df["date"].to_numpy(),
+        "discipline": df["discipline"].to_numpy(),
+        "cheval_num": cheval.to_numpy(),
+        "true_A1": df["a1"].astype(int).to_numpy(),
+        "is_A1_in_top4": dans_top4.astype(int).to_numpy(),
+        "proba_A1": proba,
+        "distance": df["distance"].to_numpy() if "distance" in df.columns else 0,
+        "num_course": df["numcourse"].to_numpy() if "numcourse" in df.columns else "",
+        "hippodrome": df["hippodrome"].to_numpy() if "hippodrome" in df.columns else "",
+    })
+    if top4_predit:
+        df_out = marquer_si_A1_dans_top4(df_out)
+    return df_out
+
+
+def _charger_predictor():
+    return get_predictor(MODEL_PATH, SCALER_PATH)
+
+
+def reconstruire_historique(incremental=False, top4_predit=False, taille_morceau=None):
+    """
+    Recalcule historique_predictions à partir de chevaux_par_course.
+    En mode incrémental, seules les courses nouvelles ou modifiées depuis le dernier passage
+    sont rescorées ; un changement de checkpoint force une reconstruction complète.
+    top4_predit applique directement marquer_si_A1_dans_top4 (au lieu d'un passage retrait_A1 séparé).
+    Avec taille_morceau, chevaux_par_course est lu, scoré et écrit par morceaux de courses
+    entières : la mémoire reste bornée et l'historique est le même qu'en un seul passage.
+    """
+    if not table_existe(SOURCE_PATH):
+        raise FileNotFoundError(f"Fichier source introuvable : {SOURCE_PATH}")
+
+    # 🔍 Chargement du modèle
+    predictor = _charger_predictor()
+    version = checkpoint_version(MODEL_PATH, SCALER_PATH)
+    watermark = _charger_watermark()
+    complet = (
+        not incremental
+        or watermark["version_modele"] != version
+        or not table_existe(OUTPUT_PATH)
+    )
+
+    # 📥 Chargement des seules colonnes utiles, course par course
+    colonnes = COLONNES_MIN + COLONNES_SORTIE + colonnes_a_lire(predictor.features)
+    empreintes = {}
+
+    def morceaux():
+        for df in lire_par_courses(SOURCE_PATH, cle="id_course", colonnes=colonnes, taille=taille_morceau):
+            df = normaliser_colonnes(df)
+            if "id_course" not in df.columns:
+                raise ValueError("Colonne manquante : id_course")
+            empreintes_morceau = _empreintes_courses(df, _colonnes_empreinte(predictor))
+            empreintes.update(empreintes_morceau)
+            if complet:
+                yield _scorer(df, predictor, top4_predit)
+                continue
+            a_scorer = [c for c, h in empreintes_morceau.items() if watermark["courses"].get(c) != h]
+            if a_scorer:
+                yield _scorer(df[df["id_course"].astype(str).isin(a_scorer)], predictor, top4_predit)
+
+    if complet:
+        nb_lignes = ecrire_table_par_morceaux(morceaux(), OUTPUT_PATH)
+        _sauver_watermark({"version_modele": version, "courses": empreintes})
+        print(f"✅ Historique reconstruit avec prédictions : {OUTPUT_PATH} ({nb_lignes} lignes)")
         return
 
-    try:
-        # 📥 Chargement des données
-        df = pd.read_csv(source_path)
-
-        colonnes_min = ["id_course", "date", "discipline", "cheval_num", "a1"]
-        for col in colonnes_min:
-            if col not in df.columns:
-                raise ValueError(f"Colonne manquante : {col}")
-
-        # 🔍 Chargement du modèle
-        predictor = TurfPredictor()
-        predictor.load(model_path, scaler_path)
-
-        # ⚙️ Préparation des features pour la prédiction
-        features = predictor.features
-        df_pred = df.copy()
-        for col in features:
-            if col not in df_pred.columns:
-                df_pred[col] = 0
-
-        df_pred["proba_A1"] = predictor.model.predict_proba(
-            predictor.scaler.transform(df_pred[features])
-        )[:, 1]
-
-        # 🧱 Construction de l'historique ligne par ligne
-        lignes = []
-        for _, row in df_pred.iterrows():
-            cheval = row["cheval_num"]
-            top4_arrives = [row.get(f"a{i}", None) for i in range(1, 5)]
-            top4_arrives = [x for x in top4_arrives if pd.notna(x)]
-
-            ligne = {
-                "course_id": row["id_course"],
-                "date": row["date"],
-                "discipline": row["discipline"],
-                "cheval_num": cheval,
-                "true_A1": int(row["a1"]),
-                "is_A1_in_top4": int(cheval in top4_arrives),
-                "proba_A1": row["proba_A1"],
-                "distance": row.get("distance", 0),
-                "num_course": row.get("numcourse", ""),
-                "hippodrome": row.get("hippodrome", "")
-            }
-
-            lignes.append(ligne)
-
-        df_out = pd.DataFrame(lignes)
-        df_out.to_csv(output_path, index=False)
-        print(f"✅ Historique reconstruit avec prédictions : {output_path} ({len(df_out)} lignes)")
+    # Incrémental : seules les lignes des courses modifiées sont gardées en mémoire
+    scorees = list(morceaux())
+    # Courses retirées de la source : supprimées de l'historique, comme le ferait une reconstruction complète
+    disparues = [c for c in watermark["courses"] if c not in empreintes]
+    if not scorees and not disparues:
+        print("✅ Historique déjà à jour.")
+        return
+    a_scorer = [c for c, h in empreintes.items() if watermark["courses"].get(c) != h]
+    nb_lignes = 0
+    if scorees:
+        df_out = pd.concat(scorees, ignore_index=True)
+        remplacer_lignes(df_out, OUTPUT_PATH, cle="course_id")
+        nb_lignes = len(df_out)
+    if disparues:
+        _supprimer_courses(disparues)
+    _completer_watermark(version, {c: empreintes[c] for c in a_scorer}, disparues)
+    print(f"✅ Historique mis à jour : {len(a_scorer)} course(s), {nb_lignes} lignes, {len(disparues)} course(s) retirée(s)")
+
+
+def mettre_a_jour_courses(df_courses):
+    """
+    Score directement des courses complétées (une ligne par course, pronos + arrivées)
+    et les insère dans l'historique, sans relire chevaux_par_course.
+    Si le checkpoint a changé depuis le dernier passage, l'historique est d'abord reconstruit
+    en entier, puis ces courses sont scorées comme d'habitude (elles peuvent manquer à la source).
+    Retourne les lignes d'historique des courses scorées.
+    """
+    watermark = _charger_watermark()
+    version = checkpoint_version(MODEL_PATH, SCALER_PATH)
+    if (watermark["version_modele"] != version or not table_existe(OUTPUT_PATH)) and table_existe(SOURCE_PATH):
+        reconstruire_historique()
+
+    predictor = _charger_predictor()
+    df = calculer_features(eclater_courses(df_courses), include_target=True, features=predictor.features)
+    df_out = _scorer(df, predictor)
+    remplacer_lignes(df_out, OUTPUT_PATH, cle="course_id")
+
+    empreintes = _empreintes_courses(df, _colonnes_empreinte(predictor))
+    _completer_watermark(version, empreintes)
+    print(f"✅ Historique mis à jour : {len(empreintes)} course(s), {len(df_out)} lignes")
+    return df_out
 
-    except Exception as e:
-        print("❌ Erreur :", e)
 
 if __name__ == "__main__":
-    reconstruire_historique()
+    try:
+        reconstruire_historique(
+            incremental="--incremental" in sys.argv,
+            top4_predit="--top4-predit" in sys.argv,
+            taille_morceau=int(sys.argv[sys.argv.index("--flux") + 1]) if "--flux" in sys.argv else None,
+        )
+    except Exception as e:
+        print("❌ Erreur :", e)
+        sys.exit(1)
@@ -0,0 +1,243 @@
+# app/registre_features.py
+
+import numpy as np
+
+from app.features_kernel import (
+    PRONOS, appartient, ecarts_groupes, groupes_ordonnes, inferieur_a, matrice_pronos, rang_dans, vecteur_arrivee
+)
+
+
+class Feature:
+    """
+    Une feature du registre : ses entrées (colonnes brutes ou autres features du registre)
+    et une fonction vectorisée calcul(df, valeurs) -> np.ndarray, où valeurs contient
+    les features dont elle dépend. Une feature `cible` utilise le résultat de la course
+    (is_A1) et vaut 0 quand la cible est inconnue. Les noms en _ sont des intermédiaires.
+    """
+
+    def __init__(self, nom, entrees, calcul, cible=False):
+        self.nom = nom
+        self.entrees = list(entrees)
+        self.calcul = calcul
+        self.cible = cible
+
+
+REGISTRE = {}
+
+
+def enregistrer(nom, entrees, cible=False):
+    def decorateur(calcul):
+        REGISTRE[nom] = Feature(nom, entrees, calcul, cible)
+        return calcul
+    return decorateur
+
+
+# Anciens noms rencontrés dans les CSV (casse différente) -> nom canonique du registre
+ALIAS = {
+    "siprono1<9-a1<9": "siprono1<9-A1<9",
+    "siprono2<9-a1<9": "siprono2<9-A1<9",
+    "siprono3<9-a1<9": "siprono3<9-A1<9",
+    "is_a1_ecart": "is_A1_ecart",
+    "is_a2_ecart": "is_A2_ecart",
+}
+
+
+# --- Intermédiaires partagés ---
+
+@enregistrer("_pronos", PRONOS)
+def _pronos(df, v):
+    return matrice_pronos(df)
+
+
+@enregistrer("_a1", ["a1"])
+def _a1(df, v):
+    return vecteur_arrivee(df, "a1")
+
+
+@enregistrer("_a2", ["a2"])
+def _a2(df, v):
+    return vecteur_arrivee(df, "a2")
+
+
+@enregistrer("_courses", ["course_id"])
+def _courses(df, v):
+    return groupes_ordonnes(df["course_id"])
+
+
+# --- Présence de A1 / A2 dans les pronos ---
+
+@enregistrer("top3_1", ["_pronos", "_a1"])
+def _top3_1(df, v):
+    return appartient(v["_pronos"][:, :3], v["_a1"]).astype(int)
+
+
+@enregistrer("top3_2", ["_pronos", "_a2"])
+def _top3_2(df, v):
+    return appartient(v["_pronos"][:, :3], v["_a2"]).astype(int)
+
+
+@enregistrer("top4_1", ["_pronos", "_a1"])
+def _top4_1(df, v):
+    return appartient(v["_pronos"][:, 3:7], v["_a1"]).astype(int)
+
+
+@enregistrer("top4_2", ["_pronos", "_a2"])
+def _top4_2(df, v):
+    return appartient(v["_pronos"][:, 3:7], v["_a2"]).astype(int)
+
+
+# --- Infos diverses sur A1 / A2 (NaN conservé pour une arrivée vide, comme df['a1'] % 2) ---
+
+def _parite(col):
+    return lambda df, v: (df[col] % 2).to_numpy() if col in df else np.zeros(len(df), dtype=int)
+
+
+def _inf9(col):
+    return lambda df, v: (df[col] < 9).astype(int).to_numpy() if col in df else np.zeros(len(df), dtype=int)
+
+
+enregistrer("a1_imp", ["a1"])(_parite("a1"))
+enregistrer("a2_imp", ["a2"])(_parite("a2"))
+enregistrer("a1_inf9", ["a1"])(_inf9("a1"))
+enregistrer("a2_inf9", ["a2"])(_inf9("a2"))
+
+
+# --- Couples ---
+
+@enregistrer("cplg_top3", ["top3_1", "top3_2"])
+def _cplg_top3(df, v):
+    return v["top3_1"] + v["top3_2"]
+
+
+@enregistrer("cplg_top4", ["top4_1", "top4_2"])
+def _cplg_top4(df, v):
+    return v["top4_1"] + v["top4_2"]
+
+
+# --- Liens entre top3 et top4 ---
+
+def _arrive(p, a1, a2):
+    return (p == a1) | (p == a2)
+
+
+@enregistrer("top3_1_top4", ["_pronos", "_a1", "_a2"])
+def _top3_1_top4(df, v):
+    p1 = v["_pronos"][:, 0]
+    arrive = _arrive(p1, v["_a1"], v["_a2"])
+    return np.where(arrive & appartient(v["_pronos"][:, 3:7], p1), 2, arrive.astype(int))
+
+
+@enregistrer("top3_2_top4", ["_pronos", "_a1", "_a2"])
+def _top3_2_top4(df, v):
+    return _arrive(v["_pronos"][:, 1], v["_a1"], v["_a2"]).astype(int)
+
+
+@enregistrer("top3_3_top4", ["_pronos", "_a1", "_a2"])
+def _top3_3_top4(df, v):
+    return _arrive(v["_pronos"][:, 2], v["_a1"], v["_a2"]).astype(int)
+
+
+# --- Interactions < 9 ---
+
+def _siprono(i):
+    return lambda df, v: (inferieur_a(v["_pronos"][:, i], 9) & inferieur_a(v["_a1"], 9)).astype(int)
+
+
+for _i in range(3):
+    enregistrer(f"siprono{_i + 1}<9-A1<9", ["_pronos", "_a1"])(_siprono(_i))
+
+
+# --- Rang des pronos associés à A1 / A2 (9 si absent des pronos) ---
+
+@enregistrer("prono_rank_a1", ["_pronos", "_a1"])
+def _prono_rank_a1(df, v):
+    return rang_dans(v["_pronos"], v["_a1"], 9).astype(int)
+
+
+@enregistrer("prono_rank_a2", ["_pronos", "_a2"])
+def _prono_rank_a2(df, v):
+    return rang_dans(v["_pronos"], v["_a2"], 9).astype(int)
+
+
+# --- Écarts par course (pondérés par is_A1) ---
+
+COLONNES_ECART = [
+    'top3_1', 'top3_2', 'top4_1', 'top4_2',
+    'a1_imp', 'a2_imp', 'a1_inf9', 'a2_inf9',
+    'cplg_top3', 'cplg_top4',
+    'top3_1_top4', 'top3_2_top4', 'top3_3_top4'
+]
+
+
+def _ecart(col):
+    def calcul(df, v):
+        flags = np.nan_to_num(np.asarray(v[col], dtype=float)) * df["is_A1"].fillna(0).to_numpy()
+        ecarts = ecarts_groupes(flags[:, None], v["_courses"])[:, 0]
+        # Lignes sans identifiant de course : aucun groupe, donc pas d'écart
+        if (v["_courses"][0] < 0).any():
+            return np.where(v["_courses"][0] < 0, np.nan, ecarts)
+        return ecarts.astype(int)
+    return calcul
+
+
+for _col in COLONNES_ECART:
+    enregistrer(f"{_col}_ecart", [_col, "is_A1", "_courses"], cible=True)(_ecart(_col))
+
+
+# Features publiques, dans l'ordre historique des colonnes (celui attendu par le checkpoint A1)
+FEATURES = [nom for nom in REGISTRE if not nom.startswith("_")]
+FEATURES_CIBLES = [nom for nom in FEATURES if REGISTRE[nom].cible]
+
+
+def dependances(noms):
+    """Features à calculer pour obtenir `noms` (intermédiaires compris), dans l'ordre des dépendances."""
+    ordre, vus = [], set()
+
+    def visiter(nom):
+        if nom in vus or nom not in REGISTRE:
+            return
+        vus.add(nom)
+        for entree in REGISTRE[nom].entrees:
+            visiter(entree)
+        ordre.append(nom)
+
+    for nom in noms:
+        visiter(nom)
+    return ordre
+
+
+def colonnes_requises(noms):
+    """Colonnes brutes lues par le calcul de `noms` (hors features du registre)."""
+    colonnes = []
+    for nom in dependances(noms):
+        colonnes += [c for c in REGISTRE[nom].entrees if c not in REGISTRE and c not in colonnes]
+    return colonnes
+
+
+def colonnes_a_lire(noms):
+    """`noms` et leurs anciens noms, pour une lecture projetée d'une table existante."""
+    return list(noms) + [alias for alias, nom in ALIAS.items() if nom in noms]
+
+
+def normaliser_colonnes(df):
+    """Renomme les anciens noms de colonnes vers le nom canonique quand celui-ci est absent."""
+    renommage = {alias: nom for alias, nom in ALIAS.items() if alias in df.columns and nom not in df.columns}
+    return df.rename(columns=renommage) if renommage else df
+
+
+def evaluer(df, noms, include_target=True, valeurs=None):
+    """
+    Calcule seulement `noms` et leurs dépendances, chacune une seule fois (les valeurs déjà
+    présentes dans le cache `valeurs`, complété au passage, ne sont pas recalculées).
+    Sans cible (include_target=False), les features `cible` valent 0 et leurs entrées
+    ne sont pas calculées. Retourne {nom: np.ndarray} pour les noms demandés.
+    """
+    demandes = [ALIAS.get(n, n) for n in noms if ALIAS.get(n, n) in REGISTRE]
+    a_zero = [] if include_target else [n for n in demandes if REGISTRE[n].cible]
+    valeurs = {} if valeurs is None else valeurs
+    for nom in dependances([n for n in demandes if n not in a_zero]):
+        if nom not in valeurs:
+            valeurs[nom] = REGISTRE[nom].calcul(df, valeurs)
+    for nom in a_zero:
+        valeurs[nom] = np.zeros(len(df), dtype=int)
+    return {nom: valeurs[nom] for nom in demandes}
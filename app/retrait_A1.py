@@ -1,47 +1,49 @@
-import pandas as pd
 import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.stockage import ecrire_table, lire_table, table_existe
+
+def rang_par_course(df, colonne="proba_A1", groupe="course_id"):
+    """Rang de chaque ligne dans sa course (1 = plus forte valeur), en un seul passage groupé."""
+    return df.groupby(groupe, sort=False)[colonne].rank(method="first", ascending=False)
 
 def marquer_si_A1_dans_top4(df):
     """
     Pour chaque course, marque si le cheval 'true_A1' est dans le top 4 prédit (colonne 'cheval_num').
+    Toutes les courses sont traitées d'un coup : rang de proba_A1 par course, puis agrégat par course.
     """
     if 'true_A1' not in df.columns:
         print("❌ Colonne 'true_A1' manquante.")
         return df
 
-    # On initialise la colonne
-    df["is_A1_in_top4"] = 0
-
-    # Pour chaque course
-    for course_id in df["course_id"].unique():
-        course_df = df[df["course_id"] == course_id]
-        if course_df.empty:
-            continue
-
-        vrai_A1 = course_df["true_A1"].iloc[0]
-        top4_chevaux = course_df.sort_values("proba_A1", ascending=False).head(4)["cheval_num"].tolist()
+    courses = df["course_id"]
+    dans_top4 = rang_par_course(df) <= 4
+    vrai_A1 = df.groupby(courses, sort=False)["true_A1"].transform("first")
+    est_A1 = df["cheval_num"] == vrai_A1
 
-        # Marquer les lignes du top4 avec is_A1_in_top4 = 1 si cheval = true_A1
-        df.loc[(df["course_id"] == course_id) & (df["cheval_num"] == vrai_A1), "is_A1_in_top4"] = int(vrai_A1 in top4_chevaux)
+    # 1 sur les lignes du vrai A1 si ce cheval figure dans le top 4 prédit de sa course
+    a1_dans_top4 = (est_A1 & dans_top4).groupby(courses, sort=False).transform("any")
+    df["is_A1_in_top4"] = (est_A1 & a1_dans_top4).astype(int)
 
     return df
 
 def main():
     chemin = "data/historique_predictions.csv"
 
-    if not os.path.exists(chemin):
+    if not table_existe(chemin):
         print("❌ Le fichier historique_predictions.csv est introuvable.")
         return
 
     try:
-        df = pd.read_csv(chemin)
+        df = lire_table(chemin)
 
         if "cheval_num" not in df.columns or "course_id" not in df.columns:
             print("❌ Colonnes nécessaires manquantes.")
             return
 
         df = marquer_si_A1_dans_top4(df)
-        df.to_csv(chemin, index=False)
+        ecrire_table(df, chemin)
         print("✅ Fichier mis à jour avec is_A1_in_top4.")
     except Exception as e:
         print(f"❌ Erreur : {e}")
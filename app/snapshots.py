@@ -0,0 +1,96 @@
+# app/snapshots.py
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.stockage import lire_table, signature_table
+
+# Mémoire maximale occupée par les tables gardées en mémoire (Mo), modifiable par TURF_SNAPSHOTS_MO
+TAILLE_MAX_MO = float(os.environ.get("TURF_SNAPSHOTS_MO", 512))
+
+
+class CacheSnapshots:
+    """
+    Tables du dossier data/ lues une fois et partagées par toutes les pages et sessions du processus.
+    Une entrée est valable tant que l'identité du fichier (inode, taille, date) ne change pas ;
+    sinon la table est relue et remplace l'ancienne, que les lecteurs en cours gardent intacte.
+    Au-delà de taille_max_mo, les tables les moins récemment lues sont évincées.
+    """
+
+    def __init__(self, taille_max_mo=TAILLE_MAX_MO):
+        self.taille_max = int(taille_max_mo * 1e6)
+        self._verrou = threading.Lock()
+        self._entrees = OrderedDict()  # clé -> (signature, df, octets)
+        self.octets = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def _retirer(self, cle):
+        _, _, octets = self._entrees.pop(cle)
+        self.octets -= octets
+
+    def lire(self, chemin, colonnes=None, **options_csv):
+        """
+        lire_table(chemin, colonnes) (ou pd.read_csv(chemin, **options_csv) pour un fichier hors
+        tables, ex. header=None), servie depuis la mémoire si le fichier n'a pas changé.
+        Retourne une copie superficielle : avec le copy-on-write de pandas, la modifier
+        (ajout de colonne, .loc) ne touche jamais la version partagée.
+        """
+        cle = (os.path.normpath(chemin), None if colonnes is None else tuple(colonnes), tuple(sorted(options_csv.items())))
+        signature = signature_table(chemin)
+
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is not None and entree[0] == signature:
+                self._entrees.move_to_end(cle)
+                self.hits += 1
+                return entree[1].copy(deep=False)
+            self.misses += 1
+
+        df = pd.read_csv(chemin, **options_csv) if options_csv else lire_table(chemin, colonnes=colonnes)
+        octets = int(df.memory_usage(deep=True).sum())
+
+        with self._verrou:
+            # Les versions périmées de ce fichier (autres projections comprises) sont libérées
+            for autre in [k for k, (sig, _, _) in self._entrees.items() if k[0] == cle[0] and sig != signature]:
+                self._retirer(autre)
+            if cle in self._entrees:
+                self._retirer(cle)
+            if octets <= self.taille_max:
+                self._entrees[cle] = (signature, df, octets)
+                self.octets += octets
+                while self.octets > self.taille_max:
+                    self._retirer(next(iter(self._entrees)))
+                    self.evictions += 1
+        return df.copy(deep=False)
+
+    def stats(self):
+        with self._verrou:
+            return {
+                "tables": len(self._entrees),
+                "memoire_mo": round(self.octets / 1e6, 2),
+                "taille_max_mo": self.taille_max / 1e6,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+            self.octets = 0
+
+
+_snapshots = CacheSnapshots()
+
+
+def get_snapshots():
+    return _snapshots
+
+
+def lire_snapshot(chemin, colonnes=None, **options_csv):
+    """Lecture d'une table via le cache partagé du processus (voir CacheSnapshots.lire)."""
+    return _snapshots.lire(chemin, colonnes, **options_csv)
@@ -0,0 +1,219 @@
+# app/stats_performance.py
+
+import itertools
+import json
+import os
+import sys
+from datetime import date
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.confiance import HISTORIQUE_PATH, TOUTES, classe_distance
+from app.retrait_A1 import rang_par_course
+from app.stockage import jours_table, lire_table, signature_table
+from app.verrous import ecrire_json
+
+STATS_PATH = "data/stats_performance.json"
+# Seuil des filtres de distance de la page statistiques (< 2800 m / ≥ 2800 m)
+SEUIL_LONGUE = 2800
+SANS_HIPPODROME = "?"
+# Fenêtres glissantes en jours avant la date de référence (None : tout l'historique)
+FENETRES = {"total": None, "365j": 365, "90j": 90, "30j": 30}
+MESURES = ["courses", "top1", "top4"]
+COLONNES_HISTORIQUE = ["course_id", "date", "discipline", "distance", "hippodrome", "cheval_num", "true_A1", "proba_A1"]
+
+
+def resume_courses(df, seuil=SEUIL_LONGUE):
+    """
+    Une ligne par course de l'historique (lignes cheval avec proba_A1) : jour, discipline,
+    classe de distance (seuil en mètres), hippodrome, gagnant prédit exact (top1) et vrai A1 dans
+    le top 4 prédit (top4), ainsi que le vrai A1, le nombre de lignes et la proba_A1 donnée au vrai A1
+    (gagnant vaut 0 si sa ligne est absente).
+    """
+    df = df.reindex(columns=COLONNES_HISTORIQUE)
+    # Courses sans arrivée connue (prédictions en attente de résultat) : non évaluables
+    df = df[df["course_id"].notna() & df["discipline"].notna() & df["true_A1"].notna()]
+    rang = rang_par_course(df)
+    est_A1 = df["cheval_num"] == df["true_A1"]
+    courses = df.assign(
+        top1=est_A1 & (rang == 1), top4=est_A1 & (rang <= 4),
+        gagnant=est_A1, proba_gagnant=df["proba_A1"].where(est_A1, 0.0),
+    ).groupby("course_id", sort=False).agg(
+        date=("date", "first"), discipline=("discipline", "first"), distance=("distance", "max"),
+        hippodrome=("hippodrome", "first"), true_A1=("true_A1", "first"), lignes=("cheval_num", "size"),
+        top1=("top1", "any"), top4=("top4", "any"), gagnant=("gagnant", "any"), proba_gagnant=("proba_gagnant", "sum"),
+    )
+    return pd.DataFrame({
+        "jour": jours_table(courses["date"]),
+        "discipline": courses["discipline"].astype(str),
+        "classe": classe_distance(courses["distance"], seuil),
+        "hippodrome": courses["hippodrome"].astype(object).where(courses["hippodrome"].notna(), SANS_HIPPODROME).astype(str),
+        "true_A1": courses["true_A1"],
+        "lignes": courses["lignes"].astype(int),
+        "top1": courses["top1"].astype(int),
+        "top4": courses["top4"].astype(int),
+        "gagnant": courses["gagnant"].astype(int),
+        "proba_gagnant": courses["proba_gagnant"].astype(float),
+    }, index=courses.index)
+
+
+class StatsPerformance:
+    """
+    Table matérialisée des performances du modèle par discipline × classe de distance × hippodrome
+    (et tous leurs regroupements, TOUTES sur une ou plusieurs dimensions), sur tout l'historique
+    et sur des fenêtres glissantes de 30, 90 et 365 jours. Chaque clé contient, par fenêtre,
+    le nombre de courses, de gagnants prédits exacts (top1) et de vrais A1 dans le top 4 prédit (top4).
+    Les fenêtres sont relatives à `reference` (le jour du calcul) : la table est recalculée chaque jour.
+    """
+
+    def __init__(self, historique_path=HISTORIQUE_PATH, reference=None):
+        self.historique_path = historique_path
+        self.reference = reference or date.today().isoformat()
+        self.signature = None
+        self.compteurs = {}
+
+    @staticmethod
+    def _cle(discipline=TOUTES, classe=TOUTES, hippodrome=TOUTES):
+        return f"{discipline}|{classe}|{hippodrome}"
+
+    def _agreger(self, resume):
+        """Compteurs de resume pour tous les regroupements, indexés par clé (colonnes fenêtre:mesure)."""
+        age = (pd.Timestamp(self.reference) - resume["jour"]).dt.days
+        base = resume[["discipline", "classe", "hippodrome"]].copy()
+        for fenetre, jours in FENETRES.items():
+            dans = pd.Series(True, index=resume.index) if jours is None else age.between(0, jours - 1)
+            base[f"{fenetre}:courses"] = dans.astype(int)
+            base[f"{fenetre}:top1"] = resume["top1"] * dans
+            base[f"{fenetre}:top4"] = resume["top4"] * dans
+
+        niveaux = []
+        dimensions = ["discipline", "classe", "hippodrome"]
+        for gardees in itertools.product([True, False], repeat=3):
+            cles = base[dimensions].copy()
+            for dimension, gardee in zip(dimensions, gardees):
+                if not gardee:
+                    cles[dimension] = TOUTES
+            niveaux.append(base.drop(columns=dimensions).groupby([cles[d] for d in dimensions]).sum())
+        tout = pd.concat(niveaux)
+        tout.index = ["|".join(map(str, k)) for k in tout.index]
+        return tout
+
+    def _appliquer(self, resume, signe):
+        if resume.empty:
+            return
+        for cle, valeurs in self._agreger(resume).iterrows():
+            actuel = self.compteurs.setdefault(cle, {})
+            for colonne, valeur in valeurs.items():
+                actuel[colonne] = actuel.get(colonne, 0) + signe * int(valeur)
+
+    @classmethod
+    def construire(cls, historique_path=HISTORIQUE_PATH):
+        stats = cls(historique_path)
+        stats.signature = signature_table(historique_path)
+        stats._appliquer(resume_courses(lire_table(historique_path, colonnes=COLONNES_HISTORIQUE)), 1)
+        return stats
+
+    def ajouter(self, df_lignes):
+        self._appliquer(resume_courses(df_lignes), 1)
+
+    def retirer(self, df_lignes):
+        self._appliquer(resume_courses(df_lignes), -1)
+
+    def valeurs(self, discipline=TOUTES, classe=TOUTES, hippodrome=TOUTES):
+        """
+        Performances d'un filtre, par simple lecture de la table : une ligne par fenêtre
+        avec le nombre de courses et les taux top1 / top4 (NaN sans course).
+        """
+        compteurs = self.compteurs.get(self._cle(discipline, classe, hippodrome), {})
+        lignes = []
+        for fenetre in FENETRES:
+            courses, top1, top4 = (compteurs.get(f"{fenetre}:{m}", 0) for m in MESURES)
+            lignes.append({
+                "fenetre": fenetre,
+                "courses": courses,
+                "taux_top1": top1 / courses if courses else float("nan"),
+                "taux_top4": top4 / courses if courses else float("nan"),
+            })
+        return pd.DataFrame(lignes).set_index("fenetre")
+
+    def modalites(self, dimension):
+        """Valeurs présentes d'une dimension (discipline, classe ou hippodrome), sans parcourir l'historique."""
+        position = ["discipline", "classe", "hippodrome"].index(dimension)
+        return sorted({cle.split("|")[position] for cle, c in self.compteurs.items() if c.get("total:courses")} - {TOUTES})
+
+    def sauver(self, chemin=STATS_PATH):
+        ecrire_json(chemin, {
+            "historique_path": self.historique_path,
+            "reference": self.reference,
+            "signature": self.signature,
+            "compteurs": self.compteurs,
+        })
+
+    @classmethod
+    def charger(cls, chemin=STATS_PATH):
+        with open(chemin, encoding="utf-8") as f:
+            contenu = json.load(f)
+        stats = cls(contenu["historique_path"], contenu["reference"])
+        stats.signature = contenu["signature"]
+        stats.compteurs = contenu["compteurs"]
+        return stats
+
+
+# Table en mémoire par fichier d'historique, partagée par tout le processus
+_stats = {}
+
+
+def _chemin_stats(historique_path):
+    if historique_path == HISTORIQUE_PATH:
+        return STATS_PATH
+    return os.path.splitext(historique_path)[0] + ".stats_performance.json"
+
+
+def _a_jour(stats, historique_path, signature):
+    return (
+        stats is not None
+        and stats.signature == signature
+        and stats.historique_path == historique_path
+        and stats.reference == date.today().isoformat()
+    )
+
+
+def get_stats_performance(historique_path=HISTORIQUE_PATH):
+    """Table à jour pour cet historique et ce jour : mémoire, sinon fichier persistant, sinon recalculée."""
+    signature = signature_table(historique_path)
+    stats = _stats.get(historique_path)
+    if _a_jour(stats, historique_path, signature):
+        return stats
+
+    chemin = _chemin_stats(historique_path)
+    if os.path.exists(chemin):
+        stats = StatsPerformance.charger(chemin)
+    if not _a_jour(stats, historique_path, signature):
+        stats = StatsPerformance.construire(historique_path)
+        stats.sauver(chemin)
+
+    _stats[historique_path] = stats
+    return stats
+
+
+def mettre_a_jour_stats(anciennes, nouvelles, signature_avant, historique_path=HISTORIQUE_PATH):
+    """
+    Reporte dans la table le remplacement des lignes `anciennes` par `nouvelles` dans l'historique,
+    sans le relire. À appeler sous verrou_table(historique_path), juste après l'écriture
+    (voir confiance.enregistrer_resultats) ; signature_avant est celle de l'historique avant l'écriture.
+    """
+    stats = _stats.get(historique_path)
+    chemin = _chemin_stats(historique_path)
+    if stats is None and os.path.exists(chemin):
+        stats = StatsPerformance.charger(chemin)
+
+    if stats is None or stats.reference != date.today().isoformat() or stats.signature != signature_avant:
+        # Table absente ou périmée : recalcul complet sur l'historique déjà écrit
+        stats = StatsPerformance.construire(historique_path)
+    else:
+        stats.retirer(anciennes)
+        stats.ajouter(nouvelles)
+        stats.signature = signature_table(historique_path)
+    stats.sauver(chemin)
+    _stats[historique_path] = stats
+    return stats
@@ -0,0 +1,397 @@
+# app/stockage.py
+
+import itertools
+import os
+import random
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.verrous import ConflitVersion, ecrire_atomique, verrou_table
+
+# Tables du dossier data/ gérées par le stockage colonnaire (chemin CSV -> séparateur)
+TABLES = {
+    "data/Courses_CompletesTurfVision_id.csv": ",",
+    "data/chevaux_par_course.csv": ",",
+    "data/historique_predictions.csv": ",",
+    "data/historique_predictions_complet.csv": ",",
+    "data/historique_predictions_fusion.csv": ",",
+    "data/historique_couples.csv": ";",
+}
+
+# Colonnes de dimension (peu de valeurs distinctes) stockées en category ; dates et identifiants restent du texte
+COLONNES_CATEGORIES = {"discipline", "hippodrome"}
+# Autres colonnes texte des tables (identifiants, dates, libellés) ; les colonnes non déclarées sont numériques
+COLONNES_TEXTE = {"id_course", "course_id", "date", "numcourse", "num_course", "distance_group", "top3_pred", "top4_pred"}
+
+EXTENSION_COLONNAIRE = ".parquet"
+# Lignes lues par morceau en mode flux (lire_par_courses)
+TAILLE_MORCEAU = 50_000
+
+
+def colonnaire_disponible():
+    """Le format Parquet nécessite pyarrow ; sans lui on reste en CSV."""
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def chemin_colonnaire(chemin_csv):
+    return os.path.splitext(chemin_csv)[0] + EXTENSION_COLONNAIRE
+
+
+def _source(chemin_csv):
+    """
+    Fichier à lire pour une table : la version Parquet si elle existe et n'est pas
+    plus ancienne que le CSV (un CSV modifié à la main reste prioritaire).
+    """
+    chemin_pq = chemin_colonnaire(chemin_csv)
+    if os.path.exists(chemin_pq) and colonnaire_disponible():
+        if not os.path.exists(chemin_csv) or os.path.getmtime(chemin_pq) >= os.path.getmtime(chemin_csv):
+            return chemin_pq
+    return chemin_csv
+
+
+def table_existe(chemin_csv):
+    return os.path.exists(chemin_csv) or os.path.exists(chemin_colonnaire(chemin_csv))
+
+
+def signature_table(chemin_csv):
+    """
+    Identité des fichiers d'une table (inode + taille + date, CSV et Parquet) : change à chaque
+    écriture, ce qui en fait aussi la version utilisée pour les contrôles optimistes.
+    """
+    parties = []
+    for chemin in (chemin_csv, chemin_colonnaire(chemin_csv)):
+        if os.path.exists(chemin):
+            stat = os.stat(chemin)
+            parties.append(f"{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}")
+        else:
+            parties.append("-")
+    return "|".join(parties)
+
+
+def compacter_types(df):
+    """
+    Réduit les types : entiers en int8/int16/int32, flottants entiers avec trous en float32,
+    colonnes de COLONNES_CATEGORIES répétitives en category.
+    """
+    df = df.copy()
+    for i in range(df.shape[1]):
+        s = df.iloc[:, i]
+        if pd.api.types.is_bool_dtype(s) or isinstance(s.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_integer_dtype(s):
+            df.isetitem(i, pd.to_numeric(s, downcast="integer"))
+        elif pd.api.types.is_float_dtype(s):
+            valeurs = s.dropna()
+            if valeurs.empty or not (valeurs == valeurs.round()).all() or valeurs.abs().max() >= 2 ** 24:
+                continue
+            if len(valeurs) < len(s):
+                df.isetitem(i, s.astype("float32"))
+            else:
+                df.isetitem(i, pd.to_numeric(s.astype("int64"), downcast="integer"))
+        elif pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s):
+            # Colonnes mixtes (ex. numéros lus tantôt en int, tantôt en str) : uniformisées en texte
+            s = s.where(s.isna(), s.astype(str))
+            if df.columns[i] in COLONNES_CATEGORIES and len(s) and s.nunique() <= len(s) // 2:
+                s = s.astype("category")
+            df.isetitem(i, s)
+    return df
+
+
+def _texte_hors_dimensions(df):
+    """
+    Colonnes category hors COLONNES_CATEGORIES (Parquet écrits avant cette liste : dates, identifiants)
+    remises en texte, pour que les lecteurs voient les mêmes types quel que soit l'âge du fichier.
+    """
+    for i in range(df.shape[1]):
+        if isinstance(df.iloc[:, i].dtype, pd.CategoricalDtype) and df.columns[i] not in COLONNES_CATEGORIES:
+            df.isetitem(i, df.iloc[:, i].astype(df.iloc[:, i].cat.categories.dtype))
+    return df
+
+
+def jours_table(dates, format="%d/%m/%y"):
+    """
+    Dates texte d'une table (jj/mm/aa) en datetime64, NaT si invalides. Une colonne category
+    est d'abord remise en texte : sur des valeurs répétées, pandas en ferait un Categorical
+    de Timestamp, qui ne se compare ni ne se soustrait.
+    """
+    dates = pd.Series(dates)
+    if isinstance(dates.dtype, pd.CategoricalDtype):
+        dates = dates.astype(object)
+    return pd.to_datetime(dates, format=format, errors="coerce")
+
+
+def lire_table(chemin_csv, colonnes=None, sep=None):
+    """
+    Charge une table du dossier data/ en ne lisant que `colonnes` (toutes si None).
+    Les colonnes demandées absentes du fichier sont ignorées, comme un usecols tolérant.
+    """
+    sep = sep or TABLES.get(chemin_csv, ",")
+    source = _source(chemin_csv)
+
+    if source.endswith(EXTENSION_COLONNAIRE):
+        if colonnes is None:
+            return _texte_hors_dimensions(pd.read_parquet(source))
+        import pyarrow.parquet as pq
+        presentes = set(pq.read_schema(source).names)
+        return _texte_hors_dimensions(pd.read_parquet(source, columns=[c for c in colonnes if c in presentes]))
+
+    if colonnes is None:
+        return pd.read_csv(source, sep=sep)
+    colonnes = set(colonnes)
+    return pd.read_csv(source, sep=sep, usecols=lambda c: c in colonnes)
+
+
+def _morceaux_bruts(chemin_csv, colonnes, taille, sep):
+    source = _source(chemin_csv)
+    if source.endswith(EXTENSION_COLONNAIRE):
+        import pyarrow.parquet as pq
+        fichier = pq.ParquetFile(source)
+        if colonnes is not None:
+            colonnes = [c for c in colonnes if c in set(fichier.schema_arrow.names)]
+        for lot in fichier.iter_batches(batch_size=taille, columns=colonnes):
+            yield _texte_hors_dimensions(lot.to_pandas())
+    else:
+        usecols = None if colonnes is None else (lambda c, colonnes=set(colonnes): c in colonnes)
+        yield from pd.read_csv(source, sep=sep, usecols=usecols, chunksize=taille)
+
+
+def lire_par_courses(chemin_csv, cle=None, colonnes=None, taille=TAILLE_MORCEAU, sep=None):
+    """
+    Lit une table par morceaux d'environ `taille` lignes (mode flux), sans jamais couper
+    une course : les lignes de la dernière valeur de `cle` d'un morceau sont reportées
+    au suivant. Les lignes d'une même course doivent être contiguës (ValueError sinon).
+    Les morceaux gardent la numérotation des lignes d'une lecture complète.
+    taille=None lit la table d'un seul tenant (lire_table).
+    """
+    if taille is None:
+        yield lire_table(chemin_csv, colonnes=colonnes, sep=sep)
+        return
+
+    sep = sep or TABLES.get(chemin_csv, ",")
+    colonnes_lues = None if colonnes is None or cle is None else list(dict.fromkeys(list(colonnes) + [cle]))
+    report, vues, debut = None, set(), 0
+
+    def numeroter(df):
+        nonlocal debut
+        df.index = pd.RangeIndex(debut, debut + len(df))
+        debut += len(df)
+        return df
+
+    for morceau in _morceaux_bruts(chemin_csv, colonnes_lues or colonnes, taille, sep):
+        if cle is None:
+            yield numeroter(morceau.reset_index(drop=True))
+            continue
+        if report is not None:
+            morceau = pd.concat([report, morceau], ignore_index=True)
+        if morceau.empty:
+            continue
+        codes, valeurs = pd.factorize(morceau[cle], use_na_sentinel=False)
+        nouvelle_course = np.r_[True, codes[1:] != codes[:-1]]
+        if nouvelle_course.sum() != len(valeurs) or vues.intersection(valeurs):
+            raise ValueError(f"❌ {chemin_csv} : les lignes d'une même course ne sont pas contiguës ({cle}), lecture par morceaux impossible.")
+
+        # Début de la dernière course du morceau : elle peut continuer dans le morceau suivant
+        coupure = int(np.flatnonzero(nouvelle_course)[-1])
+        report = morceau.iloc[coupure:]
+        if coupure:
+            complet = morceau.iloc[:coupure]
+            vues.update(valeurs[:codes[coupure]])
+            yield numeroter(complet.reset_index(drop=True))
+    if report is not None and len(report):
+        yield numeroter(report.reset_index(drop=True))
+
+
+def _schema_flux(df):
+    """
+    Schéma Arrow d'une table écrite en flux, déduit des colonnes déclarées et non des valeurs
+    d'un morceau : COLONNES_CATEGORIES en dictionnaire, COLONNES_TEXTE en texte, les autres en
+    float64 (une colonne non déclarée déjà textuelle reste du texte). Un morceau ou plusieurs :
+    mêmes types, et une colonne vide dans le premier morceau ne fige pas un mauvais type.
+    """
+    import pyarrow as pa
+    champs = []
+    for col in df.columns:
+        if col in COLONNES_CATEGORIES:
+            type_arrow = pa.dictionary(pa.int32(), pa.string())
+        elif col in COLONNES_TEXTE or pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col]):
+            type_arrow = pa.string()
+        else:
+            type_arrow = pa.float64()
+        champs.append(pa.field(col, type_arrow))
+    return pa.schema(champs)
+
+
+def _vers_arrow(df, schema, chemin_csv):
+    import pyarrow as pa
+    colonnes = []
+    for champ in schema:
+        s = df[champ.name]
+        if pa.types.is_floating(champ.type):
+            try:
+                s = pd.to_numeric(s.astype(object) if isinstance(s.dtype, pd.CategoricalDtype) else s)
+            except (TypeError, ValueError):
+                raise ValueError(f"❌ {chemin_csv} : texte dans la colonne numérique {champ.name} (à déclarer dans COLONNES_TEXTE).")
+            colonnes.append(pa.array(s, type=pa.float64(), from_pandas=True))
+            continue
+        # Colonnes mixtes uniformisées en texte, comme compacter_types
+        s = s.astype(object).where(s.isna(), s.astype(str))
+        texte = pa.array(s, type=pa.string(), from_pandas=True)
+        colonnes.append(texte.dictionary_encode().cast(champ.type) if pa.types.is_dictionary(champ.type) else texte)
+    return pa.Table.from_arrays(colonnes, schema=schema)
+
+
+def ecrire_table_par_morceaux(morceaux, chemin_csv, sep=None):
+    """
+    Écrit une table à partir d'un itérable de DataFrames (mode flux) : chaque morceau est
+    écrit dès qu'il arrive, dans un fichier temporaire renommé à la fin. La mémoire reste
+    bornée par la taille d'un morceau. Groupes de lignes Parquet au schéma des colonnes
+    déclarées (_schema_flux), quel que soit le nombre de morceaux, ou ajouts CSV.
+    Retourne le nombre de lignes écrites.
+    """
+    morceaux = iter(morceaux)
+    premier = next(morceaux, None)
+    if premier is None:
+        return 0
+
+    suite = itertools.chain([premier], morceaux)
+    nb_lignes = 0
+    colonnes = list(premier.columns)
+
+    with verrou_table(chemin_csv):
+        if colonnaire_disponible() and premier.columns.is_unique:
+            import pyarrow.parquet as pq
+            schema = _schema_flux(premier)
+
+            def ecrire(tmp):
+                nonlocal nb_lignes
+                with pq.ParquetWriter(tmp, schema) as sortie:
+                    for df in suite:
+                        sortie.write_table(_vers_arrow(df[colonnes], schema, chemin_csv))
+                        nb_lignes += len(df)
+            ecrire_atomique(chemin_colonnaire(chemin_csv), ecrire)
+        else:
+            sep = sep or TABLES.get(chemin_csv, ",")
+
+            def ecrire(tmp):
+                nonlocal nb_lignes
+                with open(tmp, "w", encoding="utf-8", newline="") as f:
+                    for i, df in enumerate(suite):
+                        df[colonnes].to_csv(f, header=(i == 0), index=False, sep=sep)
+                        nb_lignes += len(df)
+            ecrire_atomique(chemin_csv, ecrire)
+    return nb_lignes
+
+
+def ecrire_table(df, chemin_csv, sep=None, version_attendue=None):
+    """
+    Sauvegarde une table en Parquet aux types compacts, ou en CSV si pyarrow est absent
+    (ou si la table a des noms de colonnes en double, que Parquet refuse).
+    Le fichier est écrit à côté puis renommé. Avec version_attendue (signature_table lue
+    avant modification), lève ConflitVersion si une autre session a écrit entre-temps.
+    """
+    with verrou_table(chemin_csv):
+        if version_attendue is not None and signature_table(chemin_csv) != version_attendue:
+            raise ConflitVersion(chemin_csv)
+        if colonnaire_disponible() and df.columns.is_unique:
+            df = compacter_types(df)
+            ecrire_atomique(chemin_colonnaire(chemin_csv), lambda tmp: df.to_parquet(tmp, index=False))
+        else:
+            sep = sep or TABLES.get(chemin_csv, ",")
+            ecrire_atomique(chemin_csv, lambda tmp: df.to_csv(tmp, index=False, sep=sep))
+
+
+def modifier_table(chemin_csv, modification, tentatives=20):
+    """
+    Lecture-modification-écriture optimiste : modification(df) est calculée sans verrou,
+    puis écrite seulement si la table n'a pas changé depuis la lecture ; sinon on recommence
+    sur la version à jour. Les sessions ne s'attendent que pendant le remplacement du fichier.
+    """
+    for _ in range(tentatives):
+        version = signature_table(chemin_csv)
+        existant = lire_table(chemin_csv) if table_existe(chemin_csv) else None
+        try:
+            ecrire_table(modification(existant), chemin_csv, version_attendue=version)
+            return
+        except ConflitVersion:
+            # Petit délai aléatoire pour que les sessions en conflit ne se recroisent pas aussitôt
+            time.sleep(random.uniform(0, 0.01))
+    raise ConflitVersion(f"{chemin_csv} : modifié en continu par d'autres sessions ({tentatives} tentatives)")
+
+
+def remplacer_lignes(df, chemin_csv, cle):
+    """
+    Upsert : remplace dans la table les lignes dont la valeur de `cle` figure dans df,
+    et ajoute les autres. Sur un CSV, des clés toutes nouvelles sont simplement ajoutées
+    en fin de fichier sans relire la table.
+    """
+    sep = TABLES.get(chemin_csv, ",")
+    with verrou_table(chemin_csv):
+        if table_existe(chemin_csv) and _source(chemin_csv) == chemin_csv:
+            entete = pd.read_csv(chemin_csv, sep=sep, nrows=0).columns
+            if set(entete) == set(df.columns):
+                cles_existantes = pd.read_csv(chemin_csv, sep=sep, usecols=[cle])[cle]
+                if not cles_existantes.isin(df[cle]).any():
+                    with open(chemin_csv, "a", encoding="utf-8", newline="") as f:
+                        df[list(entete)].to_csv(f, header=False, index=False, sep=sep)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    return
+
+    def remplacer(existant):
+        if existant is None:
+            return df
+        existant = existant[~existant[cle].isin(df[cle].unique())]
+        return pd.concat([existant, df], ignore_index=True)
+
+    modifier_table(chemin_csv, remplacer)
+
+
+def exporter_csv(chemin_csv, sep=None):
+    """Réécrit le CSV d'une table à partir de sa version colonnaire."""
+    chemin_pq = chemin_colonnaire(chemin_csv)
+    if not os.path.exists(chemin_pq):
+        return
+    df = pd.read_parquet(chemin_pq)
+    ecrire_atomique(chemin_csv, lambda tmp: df.to_csv(tmp, index=False, sep=sep or TABLES.get(chemin_csv, ",")))
+    # Même date que le Parquet : le CSV exporté n'est pas pris pour une modification manuelle
+    date_pq = os.path.getmtime(chemin_pq)
+    os.utime(chemin_csv, (date_pq, date_pq))
+
+
+def migrer_csv():
+    """Migration unique : convertit les CSV existants de TABLES au format colonnaire."""
+    if not colonnaire_disponible():
+        print("❌ pyarrow n'est pas installé : migration impossible.")
+        return
+
+    for chemin_csv, sep in TABLES.items():
+        if not os.path.exists(chemin_csv):
+            continue
+        df = pd.read_csv(chemin_csv, sep=sep)
+        avant = df.memory_usage(deep=True).sum()
+        df = compacter_types(df)
+        df.to_parquet(chemin_colonnaire(chemin_csv), index=False)
+        apres = df.memory_usage(deep=True).sum()
+        print(f"✅ {chemin_csv} → {chemin_colonnaire(chemin_csv)} ({len(df)} lignes, {avant / 1e6:.1f} → {apres / 1e6:.1f} Mo en mémoire)")
+
+
+def exporter_tout():
+    for chemin_csv in TABLES:
+        if os.path.exists(chemin_colonnaire(chemin_csv)):
+            exporter_csv(chemin_csv)
+            print(f"✅ Export CSV : {chemin_csv}")
+
+
+if __name__ == "__main__":
+    action = sys.argv[1] if len(sys.argv) > 1 else "migrer"
+    if action == "exporter":
+        exporter_tout()
+    else:
+        migrer_csv()
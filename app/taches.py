@@ -0,0 +1,204 @@
+# app/taches.py
+
+import itertools
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Nombre de tâches exécutées en même temps ; les suivantes attendent leur tour
+MAX_TACHES_SIMULTANEES = 2
+# Tâches terminées conservées pour l'affichage
+HISTORIQUE_TACHES = 20
+
+EN_ATTENTE, EN_COURS, TERMINEE, ECHEC = "en attente", "en cours", "terminée", "échec"
+
+
+class Tache:
+    """Une tâche de fond : une suite d'étapes (libellé, fonction sans argument) exécutées dans l'ordre."""
+
+    _numeros = itertools.count(1)
+
+    def __init__(self, cle, libelle, etapes):
+        self.id = next(self._numeros)
+        self.cle = cle
+        self.libelle = libelle
+        self.etapes = etapes
+        self.statut = EN_ATTENTE
+        self.progression = 0.0
+        self.message = "En file d'attente"
+        self.erreur = None
+        self.soumise_le = time.time()
+        self.debut = None
+        self.fin = None
+
+    @property
+    def active(self):
+        return self.statut in (EN_ATTENTE, EN_COURS)
+
+    def duree(self):
+        if self.debut is None:
+            return 0.0
+        return (self.fin or time.time()) - self.debut
+
+    def executer(self):
+        self.statut, self.debut = EN_COURS, time.time()
+        try:
+            for i, (message, fonction) in enumerate(self.etapes):
+                self.progression, self.message = i / len(self.etapes), message
+                fonction()
+            self.statut, self.progression, self.message = TERMINEE, 1.0, "Terminée"
+        except Exception as e:
+            self.statut, self.erreur = ECHEC, f"{e}"
+            self.message = f"Échec : {e}"
+            traceback.print_exc()
+        finally:
+            self.fin = time.time()
+
+
+class GestionnaireTaches:
+    """
+    Exécute les tâches dans un pool de threads borné.
+    Deux tâches de même clé ne tournent jamais en même temps : une demande faite pendant
+    l'exécution est mise en attente, et les demandes suivantes sont fusionnées avec elle.
+    """
+
+    def __init__(self, max_simultanees=MAX_TACHES_SIMULTANEES):
+        self._pool = ThreadPoolExecutor(max_workers=max_simultanees, thread_name_prefix="turf-tache")
+        self._verrou = threading.Lock()
+        self._actives = {}    # clé -> tâche soumise au pool (en attente d'un thread ou en cours)
+        self._suivantes = {}  # clé -> tâche à lancer quand l'active de même clé sera finie
+        self._toutes = []
+
+    def soumettre(self, cle, etapes, libelle=None):
+        """Soumet une tâche, ou retourne celle de même clé qui n'a pas encore démarré."""
+        with self._verrou:
+            active = self._actives.get(cle)
+            if active is not None and active.statut == EN_ATTENTE:
+                return active
+            if cle in self._suivantes:
+                return self._suivantes[cle]
+
+            tache = Tache(cle, libelle or cle, etapes)
+            self._toutes.append(tache)
+            self._toutes = [t for t in self._toutes if t.active] + [t for t in self._toutes if not t.active][-HISTORIQUE_TACHES:]
+            if active is None:
+                self._lancer(tache)
+            else:
+                self._suivantes[cle] = tache
+            return tache
+
+    def _lancer(self, tache):
+        self._actives[tache.cle] = tache
+        self._pool.submit(self._executer, tache)
+
+    def _executer(self, tache):
+        try:
+            tache.executer()
+        finally:
+            with self._verrou:
+                del self._actives[tache.cle]
+                suivante = self._suivantes.pop(tache.cle, None)
+                if suivante is not None:
+                    self._lancer(suivante)
+
+    def taches(self):
+        """Tâches actives puis terminées, les plus récentes d'abord."""
+        with self._verrou:
+            return sorted(self._toutes, key=lambda t: (not t.active, -t.id))
+
+    def attendre(self, delai=None):
+        """Attend la fin des tâches actives (scripts et tests) ; retourne False si le délai expire."""
+        limite = None if delai is None else time.time() + delai
+        while any(t.active for t in self.taches()):
+            if limite is not None and time.time() > limite:
+                return False
+            time.sleep(0.05)
+        return True
+
+
+_gestionnaire = None
+_verrou_gestionnaire = threading.Lock()
+
+
+def get_gestionnaire():
+    """Gestionnaire partagé par toutes les sessions du processus."""
+    global _gestionnaire
+    with _verrou_gestionnaire:
+        if _gestionnaire is None:
+            _gestionnaire = GestionnaireTaches()
+        return _gestionnaire
+
+
+# --- Tâches de l'application ---
+
+def _regenerer_features():
+    from app.compute_features import main
+    main()
+
+
+def _entrainer():
+    from model.artefact import exporter_artefact
+    from model.loader import MODEL_PATH, SCALER_PATH
+    from model.predictor import TurfPredictor
+    predictor = TurfPredictor("data/chevaux_par_course.csv")
+    predictor.train()
+    predictor.save(MODEL_PATH, SCALER_PATH)
+    exporter_artefact(MODEL_PATH, SCALER_PATH, predictor.features)
+
+
+def _reconstruire(incremental):
+    from app.rebuild_historique import reconstruire_historique
+    reconstruire_historique(incremental=incremental)
+
+
+TACHES = {
+    "historique": ("Reconstruction de l'historique", [
+        ("Rescoring des courses nouvelles ou modifiées", lambda: _reconstruire(True)),
+    ]),
+    "features": ("Régénération des features", [
+        ("Calcul des features par cheval", _regenerer_features),
+        ("Mise à jour de l'historique", lambda: _reconstruire(True)),
+    ]),
+    "entrainement": ("Réentraînement du modèle", [
+        ("Calcul des features par cheval", _regenerer_features),
+        ("Entraînement du modèle", _entrainer),
+        ("Reconstruction de l'historique", lambda: _reconstruire(True)),
+    ]),
+}
+
+
+def lancer(nom):
+    """Lance une tâche prédéfinie de TACHES (fusionnée avec une demande identique en attente)."""
+    libelle, etapes = TACHES[nom]
+    return get_gestionnaire().soumettre(nom, etapes, libelle)
+
+
+def enregistrer_course_terminee(ligne):
+    """Score une course complétée et met l'historique et l'index de confiance à jour, en tâche de fond."""
+    import pandas as pd
+    from app.confiance import enregistrer_resultats
+    from app.rebuild_historique import mettre_a_jour_courses
+    from app.verrous import verrou_course
+
+    def mettre_a_jour():
+        with verrou_course(ligne["id_course"]):
+            enregistrer_resultats(mettre_a_jour_courses(pd.DataFrame([ligne])))
+
+    return get_gestionnaire().soumettre(
+        f"resultats:{ligne['id_course']}",
+        [("Scoring de la course et index de confiance", mettre_a_jour)],
+        f"Historique de {ligne['id_course']}",
+    )
+
+
+if __name__ == "__main__":
+    for nom in sys.argv[1:] or ["historique"]:
+        lancer(nom)
+    get_gestionnaire().attendre()
+    for t in get_gestionnaire().taches():
+        print(f"{'✅' if t.statut == TERMINEE else '❌'} {t.libelle} : {t.message} ({t.duree():.1f} s)")
@@ -2,19 +2,17 @@
 
 import streamlit as st
 import pandas as pd
-import os
+
+from app.depot import get_depot
+from app.taches import lancer
 
 def afficher_courses_en_attente():
     st.title("🕒 Courses en attente de validation")
 
-    attente_path = "data/courses_en_attente.csv"
-
-    if not os.path.exists(attente_path):
-        st.info("✅ Aucune course en attente.")
-        return
+    depot = get_depot()
 
     try:
-        df = pd.read_csv(attente_path)
+        df = depot.courses_en_attente()
     except Exception as e:
         st.error(f"❌ Erreur de lecture du fichier : {e}")
         return
@@ -71,8 +69,7 @@ def afficher_courses_en_attente():
             if "a1" in course_info and not pd.isna(course_info["a1"]):
                 st.warning("❌ Cette course est déjà complétée et ne peut pas être supprimée.")
             else:
-                df = df[df["id_course"] != id_course]
-                df.to_csv(attente_path, index=False)
+                depot.retirer_course_en_attente(id_course)
                 st.success("✅ Course supprimée de la file d’attente.")
                 st.rerun()
 
@@ -82,10 +79,10 @@ def afficher_courses_en_attente():
             # Simule enregistrement (remplacer par ta vraie logique d’arrivée)
             st.success("✅ Résultats enregistrés avec succès.")
 
-            # Si demandé, on lance la reconstruction
+            # Si demandé, on lance la reconstruction en arrière-plan
             if reconstruire_historique:
-                os.system("python run_rebuild.py")
-                st.success("🔄 Historique reconstruit automatiquement.")
+                tache = lancer("historique")
+                st.success(f"🔄 Reconstruction de l’historique lancée en arrière-plan (tâche n°{tache.id}).")
         except Exception as e:
             st.error(f"❌ Erreur lors de l’enregistrement : {e}")
 
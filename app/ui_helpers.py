@@ -1,11 +1,11 @@
 # app/ui_helpers.py
 
-import pandas as pd
+from app.snapshots import lire_snapshot
 
 def load_hippodromes(filepath="data/Hippodromes.csv"):
     """Charge la liste des hippodromes depuis un CSV"""
     try:
-        df = pd.read_csv(filepath, header=None)
+        df = lire_snapshot(filepath, header=None)
         return sorted(df[0].dropna().unique().tolist())
     except Exception as e:
         print(f"Erreur lors du chargement des hippodromes : {e}")
@@ -1,13 +1,25 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime
 import sys
 import os
 
 # Accès au dossier parent pour importer model/
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from model.predictor import TurfPredictor
+from model.cache_predictions import get_cache_predictions, predire_course
+from model.loader import infos_chargement
 from app.confiance import get_confiance_A1, get_confiance_A1_par_distance
+from app.depot import get_depot
+from app.snapshots import lire_snapshot
+from app.stockage import remplacer_lignes
+from app.verrous import verrou_course
+
+PREDICTIONS_PATH = "data/historique_predictions.csv"
+COUPLES_PATH = "data/historique_couples.csv"
+# Colonnes historiques des deux tables (les colonnes de features du top 4 ne sont pas conservées)
+COLONNES_PREDICTIONS = ["course_id", "date", "discipline", "hippodrome", "num_course", "distance",
+                        "cheval_num", "proba_A1", "true_A1", "is_A1_in_top4"]
+COLONNES_COUPLES = ["cheval_1", "cheval_2", "proba_couple", "date", "hippodrome", "course_id",
+                    "discipline", "num_course", "distance"]
 
 
 def show_prediction_ui():
@@ -15,7 +27,7 @@ def show_prediction_ui():
     st.markdown("Saisissez les informations de la course et les chevaux pronostiqués.")
 
     try:
-        hippodrome_list = pd.read_csv("data/Hippodromes.csv", header=None)[0].sort_values().tolist()
+        hippodrome_list = lire_snapshot("data/Hippodromes.csv", header=None)[0].sort_values().tolist()
     except Exception as e:
         st.error(f"❌ Erreur de chargement du fichier Hippodromes.csv : {e}")
         hippodrome_list = []
@@ -32,14 +44,12 @@ def show_prediction_ui():
     course_id = f"{formatted_date}_{hippodrome}_{num_course}"
     st.write("🆔 ID généré :", course_id)
 
-    attente_path = "data/courses_en_attente.csv"
-    df_attente = pd.read_csv(attente_path) if os.path.exists(attente_path) else pd.DataFrame()
+    depot = get_depot()
 
-    if not df_attente.empty and course_id in df_attente["id_course"].values:
+    if depot.est_en_attente(course_id):
         st.warning("📌 Une course avec cet ID est déjà en attente.")
         if st.button("🪑 Vider pour saisir une nouvelle course"):
-            df_attente = df_attente[df_attente["id_course"] != course_id]
-            df_attente.to_csv(attente_path, index=False)
+            depot.retirer_course_en_attente(course_id)
             st.success("✅ Course retirée. Vous pouvez maintenant en saisir une nouvelle.")
             st.experimental_rerun()
         return
@@ -49,36 +59,15 @@ def show_prediction_ui():
     pronos = [cols[i].number_input(f"P{i+1}", min_value=1, max_value=20, step=1, key=f"prono_{i+1}") for i in range(8)]
 
     if st.button("🔮 Prédire le gagnant (A1)"):
-        with st.spinner("📊 Entraînement du modèle..."):
-            predictor = TurfPredictor()
-            predictor.load("model/checkpoints/model_a1.joblib", "model/checkpoints/scaler_a1.joblib")
-
-            input_rows = []
-            for i, cheval in enumerate(pronos):
-                input_rows.append({
-                    'course_id': course_id,
-                    'cheval_num': cheval,
-                    'prono_rank': i + 1,
-                    'top3_1': 0, 'top3_2': 0, 'top4_1': 0, 'top4_2': 0,
-                    'a1_imp': 0, 'a2_imp': 0,
-                    'a1_inf9': int(cheval < 9), 'a2_inf9': 0,
-                    'cplg_top3': 0, 'cplg_top4': 0,
-                    'top3_1_top4': 0, 'top3_2_top4': 0, 'top3_3_top4': 0,
-                    'siprono1<9-A1<9': int(i == 0 and cheval < 9),
-                    'siprono2<9-A1<9': int(i == 1 and cheval < 9),
-                    'siprono3<9-A1<9': int(i == 2 and cheval < 9),
-                    'is_A1': 0
-                })
-
-            df_course = pd.DataFrame(input_rows)
-            for col in predictor.required_ecart_columns():
-                df_course[col] = 0
-
-            top4 = predictor.predict_top4_A1(df_course)
-            if 'is_A1_ecart' in top4.columns:
-                top4 = top4.sort_values(['proba_A1', 'is_A1_ecart'], ascending=[False, True])
-
-            couples = predictor.predict_couple_gagnant(df_course)
+        with st.spinner("🔮 Prédiction en cours..."):
+            # Mêmes entrées et même modèle qu'une prédiction récente : résultat servi par le cache
+            top4, couples, depuis_cache = predire_course(course_id, pronos, discipline, distance)
+
+        infos = infos_chargement()
+        if infos is not None:
+            st.caption(f"Modèle chargé en {infos['duree_chargement'] * 1000:.0f} ms (chargements dans ce processus : {infos['nb_chargements']})")
+        stats = get_cache_predictions().stats()
+        st.caption(f"{'⚡ Prédiction servie par le cache' if depuis_cache else 'Prédiction calculée'} – cache : {stats['hits']} hits / {stats['misses']} misses, {stats['entrees']}/{stats['taille']} courses")
 
         st.subheader("✅ Top 4 chevaux les plus probables A1 :")
         st.dataframe(top4[['cheval_num', 'proba_A1'] + [col for col in top4.columns if col.endswith("_ecart")]].reset_index(drop=True))
@@ -87,7 +76,9 @@ def show_prediction_ui():
         st.table(couples.rename(columns={
             "cheval_1": "Cheval 1",
             "cheval_2": "Cheval 2",
-            "proba_couple": "Probabilité Moyenne"
+            "proba_couple": "Probabilité (ordre indifférent)",
+            "proba_1_puis_2": "1 puis 2",
+            "proba_2_puis_1": "2 puis 1"
         }).reset_index(drop=True))
 
         st.subheader("🔐 Score de confiance pour cette course")
@@ -106,21 +97,6 @@ def show_prediction_ui():
         top4['num_course'] = num_course
         top4['distance'] = distance
 
-        histo_path = "data/historique_predictions.csv"
-        try:
-            historique = pd.read_csv(histo_path)
-            historique = historique[~(
-                (historique["course_id"] == course_id) &
-                (historique["date"] == formatted_date) &
-                (historique["discipline"] == discipline)
-            )]
-            historique = pd.concat([historique, top4], ignore_index=True)
-        except (FileNotFoundError, pd.errors.EmptyDataError):
-            historique = top4
-
-        historique.to_csv(histo_path, index=False)
-        st.success("📁 Prédiction A1 sauvegardée.")
-
         couples['date'] = formatted_date
         couples['hippodrome'] = hippodrome
         couples['course_id'] = course_id
@@ -128,45 +104,32 @@ def show_prediction_ui():
         couples['num_course'] = num_course
         couples['distance'] = distance
 
-        couples_path = "data/historique_couples.csv"
-        try:
-            hist_couples = pd.read_csv(couples_path, sep=";")
-            hist_couples = hist_couples[~(
-                (hist_couples["course_id"] == course_id) &
-                (hist_couples["date"] == formatted_date) &
-                (hist_couples["discipline"] == discipline)
-            )]
-            hist_couples = pd.concat([hist_couples, couples], ignore_index=True)
-        except Exception:
-            hist_couples = couples
-
-        hist_couples.to_csv(couples_path, index=False, sep=";")
-        st.success("🦘️ Couples gagnants sauvegardés.")
-
-        try:
-            course_data = {
-                "id_course": course_id,
-                "date": formatted_date,
-                "discipline": discipline,
-                "hippodrome": hippodrome,
-                "numcourse": num_course,
-                "distance": distance,
-                "prono1": pronos[0], "prono2": pronos[1], "prono3": pronos[2],
-                "prono4": pronos[3], "prono5": pronos[4], "prono6": pronos[5],
-                "prono7": pronos[6], "prono8": pronos[7],
-            }
-
-            if os.path.exists(attente_path):
-                df_attente = pd.read_csv(attente_path)
-                df_attente = df_attente[df_attente["id_course"] != course_id]
-                df_attente = pd.concat([df_attente, pd.DataFrame([course_data])], ignore_index=True)
-            else:
-                df_attente = pd.DataFrame([course_data])
-
-            df_attente.to_csv(attente_path, index=False)
-            st.success("📌 Course enregistrée dans la file d'attente (provisoire).")
-        except Exception as e:
-            st.warning(f"⚠️ Impossible d’enregistrer dans courses_en_attente.csv : {e}")
+        # 🔒 Prédiction et file d'attente écrites ensemble pour cette course (les autres courses restent libres)
+        with verrou_course(course_id):
+            # 💾 Prédiction et couples remplacés pour cette course uniquement, à chaque prédiction :
+            # le disque a pu changer depuis (reconstruction, autre session) même si le cache a servi le résultat
+            remplacer_lignes(top4.reindex(columns=COLONNES_PREDICTIONS), PREDICTIONS_PATH, cle="course_id")
+            remplacer_lignes(couples.reindex(columns=COLONNES_COUPLES), COUPLES_PATH, cle="course_id")
+            st.success("📁 Prédiction A1 sauvegardée.")
+            st.success("🦘️ Couples gagnants sauvegardés.")
+
+            try:
+                course_data = {
+                    "id_course": course_id,
+                    "date": formatted_date,
+                    "discipline": discipline,
+                    "hippodrome": hippodrome,
+                    "numcourse": num_course,
+                    "distance": distance,
+                    "prono1": pronos[0], "prono2": pronos[1], "prono3": pronos[2],
+                    "prono4": pronos[3], "prono5": pronos[4], "prono6": pronos[5],
+                    "prono7": pronos[6], "prono8": pronos[7],
+                }
+
+                depot.ajouter_course_en_attente(course_data)
+                st.success("📌 Course enregistrée dans la file d'attente (provisoire).")
+            except Exception as e:
+                st.warning(f"⚠️ Impossible d’enregistrer la course en attente : {e}")
 
         st.subheader("📊 Score global de confiance (discipline uniquement)")
         confiance = get_confiance_A1(discipline)
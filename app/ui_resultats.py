@@ -1,31 +1,26 @@
 import streamlit as st
 import pandas as pd
-import os
-from app.rebuild_historique import reconstruire_historique
+from app.depot import get_depot
+from app.taches import enregistrer_course_terminee
+from app.snapshots import lire_snapshot
+from app.stockage import jours_table, modifier_table, remplacer_lignes, table_existe
+from app.verrous import verrou_course
 
 
 def ajouter_resultats_ui():
     st.title("📥 Ajouter les arrivées officielles")
 
-    attente_path = "data/courses_en_attente.csv"
     complet_path = "data/Courses_CompletesTurfVision_id.csv"
     fusion_path = "data/historique_predictions_fusion.csv"
 
-    if not os.path.exists(attente_path):
-        pd.DataFrame(columns=[
-            "id_course", "date", "discipline", "hippodrome", "numcourse", "distance",
-            "prono1", "prono2", "prono3", "prono4", "prono5", "prono6", "prono7", "prono8"
-        ]).to_csv(attente_path, index=False)
-        st.info("✅ Fichier 'courses_en_attente.csv' créé (vide).")
-        return
-
+    depot = get_depot()
     try:
-        df = pd.read_csv(attente_path)
+        df = depot.courses_en_attente()
     except Exception as e:
         st.error(f"❌ Erreur lors de la lecture : {e}")
         return
 
-    if df.empty or "id_course" not in df.columns:
+    if df.empty:
         st.warning("Aucune course en attente à valider.")
         return
 
@@ -49,52 +44,51 @@ def ajouter_resultats_ui():
                 st.warning("⚠️ Les arrivées doivent être toutes différentes.")
                 return
 
-            if os.path.exists(complet_path):
-                df_final = pd.read_csv(complet_path)
-            else:
-                df_final = pd.DataFrame()
-
-            ligne = df[df["id_course"] == id_course].iloc[0].to_dict()
-            ligne.update({
-                "a1": int(a1), "a2": int(a2), "a3": int(a3),
-                "a4": int(a4), "a5": int(a5),
-                "rapport": float(rapport_a1.replace(",", ".")) if rapport_a1 else None
-            })
-
-            df_final = df_final[df_final["id_course"] != id_course]
-            df_final = pd.concat([df_final, pd.DataFrame([ligne])], ignore_index=True)
-            df_final.to_csv(complet_path, index=False)
-            st.success("✅ Résultats enregistrés avec succès.")
-
-            # 🔁 Mise à jour automatique historique_predictions_fusion.csv
-            if os.path.exists(fusion_path):
-                df_fusion = pd.read_csv(fusion_path)
-                for col, val in zip(["true_A1", "true_A2", "true_A3", "true_A4", "true_A5", "rapport_A1"],
-                                    [a1, a2, a3, a4, a5, rapport_a1]):
-                    if col in df_fusion.columns:
-                        df_fusion.loc[df_fusion["course_id"] == id_course, col] = val
-                df_fusion.to_csv(fusion_path, index=False)
-
-            # ✅ Mise à jour de l’historique complet
-            reconstruire_historique()
-
-            df = df[df["id_course"] != id_course]
-            df.to_csv(attente_path, index=False)
+            # 🔒 Une seule session à la fois sur cette course ; les autres courses restent libres
+            with verrou_course(id_course):
+                ligne = depot.course_en_attente(id_course)
+                if ligne is None:
+                    st.warning("⚠️ Cette course vient d'être validée par une autre session.")
+                    return
+                ligne.update({
+                    "a1": int(a1), "a2": int(a2), "a3": int(a3),
+                    "a4": int(a4), "a5": int(a5),
+                    "rapport": float(rapport_a1.replace(",", ".")) if rapport_a1 else None
+                })
+
+                remplacer_lignes(pd.DataFrame([ligne]), complet_path, cle="id_course")
+                st.success("✅ Résultats enregistrés avec succès.")
+
+                # 🔁 Mise à jour automatique historique_predictions_fusion.csv
+                if table_existe(fusion_path):
+                    def maj_fusion(df_fusion):
+                        for col, val in zip(["true_A1", "true_A2", "true_A3", "true_A4", "true_A5", "rapport_A1"],
+                                            [a1, a2, a3, a4, a5, rapport_a1]):
+                            if col in df_fusion.columns:
+                                df_fusion.loc[df_fusion["course_id"] == id_course, col] = val
+                        return df_fusion
+                    modifier_table(fusion_path, maj_fusion)
+
+                depot.retirer_course_en_attente(id_course)
             st.info("📤 Course retirée de la file d'attente.")
 
+            # ✅ Historique + index de confiance mis à jour pour cette seule course, en arrière-plan
+            tache = enregistrer_course_terminee(ligne)
+            st.info(f"⚙️ Mise à jour de l’historique lancée en arrière-plan (tâche n°{tache.id}, suivi dans ⚙️ Tâches).")
+
         except Exception as e:
             st.error(f"❌ Erreur lors de l’enregistrement : {e}")
 
     st.markdown("### 📜 Dernières courses complètes")
-    if os.path.exists(complet_path):
+    if table_existe(complet_path):
         try:
-            df_recent = pd.read_csv(complet_path)
+            colonnes = ["id_course", "date", "discipline", "a1", "a2", "a3", "a4", "a5", "rapport"]
+            df_recent = lire_snapshot(complet_path, colonnes=colonnes)
             if not df_recent.empty:
                 if "date" in df_recent.columns:
-                    df_recent["date"] = pd.to_datetime(df_recent["date"], format="%d/%m/%y", errors="coerce")
+                    df_recent["date"] = jours_table(df_recent["date"])
 
                 df_recent = df_recent.sort_values(by="date", ascending=False).head(10)
-                colonnes = ["id_course", "date", "discipline", "a1", "a2", "a3", "a4", "a5", "rapport"]
                 df_recent = df_recent[[col for col in colonnes if col in df_recent.columns]]
                 df_recent["date"] = df_recent["date"].dt.strftime("%d/%m/%y")
 
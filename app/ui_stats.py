@@ -1,14 +1,25 @@
 # app/ui_stats.py
 
 import streamlit as st
-import pandas as pd
-from io import BytesIO
+from datetime import date, timedelta
+
+from app.confiance import HISTORIQUE_PATH, TOUTES
+from app.export import FORMATS, contenu_export
+from app.snapshots import lire_snapshot
+from app.stats_performance import get_stats_performance
+from app.stockage import colonnaire_disponible, jours_table, signature_table, table_existe
+
+FUSION_PATH = "data/historique_predictions_fusion.csv"
 
 def show_stats_ui():
     st.title("📊 Statistiques du modèle TurfVision")
 
     try:
-        df = pd.read_csv("data/historique_predictions_fusion.csv")
+        colonnes_affichees = ["course_id", "date", "discipline", "hippodrome", "numcourse",
+                              "true_A1", "a1_inf9", "is_A1_in_top4", "cplg_top4", "rapport", "distance_longue"]
+        # Table lue une fois (et gardée en mémoire) pour l'affichage comme pour l'export
+        df_complet = lire_snapshot(FUSION_PATH)
+        df = df_complet[[c for c in colonnes_affichees if c in df_complet.columns]]
     except Exception as e:
         st.error(f"❌ Erreur lors du chargement du fichier : {e}")
         return
@@ -17,18 +28,24 @@ def show_stats_ui():
         st.warning("⚠️ Le fichier de données est vide.")
         return
 
-    # 🎯 Filtres : discipline + distance
-    col1, col2 = st.columns(2)
+    # Table des performances tenue à jour à chaque arrivée enregistrée : les filtres sont des lectures
+    stats = get_stats_performance() if table_existe(HISTORIQUE_PATH) else None
+
+    # 🎯 Filtres : discipline + distance + hippodrome
+    col1, col2, col3 = st.columns(3)
 
     with col1:
-        disciplines = df["discipline"].dropna().unique().tolist()
-        disciplines.sort()
+        disciplines = stats.modalites("discipline") if stats is not None else sorted(df["discipline"].dropna().unique().tolist())
         discipline_selection = st.selectbox("🎯 Discipline", ["(Toutes)"] + disciplines)
 
     with col2:
         distance_options = ["(Toutes)", "🏇 < 2800m", "🏁 ≥ 2800m"]
         distance_selection = st.selectbox("📏 Distance", distance_options)
 
+    with col3:
+        hippodromes = stats.modalites("hippodrome") if stats is not None else []
+        hippodrome_selection = st.selectbox("🏟️ Hippodrome", ["(Tous)"] + hippodromes)
+
     # Appliquer les filtres
     if discipline_selection != "(Toutes)":
         df = df[df["discipline"] == discipline_selection]
@@ -39,16 +56,39 @@ def show_stats_ui():
         elif distance_selection == "🏁 ≥ 2800m":
             df = df[df["distance_longue"] == 1]
 
+    if hippodrome_selection != "(Tous)" and "hippodrome" in df.columns:
+        df = df[df["hippodrome"] == hippodrome_selection]
+
     # ✅ Statistiques principales
     st.subheader("📈 Taux de réussite")
 
-    # 🔒 Statistiques désactivées temporairement
-    st.info("Les statistiques de performance du modèle seront affichées ici dès qu'elles auront été validées.")
+    if stats is None:
+        st.info("Aucun historique de prédictions avec résultat pour le moment.")
+    else:
+        classe = {"🏇 < 2800m": "courte", "🏁 ≥ 2800m": "longue"}.get(distance_selection, TOUTES)
+        valeurs = stats.valeurs(
+            TOUTES if discipline_selection == "(Toutes)" else discipline_selection,
+            classe,
+            TOUTES if hippodrome_selection == "(Tous)" else hippodrome_selection,
+        )
+        total = valeurs.loc["total"]
+        if total["courses"] == 0:
+            st.info("Aucune course pour cette sélection.")
+        else:
+            m1, m2, m3 = st.columns(3)
+            m1.metric("Courses", int(total["courses"]))
+            m2.metric("🥇 Gagnant prédit", f"{total['taux_top1'] * 100:.1f} %")
+            m3.metric("🎯 A1 dans le top 4", f"{total['taux_top4'] * 100:.1f} %")
+
+            tableau = valeurs.rename(index={"total": "Tout l'historique", "365j": "365 jours", "90j": "90 jours", "30j": "30 jours"})
+            tableau = tableau.rename(columns={"courses": "Courses", "taux_top1": "% gagnant prédit", "taux_top4": "% A1 dans le top 4"})
+            tableau[["% gagnant prédit", "% A1 dans le top 4"]] = (tableau[["% gagnant prédit", "% A1 dans le top 4"]] * 100).round(1)
+            st.dataframe(tableau, use_container_width=True)
 
     # 📋 Dernières prédictions
     st.subheader("🕓 Dernières 10 prédictions")
     try:
-        df["date"] = pd.to_datetime(df["date"], format="%d/%m/%y", errors="coerce")
+        df["date"] = jours_table(df["date"])
         df_display = df.sort_values(by="date", ascending=False).head(10)
         df_display["date"] = df_display["date"].dt.strftime("%d/%m/%y")
 
@@ -60,30 +100,36 @@ def show_stats_ui():
     except Exception as e:
         st.warning(f"Erreur lors de l'affichage : {e}")
 
-    # 📤 Export complet
+    # 📤 Export : généré seulement au clic, en flux, et gardé pour cette version des données
     st.subheader("📥 Exporter les données")
     try:
-        df_export = pd.read_csv("data/historique_predictions_fusion.csv")
-        df_export["date"] = pd.to_datetime(df_export["date"], format="%d/%m/%y", errors="coerce")
-        df_export = df_export.sort_values(by="date", ascending=False)
-        df_export["date"] = df_export["date"].dt.strftime("%d/%m/%y")
-
-        # Export CSV
-        st.download_button(
-            label="⬇️ Télécharger CSV",
-            data=df_export.to_csv(index=False, sep=";").encode("utf-8"),
-            file_name="stats_turfvision_clean.csv",
-            mime="text/csv"
-        )
-
-        # Export Excel
-        excel_io = BytesIO()
-        df_export.to_excel(excel_io, index=False, engine='openpyxl')
-        st.download_button(
-            label="⬇️ Télécharger Excel",
-            data=excel_io.getvalue(),
-            file_name="stats_turfvision_clean.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+        colonnes_export = st.multiselect("Colonnes", list(df_complet.columns), default=list(df_complet.columns))
+        debut = fin = None
+        if st.checkbox("Limiter à une période"):
+            periode = st.date_input("Période", value=(date.today() - timedelta(days=365), date.today()))
+            if len(periode) == 2:
+                debut, fin = periode
+
+        formats = {"CSV": "csv", "Excel": "excel"}
+        if colonnaire_disponible():
+            formats["Parquet"] = "parquet"
+        format_export = formats[st.radio("Format", list(formats), horizontal=True)]
+        mime, extension = FORMATS[format_export]
+
+        # Fichier préparé au clic puis gardé dans la session (st.download_button n'accepte
+        # une fonction pour data que sur les versions récentes de Streamlit)
+        parametres = (format_export, tuple(colonnes_export), debut, fin, signature_table(FUSION_PATH))
+        if st.button("⚙️ Préparer l'export", disabled=not colonnes_export):
+            st.session_state["export_stats"] = (
+                parametres, contenu_export(FUSION_PATH, format_export, colonnes_export, debut, fin)
+            )
+        export = st.session_state.get("export_stats")
+        if export is not None and export[0] == parametres:
+            st.download_button(
+                label=f"⬇️ Télécharger {extension.upper()}",
+                data=export[1],
+                file_name=f"stats_turfvision_clean.{extension}",
+                mime=mime,
+            )
     except Exception as e:
         st.error(f"❌ Erreur dans l’export : {e}")
@@ -0,0 +1,31 @@
+# app/ui_taches.py
+
+import streamlit as st
+
+from app.taches import ECHEC, TACHES, TERMINEE, get_gestionnaire, lancer
+
+
+def afficher_taches():
+    """État des tâches de fond (reconstructions, features, entraînement) et boutons de lancement."""
+    st.markdown("### ⚙️ Tâches en arrière-plan")
+
+    for nom, (libelle, _) in TACHES.items():
+        if st.button(libelle, key=f"tache_{nom}"):
+            tache = lancer(nom)
+            st.caption(f"Tâche n°{tache.id} : {tache.statut}")
+
+    taches = get_gestionnaire().taches()
+    if not taches:
+        st.caption("Aucune tâche lancée depuis le démarrage.")
+        return
+
+    for t in taches[:5]:
+        icone = "✅" if t.statut == TERMINEE else "❌" if t.statut == ECHEC else "⏳"
+        st.write(f"{icone} **{t.libelle}** — {t.statut} ({t.duree():.1f} s)")
+        if t.active:
+            st.progress(t.progression, text=t.message)
+        elif t.statut == ECHEC:
+            st.caption(t.message)
+
+    if any(t.active for t in taches):
+        st.button("🔄 Actualiser", key="taches_actualiser")
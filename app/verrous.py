@@ -0,0 +1,103 @@
+# app/verrous.py
+
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Fichiers de verrou consultatif (un par ressource), partagés par toutes les sessions
+DOSSIER_VERROUS = "data/.verrous"
+
+_tenus = threading.local()
+
+
+class ConflitVersion(Exception):
+    """La table a été modifiée par une autre session depuis sa lecture."""
+
+
+def _verrouiller(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            time.sleep(0.01)
+
+
+def _deverrouiller(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def verrou(nom):
+    """
+    Verrou exclusif entre processus et entre threads sur la ressource `nom`.
+    Réentrant dans un même thread (un upsert appelé sous le verrou de sa table ne se bloque pas).
+    """
+    tenus = _tenus.__dict__.setdefault("compteurs", {})
+    if tenus.get(nom):
+        tenus[nom] += 1
+        try:
+            yield
+        finally:
+            tenus[nom] -= 1
+        return
+
+    os.makedirs(DOSSIER_VERROUS, exist_ok=True)
+    fichier = os.path.join(DOSSIER_VERROUS, hashlib.sha1(nom.encode("utf-8")).hexdigest()[:16] + ".lock")
+    with open(fichier, "a+b") as f:
+        _verrouiller(f)
+        tenus[nom] = 1
+        try:
+            yield
+        finally:
+            tenus[nom] = 0
+            _deverrouiller(f)
+
+
+def verrou_course(id_course):
+    """Sérialise les sessions qui travaillent sur la même course, et seulement celles-là."""
+    return verrou(f"course:{id_course}")
+
+
+def verrou_table(chemin):
+    """Protège le court instant où le fichier d'une table est remplacé."""
+    return verrou(f"table:{os.path.normpath(chemin)}")
+
+
+def ecrire_atomique(chemin, ecrire):
+    """
+    ecrire(chemin_temporaire) puis renommage atomique sur chemin : un lecteur voit
+    l'ancienne ou la nouvelle version, jamais un fichier à moitié écrit.
+    """
+    temporaire = f"{chemin}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        ecrire(temporaire)
+        with open(temporaire, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(temporaire, chemin)
+    finally:
+        if os.path.exists(temporaire):
+            os.remove(temporaire)
+
+
+def ecrire_json(chemin, contenu):
+    def ecrire(temporaire):
+        with open(temporaire, "w", encoding="utf-8") as f:
+            json.dump(contenu, f)
+    ecrire_atomique(chemin, ecrire)
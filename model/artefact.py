@@ -0,0 +1,127 @@
+# model/artefact.py
+
+import json
+import os
+import sys
+import time
+import joblib
+import numpy as np
+import xgboost as xgb
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.verrous import ecrire_atomique
+
+# Une ligne d'en-tête JSON (format, features, métadonnées) suivie du booster natif en UBJSON
+ARTIFACT_PATH = "model/checkpoints/model_a1.turf"
+FORMAT = "turfvision-a1"
+VERSION_FORMAT = 1
+
+
+def _arbres(modele_json):
+    return modele_json["learner"]["gradient_booster"]["model"]["trees"]
+
+
+def _transformer(x, moyenne, echelle):
+    """Valeur vue par le booster d'origine : scaler en float64 puis conversion float32 par XGBoost."""
+    return ((x.astype(np.float64) - moyenne) / echelle).astype(np.float32)
+
+
+def replier_scaler(modele_json, moyennes, echelles):
+    """
+    Intègre un StandardScaler aux seuils des arbres : (x - m) / s < t  <=>  x < t * s + m (s > 0).
+    Le booster obtenu s'applique directement aux features brutes. Seuls les nœuds internes
+    sont modifiés (dans les feuilles, split_conditions porte la valeur de sortie).
+    Les seuils d'XGBoost sont souvent des valeurs exactes des données : chaque seuil replié est
+    ajusté au float32 près pour que x < seuil donne exactement la même branche qu'avant.
+    """
+    for arbre in _arbres(modele_json):
+        gauches = np.asarray(arbre["left_children"])
+        internes = np.flatnonzero(gauches != -1)
+        if len(internes) == 0:
+            continue
+        seuils = np.asarray(arbre["split_conditions"], dtype=np.float32)
+        indices = np.asarray(arbre["split_indices"])[internes]
+        t, m, e = seuils[internes], moyennes[indices], echelles[indices]
+
+        # Plus petit x float32 tel que transformer(x) >= t (la transformation est croissante)
+        x = (t.astype(np.float64) * e + m).astype(np.float32)
+        for _ in range(64):
+            trop_haut = _transformer(np.nextafter(x, np.float32(-np.inf)), m, e) >= t
+            trop_bas = _transformer(x, m, e) < t
+            if not (trop_haut.any() or trop_bas.any()):
+                break
+            x = np.where(trop_haut, np.nextafter(x, np.float32(-np.inf)), x)
+            x = np.where(trop_bas, np.nextafter(x, np.float32(np.inf)), x)
+
+        seuils[internes] = x
+        arbre["split_conditions"] = seuils.astype(np.float64).tolist()
+    return modele_json
+
+
+def exporter_artefact(model_path, scaler_path, features, artifact_path=ARTIFACT_PATH):
+    """
+    Écrit un artefact unique : le booster XGBoost natif avec le scaler replié dans
+    les seuils, la liste ordonnée des features et des métadonnées de provenance.
+    """
+    from model.predictor import checkpoint_version
+
+    modele = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+    noms_scaler = getattr(scaler, "feature_names_in_", None)
+    if noms_scaler is not None and list(noms_scaler) != list(features):
+        raise ValueError("❌ L'ordre des features du scaler ne correspond pas à celui du modèle.")
+
+    n = len(features)
+    moyennes = scaler.mean_ if scaler.with_mean else np.zeros(n)
+    echelles = scaler.scale_ if scaler.with_std else np.ones(n)
+
+    modele_json = replier_scaler(json.loads(modele.get_booster().save_raw("json")), np.asarray(moyennes), np.asarray(echelles))
+    booster = xgb.Booster()
+    booster.load_model(bytearray(json.dumps(modele_json).encode("utf-8")))
+
+    entete = {
+        "format": FORMAT,
+        "version_format": VERSION_FORMAT,
+        "features": list(features),
+        "metadata": {
+            "source": checkpoint_version(model_path, scaler_path, par_hash=True),
+            "exporte_le": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "xgboost": xgb.__version__,
+            "objectif": modele.get_params().get("objective"),
+            "nb_arbres": len(_arbres(modele_json)),
+        },
+    }
+
+    def ecrire(tmp):
+        with open(tmp, "wb") as f:
+            f.write(json.dumps(entete, ensure_ascii=False).encode("utf-8") + b"\n")
+            f.write(booster.save_raw("ubj"))
+    ecrire_atomique(artifact_path, ecrire)
+    return entete["metadata"]
+
+
+def charger_artefact(artifact_path=ARTIFACT_PATH):
+    """Retourne (booster, features, metadata) ; le booster prédit sur les features brutes en float32."""
+    with open(artifact_path, "rb") as f:
+        entete = json.loads(f.readline())
+        if entete.get("format") != FORMAT or entete.get("version_format") != VERSION_FORMAT:
+            raise ValueError(f"❌ Artefact non reconnu : {artifact_path}")
+        booster = xgb.Booster()
+        booster.load_model(bytearray(f.read()))
+    return booster, entete["features"], entete["metadata"]
+
+
+def artefact_a_jour(artifact_path, *checkpoints):
+    """L'artefact existe et n'est pas plus ancien que les checkpoints joblib dont il est issu."""
+    if not os.path.exists(artifact_path):
+        return False
+    date = os.path.getmtime(artifact_path)
+    return all(not os.path.exists(c) or os.path.getmtime(c) <= date for c in checkpoints)
+
+
+if __name__ == "__main__":
+    from model.loader import MODEL_PATH, SCALER_PATH
+    from model.predictor import TurfPredictor
+
+    metadata = exporter_artefact(MODEL_PATH, SCALER_PATH, TurfPredictor().features)
+    print(f"✅ Artefact exporté : {ARTIFACT_PATH} ({metadata['nb_arbres']} arbres, source {metadata['source'][:40]}...)")
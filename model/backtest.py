@@ -0,0 +1,257 @@
+# model/backtest.py
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from sklearn.metrics import log_loss
+from sklearn.preprocessing import StandardScaler
+
+from app.compute_features import features_candidats
+from app.registre_features import FEATURES, FEATURES_CIBLES, colonnes_a_lire, normaliser_colonnes
+from app.stockage import jours_table, lire_table
+from app.verrous import ecrire_atomique
+from model.predictor import top_k_par_groupe
+from model.recherche import modele
+
+TRAIN_PATH = "data/chevaux_par_course.csv"
+COURSES_PATH = "data/Courses_CompletesTurfVision_id.csv"
+BACKTEST_PATH = "model/checkpoints/backtest_a1.csv"
+# Historique minimal (jours) avant la première période testée
+APPRENTISSAGE_MIN = 365
+# Durée (jours) de chaque période testée avant de réentraîner
+PAS = 30
+# Même nombre d'arbres que le modèle par défaut de TurfPredictor.train
+N_ARBRES = 100
+# Mise fixe par course sur le gagnant prédit ; `rapport` est le rapport simple gagnant de A1 pour 1 € misé
+MISE = 1.0
+# Features par défaut : sans celles calculées à partir de is_A1 sur toute la table d'entraînement (écarts),
+# qui connaissent l'arrivée des courses testées
+FEATURES_SANS_CIBLES = [f for f in FEATURES if f not in FEATURES_CIBLES]
+# Part maximale des courses testées dont le gagnant prédit est ex aequo avec le suivant : au-delà,
+# le modèle ne départage pas les candidats et le "gagnant prédit" n'est que l'ordre des lignes
+MAX_EX_AEQUO = 0.5
+
+
+def _trier_par_jour(df):
+    """Lignes datées de df triées par jour (tri stable) et leurs jours en datetime64[D]."""
+    jours = jours_table(df["date"])
+    datees = jours.notna().to_numpy()
+    jours = jours[datees].to_numpy(dtype="datetime64[D]")
+    ordre = np.argsort(jours, kind="stable")
+    return df[datees].iloc[ordre], jours[ordre]
+
+
+def charger(train_path=TRAIN_PATH, features=FEATURES_SANS_CIBLES):
+    """
+    Lignes d'apprentissage, comme celles de TurfPredictor.train : matrice des features (float32)
+    et cible is_A1 de chaque ligne, lues une fois et triées par jour (chaque période est une tranche contiguë).
+    """
+    df = normaliser_colonnes(lire_table(train_path, colonnes=colonnes_a_lire(features) + ["is_A1", "date"]))
+    missing = [c for c in list(features) + ["is_A1", "date"] if c not in df.columns]
+    if missing:
+        raise ValueError(f"❌ Colonnes manquantes dans les données : {missing}")
+
+    df, jours = _trier_par_jour(df)
+    return {
+        "X": np.ascontiguousarray(df[list(features)].to_numpy(dtype=np.float32)),
+        "y": df["is_A1"].to_numpy(dtype=np.int8),
+        "jours": jours,
+    }
+
+
+def charger_candidats(courses_path=COURSES_PATH, features=FEATURES_SANS_CIBLES):
+    """
+    Lignes de test construites comme à l'inférence (predire_course) : chaque cheval pronostiqué
+    d'une course avec arrivée est un candidat A1 (features_candidats, a1 = cheval_num, arrivée
+    inconnue). La cible is_A1 et le rapport viennent de l'arrivée réelle, gardée à part.
+    """
+    df = lire_table(courses_path)
+    missing = [c for c in ["id_course", "date", "a1"] if c not in df.columns]
+    if missing:
+        raise ValueError(f"❌ Colonnes manquantes dans les courses : {missing}")
+
+    # Arrivée réelle recopiée sur chaque candidat par eclater_courses, hors des colonnes de features
+    df = df[df["a1"].notna()].assign(a1_reel=df["a1"])
+    df, _ = _trier_par_jour(df)
+    candidats = features_candidats(df, features)
+    return {
+        "X": np.ascontiguousarray(candidats[list(features)].to_numpy(dtype=np.float32)),
+        "y": (candidats["cheval_num"] == candidats["a1_reel"]).to_numpy(dtype=np.int8),
+        "courses": pd.factorize(candidats["id_course"].astype(str))[0],
+        "jours": jours_table(candidats["date"]).to_numpy(dtype="datetime64[D]"),
+        "rapport": pd.to_numeric(candidats["rapport"], errors="coerce").to_numpy(dtype=float) if "rapport" in candidats.columns else np.full(len(candidats), np.nan),
+    }
+
+
+def plis_glissants(jours, apprentissage_min=APPRENTISSAGE_MIN, pas=PAS, fenetre=None, jours_test=None):
+    """
+    Plis walk-forward sur des jours triés : apprentissage sur les courses jusqu'au jour D inclus
+    (les `fenetre` derniers jours seulement si fenetre est donnée), test sur D+1 .. D+pas, puis D avance de pas.
+    Les lignes de test sont prises dans jours_test (les mêmes lignes que l'apprentissage si None).
+    Retourne des (D, (debut, fin) apprentissage, (debut, fin) test) en positions de lignes.
+    """
+    jours_test = jours if jours_test is None else jours_test
+    if len(jours) == 0 or len(jours_test) == 0:
+        return []
+    plis = []
+    D = jours[0] + np.timedelta64(apprentissage_min - 1, "D")
+    while D < jours_test[-1]:
+        fin_test = D + np.timedelta64(pas, "D")
+        debut_app = 0 if fenetre is None else np.searchsorted(jours, D - np.timedelta64(fenetre - 1, "D"), side="left")
+        fin_app = np.searchsorted(jours, D, side="right")
+        debut = np.searchsorted(jours_test, D, side="right")
+        fin = np.searchsorted(jours_test, fin_test, side="right")
+        if fin > debut:
+            plis.append((D, (int(debut_app), int(fin_app)), (int(debut), int(fin))))
+        D = fin_test
+    return plis
+
+
+# Matrices partagées par les processus du pool (envoyées une fois par processus, pas par pli)
+_X = _y = _X_test = None
+
+
+def _initialiser(X, y, X_test):
+    global _X, _y, _X_test
+    _X, _y, _X_test = X, y, X_test
+
+
+def scorer_pli(num_pli, apprentissage, test, params, n_arbres):
+    """Entraîne sur la tranche d'apprentissage et retourne les proba_A1 des candidats de la tranche de test."""
+    debut = time.time()
+    (a0, a1), (t0, t1) = apprentissage, test
+    if len(np.unique(_y[a0:a1])) < 2:
+        return num_pli, None, time.time() - debut
+    scaler = StandardScaler().fit(_X[a0:a1])
+    clf = modele(params, n_estimators=n_arbres, arret_precoce=None)
+    clf.fit(scaler.transform(_X[a0:a1]), _y[a0:a1])
+    return num_pli, clf.predict_proba(scaler.transform(_X_test[t0:t1]))[:, 1], time.time() - debut
+
+
+def part_ex_aequo(proba, courses):
+    """Part des courses (2 candidats ou plus) dont le gagnant prédit a la même proba_A1 que le deuxième."""
+    codes = pd.factorize(courses)[0]
+    positions, rangs = top_k_par_groupe(codes, proba, 2)
+    nb_courses = codes.max() + 1 if len(codes) else 0
+    premier, deuxieme = np.full(nb_courses, np.nan), np.full(nb_courses, np.nan)
+    premier[codes[positions[rangs == 0]]] = proba[positions[rangs == 0]]
+    deuxieme[codes[positions[rangs == 1]]] = proba[positions[rangs == 1]]
+    departagees = ~np.isnan(deuxieme)
+    return float((premier[departagees] == deuxieme[departagees]).mean()) if departagees.any() else np.nan
+
+
+def mesurer(y, proba, courses, rapport):
+    """Taux top1 / top4 du vrai A1, log-loss et ROI d'une mise fixe sur le gagnant prédit de chaque course."""
+    codes = pd.factorize(courses)[0]
+    positions, rangs = top_k_par_groupe(codes, proba, 4)
+    nb_courses = codes.max() + 1 if len(codes) else 0
+    top4 = np.zeros(nb_courses, dtype=bool)
+    np.logical_or.at(top4, codes[positions], y[positions] == 1)
+    gagnant_predit = positions[rangs == 0]
+    top1 = y[gagnant_predit] == 1
+
+    # Courses sans rapport connu : pas de mise (un gain ne pourrait pas être chiffré)
+    rapports = rapport[gagnant_predit]
+    misees = ~np.isnan(rapports)
+    mises = MISE * misees.sum()
+    gains = MISE * np.where(top1 & misees, rapports, 0.0).sum()
+    return {
+        "courses": int(nb_courses),
+        "taux_top1": top1.mean() if nb_courses else np.nan,
+        "taux_top4": top4.mean() if nb_courses else np.nan,
+        "logloss": log_loss(y, proba, labels=[0, 1]) if len(y) else np.nan,
+        "mises": mises,
+        "gains": gains,
+        "roi": (gains - mises) / mises if mises else np.nan,
+    }
+
+
+def backtester(train_path=TRAIN_PATH, apprentissage_min=APPRENTISSAGE_MIN, pas=PAS, fenetre=None,
+               params=None, n_arbres=N_ARBRES, workers=None, features=FEATURES_SANS_CIBLES, backtest_path=BACKTEST_PATH,
+               courses_path=COURSES_PATH):
+    """
+    Backtest walk-forward du modèle A1 : chaque période de `pas` jours est prédite par un modèle
+    entraîné sur les seules lignes antérieures de train_path ; les courses testées sont scorées comme
+    en production, chaque cheval pronostiqué étant un candidat A1 sans arrivée connue (features_candidats).
+    Les plis sont entraînés en parallèle sur la même matrice de features. Retourne une ligne par période
+    (et une ligne "total") avec taux top1 / top4, log-loss, ROI à mise fixe et part de gagnants prédits
+    ex aequo, aussi écrites dans backtest_path.
+    Par défaut sans FEATURES_CIBLES : les écarts calculés sur toute la table fuiraient l'arrivée des courses testées.
+    Lève une erreur si le modèle ne départage pas les candidats (gagnant prédit ex aequo dans plus de
+    MAX_EX_AEQUO des courses) : les taux et le ROI ne mesureraient que l'ordre des pronos.
+    """
+    donnees = charger(train_path, features)
+    X, y, jours = donnees["X"], donnees["y"], donnees["jours"]
+    test = charger_candidats(courses_path, features)
+    y_test, courses, jours_test, rapport = (test[c] for c in ("y", "courses", "jours", "rapport"))
+    plis = plis_glissants(jours, apprentissage_min, pas, fenetre, jours_test)
+    if not plis:
+        raise ValueError(f"❌ Historique trop court pour un backtest ({apprentissage_min} jours d'apprentissage minimum).")
+
+    proba = np.full(len(y_test), np.nan)
+    durees = {}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_initialiser, initargs=(X, y, test["X"])) as pool:
+        taches = [pool.submit(scorer_pli, num, app, t, params or {}, n_arbres) for num, (_, app, t) in enumerate(plis)]
+        for tache in taches:
+            num, proba_pli, duree = tache.result()
+            durees[num] = duree
+            if proba_pli is not None:
+                t0, t1 = plis[num][2]
+                proba[t0:t1] = proba_pli
+
+    scorees = np.flatnonzero(~np.isnan(proba))
+    ex_aequo = part_ex_aequo(proba[scorees], courses[scorees])
+    if ex_aequo > MAX_EX_AEQUO:
+        raise ValueError(f"❌ proba_A1 sans écart entre candidats : gagnant prédit ex aequo dans {ex_aequo:.0%} des courses "
+                         f"(le modèle ne départage pas les chevaux d'une course, backtest sans objet).")
+
+    lignes = []
+    for num, (D, (a0, a1), (t0, t1)) in enumerate(plis):
+        periode = np.flatnonzero(~np.isnan(proba[t0:t1])) + t0
+        lignes.append({
+            "periode_debut": str(D + np.timedelta64(1, "D")),
+            "periode_fin": str(jours_test[t1 - 1]),
+            "lignes_apprentissage": a1 - a0,
+            **mesurer(y_test[periode], proba[periode], courses[periode], rapport[periode]),
+            "ex_aequo": part_ex_aequo(proba[periode], courses[periode]),
+            "duree": durees[num],
+        })
+    lignes.append({
+        "periode_debut": lignes[0]["periode_debut"], "periode_fin": lignes[-1]["periode_fin"], "lignes_apprentissage": np.nan,
+        **mesurer(y_test[scorees], proba[scorees], courses[scorees], rapport[scorees]),
+        "ex_aequo": ex_aequo,
+        "duree": sum(durees.values()),
+    })
+    rapport_backtest = pd.DataFrame(lignes, index=[f"P{num + 1}" for num in range(len(plis))] + ["total"])
+    ecrire_atomique(backtest_path, lambda tmp: rapport_backtest.to_csv(tmp, index_label="periode"))
+    return rapport_backtest
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Backtest walk-forward du modèle A1 (réentraîné à chaque période)")
+    parser.add_argument("--train", default=TRAIN_PATH)
+    parser.add_argument("--courses", default=COURSES_PATH, help="courses avec arrivée, scorées comme à l'inférence")
+    parser.add_argument("--apprentissage", type=int, default=APPRENTISSAGE_MIN, help="jours d'historique avant la première période")
+    parser.add_argument("--pas", type=int, default=PAS, help="durée de chaque période testée (jours)")
+    parser.add_argument("--fenetre", type=int, default=None, help="apprentissage limité aux N derniers jours")
+    parser.add_argument("--arbres", type=int, default=N_ARBRES)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--avec-cibles", action="store_true",
+                        help="ajoute les features calculées à partir de is_A1 dans la table d'entraînement (écarts, biaisées)")
+    args = parser.parse_args()
+    features = FEATURES if args.avec_cibles else FEATURES_SANS_CIBLES
+
+    debut = time.time()
+    try:
+        resultat = backtester(args.train, args.apprentissage, args.pas, args.fenetre, n_arbres=args.arbres, workers=args.workers,
+                              features=features, courses_path=args.courses)
+    except ValueError as e:
+        print(e)
+        raise SystemExit(1)
+    with pd.option_context("display.max_rows", 500, "display.width", 200):
+        print(resultat.drop(columns=["mises", "gains"]).round(3))
+    print(f"✅ Backtest : {len(resultat) - 1} période(s) en {time.time() - debut:.1f} s (rapport : {BACKTEST_PATH})")
@@ -0,0 +1,116 @@
+# model/cache_predictions.py
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+from model.loader import get_predictor, infos_chargement
+
+# Nombre de courses gardées en mémoire ; au-delà, la moins récemment consultée est évincée
+TAILLE_CACHE = 256
+
+
+class CachePredictions:
+    """
+    Cache LRU borné des prédictions d'une course (top 4 + couples), partagé par les sessions.
+    Toutes les entrées valent pour une version de checkpoint : un changement de version
+    vide le cache. Compte les hits, misses et évictions.
+    """
+
+    def __init__(self, taille=TAILLE_CACHE):
+        self.taille = taille
+        self.version = None
+        self._verrou = threading.Lock()
+        self._entrees = OrderedDict()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    @staticmethod
+    def cle(course_id, pronos, discipline, distance, version):
+        """Empreinte des entrées de la prédiction et de la version du modèle."""
+        contenu = [str(course_id), [int(p) for p in pronos], str(discipline), float(distance), version]
+        return hashlib.sha256(json.dumps(contenu).encode("utf-8")).hexdigest()
+
+    def _changer_version(self, version):
+        if version != self.version:
+            if self._entrees:
+                self.invalidations += 1
+            self._entrees.clear()
+            self.version = version
+
+    def lire(self, cle, version):
+        """Entrée {course_id, top4, couples} de la clé, ou None (compté comme miss)."""
+        with self._verrou:
+            self._changer_version(version)
+            entree = self._entrees.get(cle)
+            if entree is None:
+                self.misses += 1
+                return None
+            self._entrees.move_to_end(cle)
+            self.hits += 1
+            return entree
+
+    def ajouter(self, cle, version, course_id, top4, couples):
+        with self._verrou:
+            self._changer_version(version)
+            entree = {"course_id": course_id, "top4": top4, "couples": couples}
+            self._entrees[cle] = entree
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille:
+                self._entrees.popitem(last=False)
+                self.evictions += 1
+            return entree
+
+    def stats(self):
+        with self._verrou:
+            total = self.hits + self.misses
+            return {
+                "entrees": len(self._entrees),
+                "taille": self.taille,
+                "hits": self.hits,
+                "misses": self.misses,
+                "taux_hits": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+
+
+_cache = CachePredictions()
+
+
+def get_cache_predictions():
+    return _cache
+
+
+def predire_course(course_id, pronos, discipline, distance):
+    """
+    Top 4 et couples d'une course saisie, servis par le cache si les mêmes entrées ont déjà
+    été prédites avec le modèle chargé. Retourne (top4, couples, depuis_cache) ;
+    top4 et couples sont des copies modifiables.
+    """
+    from app.compute_features import features_candidats
+
+    predictor = get_predictor()
+    version = infos_chargement()["version"]
+    cle = _cache.cle(course_id, pronos, discipline, distance, version)
+
+    entree = _cache.lire(cle, version)
+    depuis_cache = entree is not None
+    if entree is None:
+        # Features des chevaux candidats, calculées par le registre comme à l'entraînement
+        course = {"course_id": course_id, **{f"prono{i + 1}": cheval for i, cheval in enumerate(pronos)}}
+        df_course = features_candidats(pd.DataFrame([course]), predictor.features)
+
+        # Un seul passage du modèle pour le top 4 et les couples
+        top4, couples = predictor.predict_courses(df_course)
+        couples = couples.drop(columns="course_id")
+        if "is_A1_ecart" in top4.columns:
+            top4 = top4.sort_values(["proba_A1", "is_A1_ecart"], ascending=[False, True])
+        entree = _cache.ajouter(cle, version, course_id, top4, couples)
+
+    return entree["top4"].copy(), entree["couples"].copy(), depuis_cache
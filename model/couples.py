@@ -0,0 +1,120 @@
+# model/couples.py
+
+import numpy as np
+import pandas as pd
+
+# Couples gagnants retenus par course
+NB_COUPLES = 6
+# Courses traitées à la fois : les matrices N × N d'un lot restent de taille bornée
+TAILLE_LOT_COUPLES = 2048
+
+
+def disposer_par_course(codes, valeurs):
+    """
+    Valeurs disposées en matrice (nb_courses, taille_max) dans l'ordre des lignes de chaque course
+    (NaN en remplissage), avec la position d'origine de chaque case (-1 en remplissage).
+    Les lignes de code < 0 sont ignorées.
+    """
+    codes = np.asarray(codes)
+    valides = np.flatnonzero(codes >= 0)
+    if len(valides) == 0:
+        return np.empty((0, 0)), np.empty((0, 0), dtype=int)
+
+    codes_v = codes[valides]
+    rang_dans_course = pd.Series(codes_v).groupby(codes_v, sort=False).cumcount().to_numpy()
+    nb_courses, taille_max = codes_v.max() + 1, rang_dans_course.max() + 1
+
+    matrice = np.full((nb_courses, taille_max), np.nan)
+    positions = np.full((nb_courses, taille_max), -1)
+    matrice[codes_v, rang_dans_course] = np.asarray(valeurs, dtype=float)[valides]
+    positions[codes_v, rang_dans_course] = valides
+    return matrice, positions
+
+
+def probas_victoire(scores):
+    """
+    proba_A1 de chaque course (lignes, NaN = pas de cheval) normalisées en probabilités
+    de victoire de somme 1. Course sans proba positive : chevaux équiprobables.
+    """
+    presents = ~np.isnan(scores)
+    s = np.where(presents, np.clip(np.nan_to_num(scores), 0, None), 0.0)
+    total = s.sum(axis=1, keepdims=True)
+    uniforme = presents / np.maximum(presents.sum(axis=1, keepdims=True), 1)
+    return np.where(total > 0, s / np.where(total > 0, total, 1), uniforme)
+
+
+def harville(p):
+    """
+    Probabilités d'arrivée ordonnée des deux premiers (modèle de Harville / Plackett–Luce) :
+    [c, i, j] = P(i premier, j second) = p_i × p_j / (1 - p_i) pour la course c, diagonale nulle.
+    p : (nb_courses, N) probabilités de victoire ; résultat (nb_courses, N, N).
+    """
+    reste = 1 - p
+    facteur = np.divide(p, reste, out=np.zeros_like(p), where=reste > 0)
+    ordonnees = facteur[:, :, None] * p[:, None, :]
+    diagonale = np.arange(p.shape[1])
+    ordonnees[:, diagonale, diagonale] = 0
+    return ordonnees
+
+
+def probas_couples(codes, proba):
+    """
+    Probabilités de tous les couples de chaque course du lot.
+    Retourne (positions, ordonnees, non_ordonnees) : positions (nb_courses, N) des lignes d'origine
+    (-1 en remplissage), ordonnees[c, i, j] = P(i premier, j second) et
+    non_ordonnees[c, i, j] = P({i, j} aux deux premières places, dans un ordre quelconque).
+    """
+    scores, positions = disposer_par_course(codes, proba)
+    ordonnees = harville(probas_victoire(scores))
+    return positions, ordonnees, ordonnees + ordonnees.transpose(0, 2, 1)
+
+
+def couples_par_course(codes, proba, k=NB_COUPLES, taille_lot=TAILLE_LOT_COUPLES):
+    """
+    Les k couples gagnants (deux premiers, ordre indifférent) les plus probables de chaque course,
+    parmi toutes les paires de partants, sélectionnés par tri partiel.
+    Retourne un DataFrame course, position_1, position_2 (lignes d'origine, position_1 étant le
+    cheval le plus probable gagnant), proba_couple, proba_1_puis_2 et proba_2_puis_1,
+    course par course et proba_couple décroissante.
+    """
+    scores, positions = disposer_par_course(codes, proba)
+    p = probas_victoire(scores)
+    # Chevaux de chaque course par proba de victoire décroissante (le remplissage reste en fin de ligne)
+    ordre = np.argsort(-p, axis=1, kind="stable")
+    p = np.take_along_axis(p, ordre, axis=1)
+    positions = np.take_along_axis(positions, ordre, axis=1)
+    i, j = np.triu_indices(p.shape[1], 1)
+    k = min(k, len(i))
+
+    morceaux = []
+    for debut in range(0, len(p) if k else 0, taille_lot):
+        p_lot, positions_lot = p[debut:debut + taille_lot], positions[debut:debut + taille_lot]
+        ordonnees = harville(p_lot)
+        p_12, p_21 = ordonnees[:, i, j], ordonnees[:, j, i]
+        valides = (positions_lot[:, i] >= 0) & (positions_lot[:, j] >= 0)
+        cles = np.where(valides, p_12 + p_21, -np.inf)
+
+        if k < len(i):
+            colonnes = np.argpartition(-cles, k - 1, axis=1)[:, :k]
+        else:
+            colonnes = np.broadcast_to(np.arange(len(i)), cles.shape)
+        lignes = np.arange(len(p_lot))[:, None]
+        # Tri des k retenus seulement (à égalité, la paire des chevaux les plus probables d'abord)
+        colonnes = colonnes[lignes, np.lexsort((colonnes, -cles[lignes, colonnes]), axis=1)]
+
+        garder = valides[lignes, colonnes]
+        morceaux.append(pd.DataFrame({
+            "course": np.broadcast_to(debut + lignes, colonnes.shape)[garder],
+            "position_1": positions_lot[lignes, i[colonnes]][garder],
+            "position_2": positions_lot[lignes, j[colonnes]][garder],
+            "proba_couple": cles[lignes, colonnes][garder],
+            "proba_1_puis_2": p_12[lignes, colonnes][garder],
+            "proba_2_puis_1": p_21[lignes, colonnes][garder],
+        }))
+
+    if not morceaux:
+        return pd.DataFrame({
+            "course": np.empty(0, dtype=int), "position_1": np.empty(0, dtype=int), "position_2": np.empty(0, dtype=int),
+            "proba_couple": np.empty(0), "proba_1_puis_2": np.empty(0), "proba_2_puis_1": np.empty(0),
+        })
+    return pd.concat(morceaux, ignore_index=True)
@@ -0,0 +1,64 @@
+# model/loader.py
+
+import threading
+import time
+
+from model.artefact import ARTIFACT_PATH, artefact_a_jour
+from model.predictor import TurfPredictor, checkpoint_version
+
+MODEL_PATH = "model/checkpoints/model_a1.joblib"
+SCALER_PATH = "model/checkpoints/scaler_a1.joblib"
+
+# Un predictor chargé par couple de checkpoints, partagé par toutes les sessions du processus
+_verrou = threading.Lock()
+_cache = {}
+
+
+def get_predictor(model_path=MODEL_PATH, scaler_path=SCALER_PATH, par_hash=False, artifact_path=ARTIFACT_PATH):
+    """
+    Retourne le TurfPredictor partagé du processus pour ces checkpoints.
+    Il n'est rechargé depuis le disque que si la version des fichiers a changé
+    (date/taille, ou contenu avec par_hash=True).
+    L'artefact exporté (booster natif, scaler replié) est utilisé s'il est à jour par rapport
+    aux checkpoints joblib ; sinon on charge le couple modèle + scaler.
+    """
+    cle = (model_path, scaler_path)
+    version = checkpoint_version(model_path, scaler_path, artifact_path, par_hash=par_hash)
+
+    with _verrou:
+        entree = _cache.get(cle)
+        if entree is not None and entree["version"] == version:
+            return entree["predictor"]
+
+        debut = time.perf_counter()
+        predictor = TurfPredictor()
+        if artefact_a_jour(artifact_path, model_path, scaler_path):
+            predictor.load_artefact(artifact_path)
+            format_charge = "artefact"
+        else:
+            predictor.load(model_path, scaler_path)
+            format_charge = "joblib"
+        duree = time.perf_counter() - debut
+
+        _cache[cle] = {
+            "predictor": predictor,
+            "version": version,
+            "format": format_charge,
+            "duree_chargement": duree,
+            "charge_le": time.time(),
+            "nb_chargements": (entree["nb_chargements"] + 1) if entree else 1,
+        }
+        return predictor
+
+
+def infos_chargement(model_path=MODEL_PATH, scaler_path=SCALER_PATH):
+    """Version, durée du dernier chargement (s) et nombre de chargements, ou None si jamais chargé."""
+    entree = _cache.get((model_path, scaler_path))
+    if entree is None:
+        return None
+    return {k: v for k, v in entree.items() if k != "predictor"}
+
+
+def vider_cache():
+    with _verrou:
+        _cache.clear()
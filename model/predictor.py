@@ -1,30 +1,90 @@
+import hashlib
+import os
+import numpy as np
 import pandas as pd
 import xgboost as xgb
 import joblib
-from itertools import combinations
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 
+from app.registre_features import FEATURES, FEATURES_CIBLES, colonnes_a_lire, normaliser_colonnes
+from app.stockage import lire_table
+from app.verrous import ecrire_atomique
+from model.artefact import charger_artefact
+from model.couples import couples_par_course
+from model.recherche import LEADERBOARD_PATH, modele, rechercher
+
+def checkpoint_version(*paths, par_hash=False):
+    """
+    Identifiant des checkpoints : taille + date de modification (change dès qu'un fichier
+    est réécrit), ou empreinte SHA-256 du contenu avec par_hash=True.
+    """
+    parties = []
+    for path in paths:
+        if not os.path.exists(path):
+            parties.append(f"{os.path.basename(path)}:absent")
+        elif par_hash:
+            empreinte = hashlib.sha256()
+            with open(path, "rb") as f:
+                for bloc in iter(lambda: f.read(1 << 20), b""):
+                    empreinte.update(bloc)
+            parties.append(f"{os.path.basename(path)}:{empreinte.hexdigest()}")
+        else:
+            stat = os.stat(path)
+            parties.append(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}")
+    return "|".join(parties)
+
+
+def top_k_par_groupe(codes, valeurs, k):
+    """
+    Sélection partielle des k plus grandes valeurs de chaque groupe, sans tri global.
+    Les groupes (codes >= 0, numérotés par ordre d'apparition) sont disposés en matrice
+    (nb_groupes, taille_max) puis np.argpartition isole les k meilleurs de chaque ligne.
+    Retourne les positions retenues (groupe par groupe, valeur décroissante) et leur rang 0..k-1.
+    """
+    codes = np.asarray(codes)
+    valides = np.flatnonzero(codes >= 0)
+    if len(valides) == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+
+    codes_v = codes[valides]
+    rang_dans_groupe = pd.Series(codes_v).groupby(codes_v, sort=False).cumcount().to_numpy()
+    nb_groupes, taille_max = codes_v.max() + 1, rang_dans_groupe.max() + 1
+
+    matrice = np.full((nb_groupes, taille_max), -np.inf)
+    positions = np.full((nb_groupes, taille_max), -1)
+    matrice[codes_v, rang_dans_groupe] = valeurs[valides]
+    positions[codes_v, rang_dans_groupe] = valides
+
+    k = min(k, taille_max)
+    if k < taille_max:
+        colonnes = np.argpartition(-matrice, k - 1, axis=1)[:, :k]
+    else:
+        colonnes = np.broadcast_to(np.arange(taille_max), (nb_groupes, taille_max))
+    lignes = np.arange(nb_groupes)[:, None]
+    # Tri des k retenus seulement (à égalité, l'ordre des lignes d'origine est conservé)
+    ordre = np.lexsort((colonnes, -matrice[lignes, colonnes]), axis=1)
+    colonnes = colonnes[lignes, ordre]
+
+    choisies = positions[lignes, colonnes]
+    rangs = np.broadcast_to(np.arange(k), choisies.shape)
+    garder = choisies >= 0
+    return choisies[garder], rangs[garder]
+
+
 class TurfPredictor:
     def __init__(self, train_path=None):
         self.train_path = train_path
         self.model = xgb.XGBClassifier(eval_metric='logloss', use_label_encoder=False)
         self.scaler = StandardScaler()
-        self.features = [
-            'top3_1', 'top3_2', 'top4_1', 'top4_2',
-            'a1_imp', 'a2_imp', 'a1_inf9', 'a2_inf9',
-            'cplg_top3', 'cplg_top4',
-            'top3_1_top4', 'top3_2_top4', 'top3_3_top4',
-            'siprono1<9-A1<9', 'siprono2<9-A1<9', 'siprono3<9-A1<9',
-            'prono_rank_a1', 'prono_rank_a2',
-            'top3_1_ecart', 'top3_2_ecart', 'top4_1_ecart', 'top4_2_ecart',
-            'a1_imp_ecart', 'a2_imp_ecart', 'a1_inf9_ecart', 'a2_inf9_ecart',
-            'cplg_top3_ecart', 'cplg_top4_ecart',
-            'top3_1_top4_ecart', 'top3_2_top4_ecart', 'top3_3_top4_ecart'
-        ]
+        # Booster natif avec scaler replié (artefact exporté) : prioritaire sur model/scaler s'il est chargé
+        self.booster = None
+        self.metadata = None
+        # Features et ordre des colonnes du modèle A1, issus du registre des features
+        self.features = list(FEATURES)
 
     def load_training_data(self):
-        df = pd.read_csv(self.train_path)
+        df = normaliser_colonnes(lire_table(self.train_path, colonnes=colonnes_a_lire(self.features) + ['is_A1']))
 
         if 'is_A1' not in df.columns:
             raise ValueError("❌ La colonne 'is_A1' est manquante dans le fichier d'entraînement.")
@@ -40,57 +100,131 @@ class TurfPredictor:
         X = df[self.features]
         return train_test_split(X, y, test_size=0.2, random_state=42)
 
+    def load_training_groups(self, course_col='course_id'):
+        """Toutes les lignes d'entraînement (X, y) et la course de chaque ligne, pour une validation par course."""
+        df = normaliser_colonnes(lire_table(self.train_path, colonnes=colonnes_a_lire(self.features) + ['is_A1', course_col, 'id_course']))
+        if course_col not in df.columns and 'id_course' in df.columns:
+            course_col = 'id_course'
+        missing = [c for c in self.features + ['is_A1', course_col] if c not in df.columns]
+        if missing:
+            raise ValueError(f"❌ Colonnes manquantes dans les données : {missing}")
+        return df[self.features], df['is_A1'], df[course_col]
+
     def train(self):
         X_train, _, y_train, _ = self.load_training_data()
         X_scaled = self.scaler.fit_transform(X_train)
         self.model.fit(X_scaled, y_train)
 
+    def train_groupe(self, n_candidats=20, n_plis=5, workers=None, budget=None, leaderboard_path=LEADERBOARD_PATH):
+        """
+        Entraînement avec recherche d'hyperparamètres en GroupKFold sur les courses (arrêt précoce
+        sur le pli tenu à l'écart, candidats et plis en parallèle), puis réentraînement du meilleur
+        candidat sur toutes les lignes avec son nombre d'arbres moyen. Retourne le leaderboard.
+        """
+        X, y, groupes = self.load_training_groups()
+        if y.nunique() < 2:
+            raise ValueError(f"❌ Données non équilibrées. Classes présentes : {y.unique()}")
+
+        leaderboard = rechercher(X, y, groupes, n_candidats=n_candidats, n_plis=n_plis,
+                                 workers=workers, budget=budget, leaderboard_path=leaderboard_path)
+        if leaderboard.empty:
+            raise ValueError("❌ Aucun candidat évalué sur tous les plis dans le budget de temps.")
+
+        meilleur = leaderboard.iloc[0]
+        self.model = modele(meilleur["params"], n_estimators=int(meilleur["meilleure_iteration"]) + 1, arret_precoce=None)
+        self.model.set_params(n_jobs=None)
+        self.model.fit(self.scaler.fit_transform(X), y)
+        return leaderboard
+
     def save(self, model_path: str, scaler_path: str):
-        joblib.dump(self.model, model_path)
-        joblib.dump(self.scaler, scaler_path)
+        # Écriture atomique : un processus qui recharge les checkpoints ne lit jamais un fichier partiel
+        ecrire_atomique(model_path, lambda tmp: joblib.dump(self.model, tmp))
+        ecrire_atomique(scaler_path, lambda tmp: joblib.dump(self.scaler, tmp))
 
     def load(self, model_path: str, scaler_path: str):
         self.model = joblib.load(model_path)
         self.scaler = joblib.load(scaler_path)
+        self.booster = None
 
-    def predict_top4_A1(self, df_course: pd.DataFrame):
-        df_course = df_course.copy()
+    def load_artefact(self, artifact_path: str):
+        self.booster, self.features, self.metadata = charger_artefact(artifact_path)
 
-        if not all(f in df_course.columns for f in self.features):
+    def _verifier_features(self, df: pd.DataFrame):
+        if not all(f in df.columns for f in self.features):
             raise ValueError("❌ Certaines features manquent dans les données de course.")
 
-        X = self.scaler.transform(df_course[self.features])
-        df_course["proba_A1"] = self.model.predict_proba(X)[:, 1]
-        return df_course.sort_values("proba_A1", ascending=False).head(4)
+    def predict_proba_A1(self, df: pd.DataFrame):
+        if self.booster is not None:
+            # Matrice float32 contiguë, sans passage par le scaler (replié dans les seuils)
+            X = np.ascontiguousarray(df[self.features].to_numpy(dtype=np.float32))
+            return self.booster.inplace_predict(X)
+        X = self.scaler.transform(df[self.features])
+        return self.model.predict_proba(X)[:, 1]
+
+    def _top4(self, df: pd.DataFrame, proba, codes):
+        """Top 4 par course (ordre des courses conservé, proba décroissante) via une sélection partielle."""
+        positions, _ = top_k_par_groupe(codes, proba, 4)
+        top4 = df.iloc[positions].copy()
+        top4["proba_A1"] = proba[positions]
+        return top4
 
-    def predict_couple_gagnant(self, df_course: pd.DataFrame):
-        df_course = df_course.copy()
-
-        if not all(f in df_course.columns for f in self.features):
-            raise ValueError("❌ Certaines features manquent dans les données de course.")
-
-        X = self.scaler.transform(df_course[self.features])
-        df_course["proba_A1"] = self.model.predict_proba(X)[:, 1]
-
-        top_chevaux = df_course.sort_values("proba_A1", ascending=False).head(4)
+    @staticmethod
+    def _couples(df: pd.DataFrame, proba, codes):
+        """
+        Les couples gagnants les plus probables de chaque course parmi tous les partants (modèle de Harville
+        sur les proba_A1 normalisées par course) : proba_couple pour les deux premiers dans un ordre quelconque,
+        proba_1_puis_2 / proba_2_puis_1 pour chaque ordre.
+        """
+        couples = couples_par_course(codes, proba)
+        chevaux = df["cheval_num"].to_numpy()
+        couples.insert(1, "cheval_1", chevaux[couples.pop("position_1").to_numpy()])
+        couples.insert(2, "cheval_2", chevaux[couples.pop("position_2").to_numpy()])
+        probas = ["proba_couple", "proba_1_puis_2", "proba_2_puis_1"]
+        couples[probas] = couples[probas].round(5)
+        return couples
+
+    def _scorer_courses(self, df_courses: pd.DataFrame, course_col: str):
+        """proba_A1 de toutes les lignes en un seul predict_proba, codes et identifiants des courses."""
+        self._verifier_features(df_courses)
+        proba = self.predict_proba_A1(df_courses)
+        codes, ids = pd.factorize(df_courses[course_col])
+        return proba, codes, ids
+
+    @classmethod
+    def _couples_courses(cls, df_courses: pd.DataFrame, proba, codes, ids, course_col: str):
+        couples = cls._couples(df_courses, proba, codes)
+        couples.insert(0, course_col, np.asarray(ids)[couples.pop("course").to_numpy()])
+        return couples.reset_index(drop=True)
+
+    def predict_courses(self, df_courses: pd.DataFrame, course_col: str = "course_id"):
+        """
+        Score plusieurs courses en un seul predict_proba.
+        Retourne (top4, couples) : les 4 chevaux les plus probables A1 de chaque course
+        et les 6 couples gagnants les plus probables de chaque course, avec la colonne course_col.
+        """
+        proba, codes, ids = self._scorer_courses(df_courses, course_col)
+        top4 = self._top4(df_courses, proba, codes)
+        return top4, self._couples_courses(df_courses, proba, codes, ids, course_col)
+
+    def predict_top4_A1_batch(self, df_courses: pd.DataFrame, course_col: str = "course_id"):
+        proba, codes, _ = self._scorer_courses(df_courses, course_col)
+        return self._top4(df_courses, proba, codes)
+
+    def predict_couple_gagnant_batch(self, df_courses: pd.DataFrame, course_col: str = "course_id"):
+        proba, codes, ids = self._scorer_courses(df_courses, course_col)
+        return self._couples_courses(df_courses, proba, codes, ids, course_col)
 
-        couples = []
-        for c1, c2 in combinations(top_chevaux.itertuples(index=False), 2):
-            couples.append({
-                "cheval_1": c1.cheval_num,
-                "cheval_2": c2.cheval_num,
-                "proba_couple": round((c1.proba_A1 + c2.proba_A1) / 2, 5)
-            })
+    def predict_top4_A1(self, df_course: pd.DataFrame):
+        self._verifier_features(df_course)
+        proba = self.predict_proba_A1(df_course)
+        return self._top4(df_course, proba, np.zeros(len(df_course), dtype=int))
 
-        return pd.DataFrame(couples).sort_values("proba_couple", ascending=False).head(6)
+    def predict_couple_gagnant(self, df_course: pd.DataFrame):
+        self._verifier_features(df_course)
+        proba = self.predict_proba_A1(df_course)
+        couples = self._couples(df_course, proba, np.zeros(len(df_course), dtype=int))
+        return couples.drop(columns="course").reset_index(drop=True)
 
     @staticmethod
     def required_ecart_columns():
-        return [
-            'top3_1_ecart', 'top3_2_ecart',
-            'top4_1_ecart', 'top4_2_ecart',
-            'a1_imp_ecart', 'a2_imp_ecart',
-            'a1_inf9_ecart', 'a2_inf9_ecart',
-            'cplg_top3_ecart', 'cplg_top4_ecart',
-            'top3_1_top4_ecart', 'top3_2_top4_ecart', 'top3_3_top4_ecart'
-        ]
+        return list(FEATURES_CIBLES)
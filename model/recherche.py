@@ -0,0 +1,193 @@
+# model/recherche.py
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.metrics import log_loss, roc_auc_score
+from sklearn.model_selection import GroupKFold
+from sklearn.preprocessing import StandardScaler
+
+from app.verrous import ecrire_atomique
+
+LEADERBOARD_PATH = "model/checkpoints/leaderboard_a1.csv"
+
+# Espace de recherche : tirage aléatoire (reproductible) de combinaisons
+ESPACE = {
+    "max_depth": [2, 3, 4, 5, 6, 8],
+    "learning_rate": [0.01, 0.03, 0.05, 0.1, 0.2],
+    "subsample": [0.6, 0.8, 1.0],
+    "colsample_bytree": [0.6, 0.8, 1.0],
+    "min_child_weight": [1, 3, 5, 10],
+    "reg_lambda": [0.1, 1.0, 5.0, 10.0],
+}
+MAX_ARBRES = 2000
+ARRET_PRECOCE = 50
+
+
+def candidats(n, seed=42):
+    """n jeux d'hyperparamètres distincts, le premier étant les valeurs par défaut d'XGBoost."""
+    rng = np.random.default_rng(seed)
+    tirages = [{}]
+    vus = {()}
+    for _ in range(50 * n):
+        if len(tirages) >= n:
+            break
+        params = {nom: valeurs[rng.integers(len(valeurs))] for nom, valeurs in ESPACE.items()}
+        cle = tuple(sorted(params.items()))
+        if cle not in vus:
+            vus.add(cle)
+            tirages.append({k: v.item() if hasattr(v, "item") else v for k, v in params.items()})
+    return tirages
+
+
+def plis_par_course(groupes, n_plis):
+    """GroupKFold : toutes les lignes d'une course tombent du même côté de chaque pli."""
+    n_plis = min(n_plis, pd.Series(groupes).nunique())
+    indices = np.arange(len(groupes))
+    return list(GroupKFold(n_splits=n_plis).split(indices, groups=groupes))
+
+
+def modele(params, n_estimators=MAX_ARBRES, arret_precoce=ARRET_PRECOCE, echeance=None):
+    """XGBClassifier mono-thread (le parallélisme est assuré par le pool de processus)."""
+    rappels = [_Echeance(echeance)] if echeance is not None else None
+    return xgb.XGBClassifier(
+        eval_metric="logloss", n_estimators=n_estimators, early_stopping_rounds=arret_precoce,
+        n_jobs=1, callbacks=rappels, **params,
+    )
+
+
+class _Echeance(xgb.callback.TrainingCallback):
+    """Arrête l'ajout d'arbres quand le budget de temps de la recherche est épuisé."""
+
+    def __init__(self, echeance):
+        super().__init__()
+        self.echeance = echeance
+        self.atteinte = False
+
+    def after_iteration(self, model, epoch, evals_log):
+        self.atteinte = time.time() >= self.echeance
+        return self.atteinte
+
+
+# Données partagées par les processus du pool (envoyées une fois par processus, pas par tâche)
+_X = _y = _plis = None
+
+
+def _initialiser(X, y, plis):
+    global _X, _y, _plis
+    _X, _y, _plis = X, y, plis
+
+
+def evaluer(num_candidat, params, num_pli, echeance):
+    """Entraîne un candidat sur un pli, avec arrêt précoce sur la partie tenue à l'écart."""
+    debut = time.time()
+    apprentissage, validation = _plis[num_pli]
+    scaler = StandardScaler().fit(_X[apprentissage])
+    X_app, X_val = scaler.transform(_X[apprentissage]), scaler.transform(_X[validation])
+    y_app, y_val = _y[apprentissage], _y[validation]
+
+    clf = modele(params, echeance=echeance)
+    clf.fit(X_app, y_app, eval_set=[(X_val, y_val)], verbose=False)
+    proba = clf.predict_proba(X_val)[:, 1]
+    try:
+        meilleure_iteration = clf.best_iteration
+    except AttributeError:
+        # Arrêt par l'échéance avant toute évaluation d'arrêt précoce
+        meilleure_iteration = clf.get_booster().num_boosted_rounds() - 1
+    return {
+        "candidat": num_candidat,
+        "pli": num_pli,
+        "logloss": log_loss(y_val, proba, labels=[0, 1]),
+        "auc": roc_auc_score(y_val, proba) if len(np.unique(y_val)) == 2 else np.nan,
+        "meilleure_iteration": int(meilleure_iteration),
+        "interrompu": time.time() >= echeance,
+        "duree": time.time() - debut,
+    }
+
+
+def rechercher(X, y, groupes, n_candidats=20, n_plis=5, workers=None, budget=None,
+               seed=42, leaderboard_path=LEADERBOARD_PATH):
+    """
+    Recherche d'hyperparamètres en validation croisée par course : chaque (candidat, pli)
+    est une tâche du pool de processus. Au-delà de `budget` secondes, les tâches non démarrées
+    sont annulées et celles en cours arrêtent d'ajouter des arbres ; seuls les candidats évalués
+    sur tous les plis sans interruption sont classés.
+    Retourne le leaderboard (meilleur candidat en tête), aussi écrit dans leaderboard_path.
+    """
+    X = np.asarray(X, dtype=np.float32)
+    y = np.asarray(y)
+    plis = plis_par_course(np.asarray(groupes), n_plis)
+    grille = candidats(n_candidats, seed)
+    workers = workers or os.cpu_count()
+    echeance = time.time() + budget if budget else float("inf")
+
+    resultats = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initialiser, initargs=(X, y, plis)) as pool:
+        en_cours = {
+            pool.submit(evaluer, c, params, p, echeance)
+            for c, params in enumerate(grille) for p in range(len(plis))
+        }
+        while en_cours:
+            delai = None if echeance == float("inf") else max(echeance - time.time(), 0) + 1
+            finis, en_cours = wait(en_cours, timeout=delai, return_when=FIRST_COMPLETED)
+            resultats += [f.result() for f in finis]
+            if time.time() >= echeance:
+                for f in en_cours:
+                    f.cancel()
+                # Les tâches déjà démarrées s'arrêtent d'elles-mêmes au prochain arbre
+                resultats += [f.result() for f in en_cours if not f.cancelled()]
+                break
+
+    leaderboard = classer(resultats, grille, len(plis))
+    ecrire_atomique(leaderboard_path, lambda tmp: leaderboard.to_csv(tmp, index=False))
+    return leaderboard
+
+
+def classer(resultats, grille, n_plis):
+    """Moyenne par candidat complet (tous les plis, sans interruption), logloss croissante."""
+    colonnes = ["candidat", "logloss", "logloss_std", "auc", "meilleure_iteration", "duree", "plis", "params"]
+    if not resultats:
+        return pd.DataFrame(columns=colonnes)
+
+    df = pd.DataFrame(resultats)
+    complets = df.groupby("candidat").filter(lambda g: len(g) == n_plis and not g["interrompu"].any())
+    if complets.empty:
+        return pd.DataFrame(columns=colonnes)
+
+    leaderboard = complets.groupby("candidat").agg(
+        logloss=("logloss", "mean"),
+        logloss_std=("logloss", "std"),
+        auc=("auc", "mean"),
+        meilleure_iteration=("meilleure_iteration", "mean"),
+        duree=("duree", "sum"),
+        plis=("pli", "count"),
+    ).reset_index()
+    leaderboard["meilleure_iteration"] = leaderboard["meilleure_iteration"].round().astype(int)
+    leaderboard["params"] = [grille[c] for c in leaderboard["candidat"]]
+    return leaderboard.sort_values("logloss", ignore_index=True)[colonnes]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from model.artefact import exporter_artefact
+    from model.loader import MODEL_PATH, SCALER_PATH
+    from model.predictor import TurfPredictor
+
+    parser = argparse.ArgumentParser(description="Recherche d'hyperparamètres A1 en validation croisée par course")
+    parser.add_argument("--train", default="data/chevaux_par_course.csv")
+    parser.add_argument("--candidats", type=int, default=20)
+    parser.add_argument("--plis", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--budget", type=float, default=None, help="durée maximale en secondes")
+    args = parser.parse_args()
+
+    predictor = TurfPredictor(args.train)
+    leaderboard = predictor.train_groupe(args.candidats, args.plis, args.workers, args.budget)
+    predictor.save(MODEL_PATH, SCALER_PATH)
+    exporter_artefact(MODEL_PATH, SCALER_PATH, predictor.features)
+    print(leaderboard.head(10).to_string(index=False))
+    print(f"✅ Meilleur modèle sauvegardé : {MODEL_PATH} (leaderboard : {LEADERBOARD_PATH})")
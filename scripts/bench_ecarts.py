@@ -0,0 +1,58 @@
+# scripts/bench_ecarts.py
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.compute_features import calculer_ecarts, compute_ecart
+
+COLONNES = ['top3_1', 'top4_1', 'cplg_top3', 'top3_1_top4']
+
+
+def generer_chevaux(nb_courses, chevaux_par_course=8, seed=0):
+    """Lignes cheval synthétiques (courses mélangées) avec des flags 0/1/2."""
+    rng = np.random.default_rng(seed)
+    n = nb_courses * chevaux_par_course
+    df = pd.DataFrame({
+        'course_id': rng.permutation(np.repeat(np.arange(nb_courses), chevaux_par_course)),
+        'is_A1': rng.integers(0, 2, n),
+    })
+    for col in COLONNES:
+        df[col] = rng.integers(0, 3, n)
+    return df
+
+
+def ecarts_reference(df, colonnes):
+    """Version historique : compute_ecart groupe par groupe, réalignée sur l'index."""
+    ref = pd.DataFrame(index=df.index, columns=colonnes, dtype=float)
+    for _, g in df.groupby('course_id'):
+        for col in colonnes:
+            ref.loc[g.index, col] = compute_ecart(g[col].fillna(0) * g['is_A1'].fillna(0))
+    return ref
+
+
+def verifier_equivalence(nb_courses=500):
+    df = generer_chevaux(nb_courses)
+    attendu = ecarts_reference(df, COLONNES)
+    obtenu = calculer_ecarts(df, COLONNES)
+    if not np.array_equal(attendu.to_numpy(), obtenu.to_numpy().astype(float)):
+        raise AssertionError("❌ calculer_ecarts diffère de compute_ecart")
+    print(f"✅ Équivalence vérifiée sur {nb_courses} courses")
+
+
+def mesurer(tailles=(1_000, 10_000, 100_000, 1_000_000)):
+    print(f"{'courses':>10} {'lignes':>10} {'secondes':>10}")
+    for nb_courses in tailles:
+        df = generer_chevaux(nb_courses)
+        debut = time.perf_counter()
+        calculer_ecarts(df, COLONNES)
+        duree = time.perf_counter() - debut
+        print(f"{nb_courses:>10} {len(df):>10} {duree:>10.3f}")
+
+
+if __name__ == "__main__":
+    verifier_equivalence()
+    mesurer()
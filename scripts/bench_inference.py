@@ -0,0 +1,67 @@
+# scripts/bench_inference.py
+
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.stockage import lire_table
+from model.artefact import exporter_artefact
+from model.loader import MODEL_PATH, SCALER_PATH
+from model.predictor import TurfPredictor
+
+DATA_PATH = "data/chevaux_par_course.csv"
+
+
+def chronometrer(fonction, repetitions):
+    """Durée médiane d'un appel (s)."""
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        durees.append(time.perf_counter() - debut)
+    return float(np.median(durees))
+
+
+def charger_joblib():
+    predictor = TurfPredictor()
+    predictor.load(MODEL_PATH, SCALER_PATH)
+    return predictor
+
+
+def main(repetitions=200):
+    if not (os.path.exists(MODEL_PATH) and os.path.exists(SCALER_PATH)):
+        print(f"❌ Checkpoints introuvables : {MODEL_PATH}, {SCALER_PATH}")
+        return
+
+    artefact = os.path.join(tempfile.mkdtemp(prefix="artefact_a1_"), "model_a1.turf")
+    exporter_artefact(MODEL_PATH, SCALER_PATH, TurfPredictor().features, artefact)
+
+    def charger_artefact():
+        predictor = TurfPredictor()
+        predictor.load_artefact(artefact)
+        return predictor
+
+    ancien, nouveau = charger_joblib(), charger_artefact()
+    df = lire_table(DATA_PATH, colonnes=ancien.features + ["id_course", "cheval_num"])
+    course = df[df["id_course"] == df["id_course"].iloc[0]]
+
+    ecart = np.abs(ancien.predict_proba_A1(df) - nouveau.predict_proba_A1(df)).max()
+    print(f"Écart max de proba_A1 entre les deux chemins ({len(df)} lignes) : {ecart:.2e}")
+
+    mesures = {
+        "chargement": (lambda: charger_joblib(), charger_artefact, 20),
+        f"1 course ({len(course)} lignes)": (lambda: ancien.predict_proba_A1(course), lambda: nouveau.predict_proba_A1(course), repetitions),
+        "top4 + couples (1 course)": (lambda: ancien.predict_courses(course, "id_course"), lambda: nouveau.predict_courses(course, "id_course"), repetitions),
+        f"lot ({len(df)} lignes)": (lambda: ancien.predict_proba_A1(df), lambda: nouveau.predict_proba_A1(df), 20),
+    }
+    print(f"{'mesure':<32} {'joblib + scaler':>16} {'artefact float32':>17} {'gain':>7}")
+    for nom, (f_ancien, f_nouveau, n) in mesures.items():
+        t_ancien, t_nouveau = chronometrer(f_ancien, n), chronometrer(f_nouveau, n)
+        print(f"{nom:<32} {t_ancien * 1000:>13.3f} ms {t_nouveau * 1000:>14.3f} ms {t_ancien / t_nouveau:>6.1f}×")
+
+
+if __name__ == "__main__":
+    main()
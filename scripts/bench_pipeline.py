@@ -0,0 +1,157 @@
+# scripts/bench_pipeline.py
+
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+RACINE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(RACINE)
+from app.compute_features import calculer_features, eclater_courses
+from app.compute_features import main as compute_features_main
+from app.rebuild_historique import MODEL_PATH, OUTPUT_PATH, SCALER_PATH, reconstruire_historique
+from app.retrait_A1 import marquer_si_A1_dans_top4
+from app.stats_performance import StatsPerformance
+from app.stockage import colonnaire_disponible, lire_table
+from model.predictor import TurfPredictor
+from scripts.generateur_courses import TAILLE_REELLE, generer_dossier
+
+ECHELLES = [1, 10, 100, 1000]
+DOSSIER_RESULTATS = os.path.join(RACINE, "bench")
+# Courses prédites une à une pour mesurer la latence de la page de prédiction
+NB_COURSES_UNITAIRES = 50
+
+
+def mesurer(fonction, *args, **kwargs):
+    """
+    Exécute fonction deux fois et retourne (résultat, mesures) : la durée est prise sur une
+    exécution sans tracemalloc (qui ralentit chaque allocation), le pic mémoire Python sur une
+    seconde exécution tracée, puis le RSS max du processus.
+    """
+    debut = time.perf_counter()
+    resultat = fonction(*args, **kwargs)
+    duree = time.perf_counter() - debut
+
+    tracemalloc.start()
+    try:
+        fonction(*args, **kwargs)
+        _, pic = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Ko sous Linux
+    return resultat, {"secondes": round(duree, 4), "pic_memoire_mo": round(pic / 1e6, 2), "rss_max_mo": round(rss, 1)}
+
+
+def predire_une_a_une(predictor, df, methode):
+    """Appelle predict_top4_A1 ou predict_couple_gagnant course par course, comme l'interface."""
+    courses = df["id_course"].drop_duplicates().iloc[:NB_COURSES_UNITAIRES]
+    for id_course in courses:
+        getattr(predictor, methode)(df[df["id_course"] == id_course])
+    return len(courses)
+
+
+def bencher_echelle(echelle, seed=0):
+    """Toutes les étapes du pipeline sur un dossier data/ synthétique à `echelle` fois la taille réelle."""
+    etapes = {}
+    dossier = tempfile.mkdtemp(prefix=f"bench_turf_x{echelle}_")
+    cwd = os.getcwd()
+    os.chdir(dossier)
+    try:
+        courses = generer_dossier(echelle, seed=seed)
+        os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
+
+        chevaux, etapes["calculer_features"] = mesurer(
+            lambda: calculer_features(eclater_courses(courses), include_target=True)
+        )
+        _, etapes["compute_features.main"] = mesurer(compute_features_main)
+
+        predictor = TurfPredictor("data/chevaux_par_course.csv")
+        _, etapes["TurfPredictor.train"] = mesurer(predictor.train)
+        predictor.save(MODEL_PATH, SCALER_PATH)
+
+        for methode in ("predict_top4_A1", "predict_couple_gagnant"):
+            nb, mesure = mesurer(predire_une_a_une, predictor, chevaux, methode)
+            mesure["ms_par_course"] = round(1000 * mesure["secondes"] / nb, 3)
+            etapes[methode] = mesure
+        _, etapes["predict_courses (lot)"] = mesurer(predictor.predict_courses, chevaux, "id_course")
+
+        _, etapes["reconstruire_historique"] = mesurer(reconstruire_historique)
+        historique = lire_table(OUTPUT_PATH)
+        _, etapes["marquer_si_A1_dans_top4"] = mesurer(marquer_si_A1_dans_top4, historique)
+        if colonnaire_disponible():
+            _, etapes["StatsPerformance (Parquet)"] = mesurer(StatsPerformance.construire, OUTPUT_PATH)
+    finally:
+        os.chdir(cwd)
+
+    return {"nb_courses": len(courses), "nb_lignes_cheval": len(chevaux), "etapes": etapes}
+
+
+def contexte():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RACINE,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "inconnu"
+    return {
+        "commit": commit,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "taille_reelle": TAILLE_REELLE,
+    }
+
+
+def lancer(echelles=ECHELLES, seed=0):
+    resultats = {**contexte(), "echelles": {}}
+    for echelle in echelles:
+        print(f"⏱️ Échelle ×{echelle} ({TAILLE_REELLE * echelle} courses)...")
+        resultats["echelles"][str(echelle)] = res = bencher_echelle(echelle, seed)
+        for nom, m in res["etapes"].items():
+            print(f"   {nom:<28} {m['secondes']:>10.3f} s  {m['pic_memoire_mo']:>9.1f} Mo")
+
+    os.makedirs(DOSSIER_RESULTATS, exist_ok=True)
+    chemin = os.path.join(DOSSIER_RESULTATS, f"{resultats['commit']}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(chemin, "w", encoding="utf-8") as f:
+        json.dump(resultats, f, indent=2, ensure_ascii=False)
+    print(f"✅ Résultats : {chemin}")
+    return chemin
+
+
+def comparer(avant, apres):
+    """Ratio de durée et de mémoire étape par étape entre deux fichiers de résultats."""
+    with open(avant, encoding="utf-8") as f:
+        a = json.load(f)
+    with open(apres, encoding="utf-8") as f:
+        b = json.load(f)
+    print(f"{a['commit']} → {b['commit']}")
+    for echelle, res_b in b["echelles"].items():
+        res_a = a["echelles"].get(echelle)
+        if res_a is None:
+            continue
+        print(f"Échelle ×{echelle}")
+        for nom, mb in res_b["etapes"].items():
+            ma = res_a["etapes"].get(nom)
+            if ma is None:
+                continue
+            ratio_t = mb["secondes"] / ma["secondes"] if ma["secondes"] else float("nan")
+            ratio_m = mb["pic_memoire_mo"] / ma["pic_memoire_mo"] if ma["pic_memoire_mo"] else float("nan")
+            alerte = " ⚠️" if ratio_t > 1.2 or ratio_m > 1.2 else ""
+            print(f"   {nom:<28} temps ×{ratio_t:5.2f}  mémoire ×{ratio_m:5.2f}{alerte}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "comparer":
+        comparer(sys.argv[2], sys.argv[3])
+    else:
+        echelles = [int(e) for e in sys.argv[1].split(",")] if len(sys.argv) > 1 else ECHELLES
+        lancer(echelles)
@@ -0,0 +1,75 @@
+# scripts/generateur_courses.py
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.stockage import ecrire_table
+
+# Taille réelle de data/Courses_Completes.csv : les échelles du benchmark en sont des multiples
+TAILLE_REELLE = 1015
+HIPPODROMES = [f"Hippodrome{i:02d}" for i in range(56)]
+DEBUT = pd.Timestamp("2022-09-05")
+
+
+def generer_courses(nb_courses, seed=0):
+    """
+    Courses synthétiques au schéma de Courses_CompletesTurfVision_id (une ligne par course) :
+    8 pronostics distincts et 5 arrivées distinctes parmi les partants, les pronostiqués
+    ayant plus de chances d'arriver devant (pour que le modèle ait quelque chose à apprendre).
+    """
+    rng = np.random.default_rng(seed)
+    partants = np.clip(rng.normal(16, 3, nb_courses).round(), 8, 20).astype(int)
+    numeros = np.arange(1, 21)
+
+    # Pronostics : permutation aléatoire des partants, on garde les 8 premiers
+    tirage = rng.random((nb_courses, 20))
+    tirage[numeros[None, :] > partants[:, None]] = np.inf
+    pronos = np.argsort(tirage, axis=1)[:, :8] + 1
+
+    # Arrivées : bonus décroissant selon le rang de pronostic
+    score = rng.gumbel(size=(nb_courses, 20))
+    lignes = np.arange(nb_courses)[:, None]
+    score[lignes, pronos - 1] += np.linspace(1.5, 0.2, 8)
+    score[numeros[None, :] > partants[:, None]] = -np.inf
+    arrivees = np.argsort(-score, axis=1)[:, :5] + 1
+
+    dates = DEBUT + pd.to_timedelta(np.sort(rng.integers(0, max(nb_courses // 4, 1), nb_courses)), unit="D")
+    hippodromes = np.asarray(HIPPODROMES)[rng.integers(0, len(HIPPODROMES), nb_courses)]
+    numcourse = np.char.add("C", (np.arange(nb_courses) % 9 + 1).astype(str))
+
+    df = pd.DataFrame({
+        "date": dates.strftime("%d/%m/%y"),
+        "course_id": np.arange(1, nb_courses + 1),
+        "discipline": np.where(rng.random(nb_courses) < 0.5, "trot", "galop"),
+        "hippodrome": hippodromes,
+        "partants": partants,
+        "numcourse": numcourse,
+        "distance": (rng.normal(2485, 745, nb_courses).clip(600, 6000) // 25 * 25).astype(int),
+    })
+    for i in range(8):
+        df[f"prono{i + 1}"] = pronos[:, i]
+    for i in range(5):
+        df[f"a{i + 1}"] = arrivees[:, i]
+    df["rapport"] = np.round(rng.lognormal(1.5, 0.8, nb_courses) + 1, 1)
+    df["r_b1"] = rng.integers(1, 3, nb_courses)
+    df["r_b2"] = rng.integers(1, 3, nb_courses)
+    # Identifiant unique même à grande échelle (le numéro de course départage les homonymes)
+    df["id_course"] = df["date"] + "_" + df["hippodrome"] + "_" + df["numcourse"] + "_" + df["course_id"].astype(str)
+    return df
+
+
+def generer_dossier(echelle, dossier=".", seed=0):
+    """Écrit data/Courses_CompletesTurfVision_id à `echelle` fois la taille réelle dans dossier."""
+    df = generer_courses(TAILLE_REELLE * echelle, seed)
+    os.makedirs(os.path.join(dossier, "data"), exist_ok=True)
+    ecrire_table(df, os.path.join(dossier, "data/Courses_CompletesTurfVision_id.csv"))
+    return df
+
+
+if __name__ == "__main__":
+    echelle = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    df = generer_dossier(echelle)
+    print(f"✅ {len(df)} courses synthétiques écrites dans data/ (échelle ×{echelle})")
@@ -0,0 +1,153 @@
+# scripts/stress_ecritures.py
+
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from contextlib import nullcontext
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.depot import DepotTurf
+from app.stockage import lire_table, modifier_table, remplacer_lignes
+from app.verrous import verrou, verrou_course
+
+COURSES_PATH = "data/Courses_CompletesTurfVision_id.csv"
+PREDICTIONS_PATH = "data/historique_predictions.csv"
+COUPLES_PATH = "data/historique_couples.csv"
+COMPTEURS_PATH = "data/compteurs_stress.csv"
+# Ordre réel des écritures de chaque course (ajouté sous le verrou de la course)
+ORDRE_PATH = "data/ordre_ecritures.txt"
+DB_PATH = "data/stress.db"
+NB_CHAUDES = 3
+
+
+def incrementer(cle):
+    """Lecture-modification-écriture d'un compteur partagé (la mise à jour qui se perd sans contrôle de version)."""
+    def modification(df):
+        if df is None:
+            df = pd.DataFrame({"cle": pd.Series(dtype=str), "valeur": pd.Series(dtype="int64")})
+        if (df["cle"] == cle).any():
+            df.loc[df["cle"] == cle, "valeur"] += 1
+        else:
+            df = pd.concat([df, pd.DataFrame({"cle": [cle], "valeur": [1]})], ignore_index=True)
+        return df
+    return modification
+
+
+def id_course_session(num, i):
+    """Une course sur deux est commune à toutes les sessions (verrou de course disputé), l'autre lui est propre."""
+    return f"C{i}" if i % 2 == 0 else f"S{num}_C{i}"
+
+
+def verrou_global(mode):
+    """Mode de comparaison : un seul verrou pour toutes les sessions."""
+    return verrou("global") if mode == "global" else nullcontext()
+
+
+def session(dossier, num, nb_courses, travail, mode, barriere):
+    """Une session de l'application : pour chaque course, calcul puis écritures partagées."""
+    os.chdir(dossier)
+    depot = DepotTurf(DB_PATH)
+    barriere.wait()
+
+    for i in range(nb_courses):
+        id_course = id_course_session(num, i)
+        date = "01/01/25"
+        with verrou_global(mode), verrou_course(id_course):
+            time.sleep(travail)  # features + modèle pour cette course
+            # Chaque écriture porte le numéro de session : la course doit finir cohérente, toute du dernier écrivain
+            remplacer_lignes(pd.DataFrame([{"id_course": id_course, "session": num, "a1": i % 8 + 1}]),
+                             COURSES_PATH, cle="id_course")
+            top4 = pd.DataFrame({"course_id": id_course, "date": date, "discipline": "trot", "session": num,
+                                 "cheval_num": [1, 2, 3, 4], "proba_A1": [0.4, 0.3, 0.2, 0.1]})
+            couples = pd.DataFrame({"course_id": id_course, "date": date, "discipline": "trot", "session": num,
+                                    "cheval_1": [1], "cheval_2": [2], "proba_couple": [0.35]})
+            remplacer_lignes(top4, PREDICTIONS_PATH, cle="course_id")
+            remplacer_lignes(couples, COUPLES_PATH, cle="course_id")
+            depot.ajouter_course_en_attente({"id_course": id_course, "date": date, "discipline": "trot",
+                                             "hippodrome": f"S{num}"})
+            with open(ORDRE_PATH, "a", encoding="utf-8") as f:
+                f.write(f"{id_course};{num}\n")
+
+        with verrou_global(mode):
+            modifier_table(COMPTEURS_PATH, incrementer(f"chaude_{i % NB_CHAUDES}"))
+
+
+def lancer(nb_sessions, nb_courses, travail, mode):
+    """Lance nb_sessions processus sur un dossier data/ vierge ; retourne (durée, anomalies)."""
+    dossier = tempfile.mkdtemp(prefix="stress_turf_")
+    os.makedirs(os.path.join(dossier, "data"))
+
+    barriere = mp.Barrier(nb_sessions + 1)
+    processus = [
+        mp.Process(target=session, args=(dossier, num, nb_courses, travail, mode, barriere))
+        for num in range(nb_sessions)
+    ]
+    for p in processus:
+        p.start()
+    barriere.wait()
+    debut = time.perf_counter()
+    for p in processus:
+        p.join()
+    duree = time.perf_counter() - debut
+
+    return duree, verifier(dossier, nb_sessions, nb_courses)
+
+
+def verifier(dossier, nb_sessions, nb_courses):
+    """
+    Aucune mise à jour perdue : chaque course écrite est présente une fois, chaque incrément compté,
+    et chaque course commune est, dans toutes les tables, celle de la dernière session qui l'a écrite.
+    """
+    os.chdir(dossier)
+    attendues = {id_course_session(s, i) for s in range(nb_sessions) for i in range(nb_courses)}
+    anomalies = []
+
+    courses = lire_table(COURSES_PATH)
+    if set(courses["id_course"]) != attendues or len(courses) != len(attendues):
+        anomalies.append(f"courses : {len(courses)} lignes pour {len(attendues)} attendues")
+
+    total = int(lire_table(COMPTEURS_PATH)["valeur"].sum())
+    if total != nb_sessions * nb_courses:
+        anomalies.append(f"compteurs : {total} incréments pour {nb_sessions * nb_courses} attendus")
+
+    # Dernière écriture de chaque course d'après l'ordre réel, comparée à l'état final de chaque table
+    dernieres = pd.read_csv(ORDRE_PATH, sep=";", names=["id_course", "session"]).drop_duplicates("id_course", keep="last")
+    dernieres = dernieres.set_index("id_course")["session"]
+    etats = {
+        "courses": courses.groupby("id_course")["session"],
+        "prédictions": lire_table(PREDICTIONS_PATH).groupby("course_id")["session"],
+        "couples": lire_table(COUPLES_PATH).groupby("course_id")["session"],
+    }
+    for nom, sessions in etats.items():
+        if (sessions.nunique() != 1).any() or not sessions.first().astype(int).sort_index().equals(dernieres.sort_index()):
+            anomalies.append(f"{nom} : course(s) pas toutes du dernier écrivain")
+    attente = DepotTurf(DB_PATH).courses_en_attente().set_index("id_course")["hippodrome"]
+    if not attente.str[1:].astype(int).sort_index().equals(dernieres.sort_index()):
+        anomalies.append("file d'attente : course(s) pas toutes du dernier écrivain")
+
+    predictions = lire_table(PREDICTIONS_PATH)
+    if set(predictions["course_id"]) != attendues or len(predictions) != 4 * len(attendues):
+        anomalies.append(f"prédictions : {len(predictions)} lignes pour {4 * len(attendues)} attendues")
+    couples = lire_table(COUPLES_PATH)
+    if set(couples["course_id"]) != attendues or len(couples) != len(attendues):
+        anomalies.append(f"couples : {len(couples)} lignes pour {len(attendues)} attendues")
+    if set(DepotTurf(DB_PATH).courses_en_attente()["id_course"]) != attendues:
+        anomalies.append("file d'attente incomplète")
+    return anomalies
+
+
+def main(sessions=(1, 2, 4, 8), nb_courses=20, travail=0.05):
+    print(f"{'mode':>8} {'sessions':>9} {'durée (s)':>10} {'courses/s':>10}  vérification")
+    for mode in ("global", "course"):
+        for nb_sessions in sessions:
+            duree, anomalies = lancer(nb_sessions, nb_courses, travail, mode)
+            debit = nb_sessions * nb_courses / duree
+            etat = "✅ aucune perte" if not anomalies else "❌ " + " ; ".join(anomalies)
+            print(f"{mode:>8} {nb_sessions:>9} {duree:>10.2f} {debit:>10.1f}  {etat}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,11 @@
 
 import pandas as pd
 from model.predictor import TurfPredictor
+from app.stockage import lire_table
 
 # 🔁 1. Charger les données
 DATA_PATH = "data/chevaux_par_course.csv"
-df = pd.read_csv(DATA_PATH)
+df = lire_table(DATA_PATH)
 
 # ✅ Vérification minimale
 if "course_id" not in df.columns or "cheval_num" not in df.columns:
@@ -21,12 +22,12 @@ predictor = TurfPredictor(DATA_PATH)
 # 📚 3. Entraîner sur toutes les données
 predictor.train()
 
-# 🏇 4. Sélectionner une course pour la prédiction (ex : la première course)
-first_course_id = df['course_id'].iloc[0]
-df_course = df[df['course_id'] == first_course_id]
+# 🔮 4. Prédire en une passe le top 4 A1 et les couples de toutes les courses
+top4_courses, couples_courses = predictor.predict_courses(df)
 
-# 🔮 5. Prédire les 4 chevaux les plus probables comme gagnant A1
-top4 = predictor.predict_top4_A1(df_course)
+# 🏇 5. Sélectionner une course pour l'affichage (ex : la première course)
+first_course_id = df['course_id'].iloc[0]
+top4 = top4_courses[top4_courses['course_id'] == first_course_id]
 
 # 📤 6. Afficher les résultats
 print(f"\n🎯 Top 4 des chevaux prédits comme A1 pour la course {first_course_id} :")
@@ -36,7 +37,7 @@ else:
     print(top4[['cheval_num']].reset_index(drop=True))
 
 # 🏆 7. Afficher le couple gagnant
-couple = predictor.predict_couple_gagnant(df_course)
+couple = couples_courses[couples_courses['course_id'] == first_course_id].drop(columns='course_id')
 print(f"\n👥 6 couples gagnants prédits pour la course {first_course_id} :")
 print(couple.rename(columns={
     "cheval_1": "Cheval 1",